@@ -1,27 +1,18 @@
-import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
-import pickle
 
-class Workplace:
-    def __init__(self, name, hours_of_operation=None, workers=None, shifts=None):
-        self.name = name
-        self.hours_of_operation = hours_of_operation or {"Monday": ("9:00", "17:00"), 
-                                                         "Tuesday": ("9:00", "17:00"),
-                                                         "Wednesday": ("9:00", "17:00"),
-                                                         "Thursday": ("9:00", "17:00"),
-                                                         "Friday": ("9:00", "17:00"),
-                                                         "Saturday": ("10:00", "16:00"),
-                                                         "Sunday": ("10:00", "16:00")}
-        self.workers = workers or []
-        self.shifts = shifts or {}
-        self.excel_file = None
-    
-    def __str__(self):
-        return self.name
+import os
+from functools import partial
+
+# Solver, export and analytics modules pull in numpy and friends; they are
+# imported where first used so the home screen comes up without them
+import autosave
+import instrumentation
+import schedule_cache
+import scheduler_core
+from scheduler_core import Workplace
+from tasks import TaskRunner
 
 class WorkplaceSchedulerApp:
     def __init__(self, root):
@@ -29,16 +20,25 @@ class WorkplaceSchedulerApp:
         self.root.title("Workplace Scheduler")
         self.root.geometry("900x600")
         
-        # State variables
-        self.workplaces = []
+        # State variables: workplace names up front, each workplace loaded when opened
+        self.workplaces = None
         self.current_workplace = None
-        
-        # Create main frames
-        self.create_main_frame()
-        self.load_workplaces()
-        
-        # Start with home screen
-        self.show_home_screen()
+        # Edits are journaled and written to the store in the background, see autosave.py
+        self.autosave = None
+        
+        # Imports and schedule runs happen off the UI thread
+        self.tasks = TaskRunner(self.root)
+        self.current_task = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        with instrumentation.phase("startup") as metrics:
+            # Create main frames
+            self.create_main_frame()
+            self.load_workplaces()
+            
+            # Start with home screen
+            self.show_home_screen()
+            metrics["workplaces"] = len(self.workplaces)
     
     def create_main_frame(self):
         # Main container
@@ -55,10 +55,101 @@ class WorkplaceSchedulerApp:
         self.home_button = ttk.Button(self.header_frame, text="Home", command=self.show_home_screen)
         self.home_button.pack(side=tk.RIGHT)
         
+        # Status bar for background tasks - packed before the content frame so it stays visible
+        self.status_frame = ttk.Frame(self.main_frame)
+        self.status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        self.status_label = ttk.Label(self.status_frame, text="Ready")
+        self.status_label.pack(side=tk.LEFT)
+        
+        self.cancel_button = ttk.Button(self.status_frame, text="Cancel", command=self.cancel_task,
+                                        state="disabled")
+        self.cancel_button.pack(side=tk.RIGHT)
+        
+        self.progress_bar = ttk.Progressbar(self.status_frame, length=200, mode="determinate")
+        self.progress_bar.pack(side=tk.RIGHT, padx=10)
+        
         # Content frame - will be cleared and repopulated based on current view
         self.content_frame = ttk.Frame(self.main_frame)
         self.content_frame.pack(fill=tk.BOTH, expand=True, pady=10)
     
+    def run_task(self, description, func, *args, on_done=None, on_error=None):
+        """Run func(*args) in the background, showing its progress in the status bar."""
+        def progress(done, total, message):
+            if task is not self.current_task:
+                return
+            if total:
+                self.progress_bar.config(mode="determinate", maximum=total, value=done)
+                self.status_label.config(text=f"{description}: {done}/{total}")
+            else:
+                self.progress_bar.config(mode="indeterminate")
+                self.progress_bar.step()
+                self.status_label.config(text=f"{description}: {done:,} rows")
+        
+        def finish(text):
+            if task is self.current_task:
+                self.current_task = None
+                self.progress_bar.config(mode="determinate", value=0)
+                self.cancel_button.config(state="disabled")
+                self.status_label.config(text=text)
+        
+        def done(result):
+            finish(f"{description}: done")
+            if on_done:
+                on_done(result)
+        
+        def failed(error):
+            finish(f"{description}: failed")
+            if on_error:
+                on_error(error)
+        
+        task = self.tasks.submit(func, *args, on_done=done, on_error=failed, on_progress=progress,
+                                 on_cancel=lambda: finish(f"{description}: cancelled"))
+        self.current_task = task
+        self.status_label.config(text=f"{description}...")
+        self.cancel_button.config(state="normal")
+        return task
+    
+    def cancel_task(self):
+        if self.current_task is not None:
+            self.current_task.cancel()
+            self.status_label.config(text="Cancelling...")
+    
+    def on_close(self):
+        self.tasks.shutdown()
+        if self.autosave is not None:
+            self.autosave.close()
+        self.root.destroy()
+    
+    def remember(self, workplace, part):
+        """Queue the `part` of `workplace` that was edited for autosave, see autosave.PARTS."""
+        if self.autosave is not None:
+            self.autosave.record(workplace, self.workplaces.names, part)
+    
+    def other_bookings(self, workplace):
+        """
+        build(first, last) making a WorkerRegistry of the shifts people have at
+        the workplaces other than `workplace` between first and last: open ones
+        as edited, the rest read from the store when called, so a background
+        task can build it without the UI waiting on the store.
+        """
+        opened = [self.workplaces.get(name) for name in self.workplaces.names
+                  if self.workplaces.is_loaded(name)]
+        opened = [(wp.name, wp.workers, wp.shifts) for wp in opened if wp is not workplace]
+        unopened = [name for name in self.workplaces.names
+                    if not self.workplaces.is_loaded(name) and name != workplace.name]
+        store_path = self.workplaces.path
+        
+        def build(first, last):
+            from registry import WorkerRegistry, registry_from_store
+            
+            booked = WorkerRegistry()
+            for name, workers, shifts in opened:
+                booked.commit_schedule(name, workers, shifts, first, last)
+            return registry_from_store(store_path, unopened, first, last, booked)
+        
+        return build
+    
     def clear_content_frame(self):
         for widget in self.content_frame.winfo_children():
             widget.destroy()
@@ -86,8 +177,8 @@ class WorkplaceSchedulerApp:
         scrollbar.config(command=self.workplace_listbox.yview)
         
         # Populate workplace list
-        for workplace in self.workplaces:
-            self.workplace_listbox.insert(tk.END, workplace.name)
+        for name in self.workplaces.names:
+            self.workplace_listbox.insert(tk.END, name)
         
         # Buttons frame
         buttons_frame = ttk.Frame(list_frame)
@@ -104,6 +195,10 @@ class WorkplaceSchedulerApp:
         
         save_button = ttk.Button(buttons_frame, text="Save All Workplaces", command=self.save_workplaces)
         save_button.pack(side=tk.RIGHT, padx=5)
+        
+        generate_all_button = ttk.Button(buttons_frame, text="Generate All Schedules",
+                                         command=self.generate_all_schedules)
+        generate_all_button.pack(side=tk.RIGHT, padx=5)
     
     def add_workplace(self):
         # Dialog to add new workplace
@@ -121,13 +216,14 @@ class WorkplaceSchedulerApp:
             name = name_entry.get().strip()
             if name:
                 # Check for duplicates
-                if any(wp.name == name for wp in self.workplaces):
+                if name in self.workplaces:
                     messagebox.showerror("Error", f"Workplace '{name}' already exists!")
                     return
                 
                 # Create new workplace and add to list
                 new_workplace = Workplace(name)
                 self.workplaces.append(new_workplace)
+                self.remember(new_workplace, "add")
                 self.workplace_listbox.insert(tk.END, name)
                 add_window.destroy()
                 messagebox.showinfo("Success", f"Workplace '{name}' added successfully!")
@@ -136,6 +232,76 @@ class WorkplaceSchedulerApp:
         
         ttk.Button(add_window, text="Save", command=save_new_workplace).pack(pady=20)
     
+    def generate_all_schedules(self):
+        # Dialog asking for the parameters shared by every workplace
+        generate_window = tk.Toplevel(self.root)
+        generate_window.title("Generate All Schedules")
+        generate_window.geometry("400x340")
+        generate_window.grab_set()  # Modal window
+        
+        today = datetime.now()
+        fields = [("Start Date (YYYY-MM-DD):", today.strftime("%Y-%m-%d")),
+                  ("End Date (YYYY-MM-DD):", (today + timedelta(days=7)).strftime("%Y-%m-%d")),
+                  ("Default Shift Length (hours):", "8"),
+                  ("Minimum Staff per Shift:", "2"),
+                  ("Positions (blank for any):", "")]
+        variables = []
+        for label, default in fields:
+            row = ttk.Frame(generate_window)
+            row.pack(fill=tk.X, padx=10, pady=5)
+            ttk.Label(row, text=label, width=28).pack(side=tk.LEFT)
+            var = tk.StringVar(value=default)
+            ttk.Entry(row, textvariable=var, width=12).pack(side=tk.LEFT, padx=5)
+            variables.append(var)
+        
+        mode_row = ttk.Frame(generate_window)
+        mode_row.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(mode_row, text="Optimizer:", width=28).pack(side=tk.LEFT)
+        mode_var = tk.StringVar(value="flow")
+        ttk.Combobox(mode_row, textvariable=mode_var, values=scheduler_core.SCHEDULE_MODES,
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5)
+        
+        def run_all():
+            import shift_templates
+            
+            start_var, end_var, shift_var, staff_var, positions_var = variables
+            try:
+                start_date = datetime.strptime(start_var.get(), "%Y-%m-%d")
+                end_date = datetime.strptime(end_var.get(), "%Y-%m-%d")
+                shift_length = float(shift_var.get())
+                min_staff = int(staff_var.get())
+                shift_templates.check_shift_length(shift_length)
+            except ValueError as e:
+                messagebox.showerror("Error", f"Invalid schedule parameters: {str(e)}")
+                return
+            
+            import batch
+            
+            # Solve copies so workplaces can keep being edited meanwhile
+            originals = [wp for wp in self.workplaces if wp.workers]
+            mode = mode_var.get()
+            positions = scheduler_core.qualified_positions(positions_var.get())
+            history_before = start_date if mode == "rolling" else None
+            snapshots = [scheduler_core.snapshot(wp, history_before) for wp in originals]
+            
+            def done(solved):
+                for workplace, (solved_copy, schedule) in zip(originals, solved):
+                    scheduler_core.apply_schedule(workplace, schedule, start_date, end_date,
+                                                  shift_length, min_staff, inputs_from=solved_copy,
+                                                  keep_history=mode == "rolling", mode=mode, positions=positions)
+                    self.remember(workplace, "schedule")
+                messagebox.showinfo("Success", f"Generated schedules for {len(solved)} workplaces!")
+            
+            def failed(e):
+                messagebox.showerror("Error", f"Error generating schedules: {str(e)}")
+            
+            generate_window.destroy()
+            self.run_task("Generating all schedules", partial(batch.solve_all, mode=mode, positions=positions),
+                          snapshots, start_date, end_date, shift_length, min_staff,
+                          on_done=done, on_error=failed)
+        
+        ttk.Button(generate_window, text="Generate", command=run_all).pack(pady=20)
+    
     def select_workplace(self):
         selection = self.workplace_listbox.curselection()
         if not selection:
@@ -143,7 +309,11 @@ class WorkplaceSchedulerApp:
             return
         
         index = selection[0]
-        self.current_workplace = self.workplaces[index]
+        try:
+            self.current_workplace = self.workplaces[index]
+        except Exception as e:
+            messagebox.showerror("Error", f"Error loading workplace: {str(e)}")
+            return
         self.show_workplace_screen()
     
     def remove_workplace(self):
@@ -153,17 +323,24 @@ class WorkplaceSchedulerApp:
             return
         
         index = selection[0]
-        workplace = self.workplaces[index]
+        name = self.workplaces.names[index]
         
         # Confirm deletion
         confirm = messagebox.askyesno("Confirm Deletion", 
-                                     f"Are you sure you want to delete '{workplace.name}'?\nThis action cannot be undone.")
+                                     f"Are you sure you want to delete '{name}'?\nThis action cannot be undone.")
         if confirm:
-            self.workplaces.pop(index)
+            self.workplaces.remove(name)
+            if self.autosave is not None:
+                self.autosave.record_removed(name, self.workplaces.names)
             self.workplace_listbox.delete(index)
-            messagebox.showinfo("Success", f"Workplace '{workplace.name}' removed successfully!")
+            messagebox.showinfo("Success", f"Workplace '{name}' removed successfully!")
     
     def show_workplace_screen(self):
+        import coverage_report
+        import export
+        import shift_templates
+        from schedule_view import ScheduleView
+        
         self.clear_content_frame()
         self.title_label.config(text=f"Workplace: {self.current_workplace.name}")
         
@@ -175,7 +352,7 @@ class WorkplaceSchedulerApp:
         data_frame = ttk.Frame(notebook)
         notebook.add(data_frame, text="Data Import")
         
-        ttk.Label(data_frame, text="Import worker data from Excel:", font=("Arial", 12)).pack(pady=10)
+        ttk.Label(data_frame, text="Import worker data from Excel or CSV:", font=("Arial", 12)).pack(pady=10)
         
         file_frame = ttk.Frame(data_frame)
         file_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -190,7 +367,8 @@ class WorkplaceSchedulerApp:
         def browse_file():
             filename = filedialog.askopenfilename(
                 title="Select Excel File",
-                filetypes=(("Excel files", "*.xlsx *.xls"), ("All files", "*.*"))
+                filetypes=(("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv"),
+                           ("Parquet files", "*.parquet"), ("All files", "*.*"))
             )
             if filename:
                 self.file_path_var.set(filename)
@@ -200,36 +378,37 @@ class WorkplaceSchedulerApp:
         
         def import_data():
             file_path = self.file_path_var.get()
-            if not file_path or not os.path.exists(file_path):
-                messagebox.showerror("Error", "Please select a valid Excel file!")
-                return
+            workplace = self.current_workplace
             
-            try:
-                # Read Excel file
-                df = pd.read_excel(file_path)
+            def done(result):
+                # Store the roster on the workplace the import was started for
+                scheduler_core.apply_roster(workplace, result, file_path)
+                self.remember(workplace, "workers")
                 
-                # Basic validation
-                required_columns = ["Name", "Position", "Availability"]
-                missing_columns = [col for col in required_columns if col not in df.columns]
+                if self.current_workplace is workplace and self.preview_text.winfo_exists():
+                    show_import_preview(result)
                 
-                if missing_columns:
-                    messagebox.showerror("Error", f"Missing required columns: {', '.join(missing_columns)}")
-                    return
-                
-                # Process and store data
-                self.current_workplace.workers = df.to_dict('records')
-                self.current_workplace.excel_file = file_path
-                
-                # Display preview
-                self.preview_text.delete(1.0, tk.END)
-                self.preview_text.insert(tk.END, f"Successfully imported {len(df)} workers.\n\n")
-                self.preview_text.insert(tk.END, "Preview of data:\n")
-                self.preview_text.insert(tk.END, df.head().to_string())
-                
-                messagebox.showinfo("Success", f"Successfully imported {len(df)} workers from {file_path}")
-                
-            except Exception as e:
-                messagebox.showerror("Import Error", f"Error importing data: {str(e)}")
+                messagebox.showinfo("Success", f"Successfully imported {len(result)} workers from {file_path}")
+            
+            def failed(e):
+                if isinstance(e, ValueError):
+                    messagebox.showerror("Error", str(e))
+                else:
+                    messagebox.showerror("Import Error", f"Error importing data: {str(e)}")
+            
+            # Stream and validate the roster in the background
+            self.run_task(f"Importing {os.path.basename(file_path) or 'roster'}", scheduler_core.read_roster,
+                          file_path, on_done=done, on_error=failed)
+        
+        def show_import_preview(result):
+            # Display preview
+            self.preview_text.delete(1.0, tk.END)
+            self.preview_text.insert(tk.END, f"Successfully imported {len(result)} workers.\n")
+            if result.skipped:
+                self.preview_text.insert(tk.END, f"Skipped {result.skipped} invalid rows:\n")
+                self.preview_text.insert(tk.END, "\n".join(result.errors) + "\n")
+            self.preview_text.insert(tk.END, "\nPreview of data:\n")
+            self.preview_text.insert(tk.END, scheduler_core.format_preview(result.workers))
         
         import_button = ttk.Button(data_frame, text="Import Data", command=import_data)
         import_button.pack(pady=10)
@@ -249,10 +428,8 @@ class WorkplaceSchedulerApp:
         # Show existing data if available
         if self.current_workplace.workers:
             self.preview_text.insert(tk.END, f"{len(self.current_workplace.workers)} workers loaded.\n\n")
-            if len(self.current_workplace.workers) > 0:
-                df = pd.DataFrame(self.current_workplace.workers)
-                self.preview_text.insert(tk.END, "Preview of data:\n")
-                self.preview_text.insert(tk.END, df.head().to_string())
+            self.preview_text.insert(tk.END, "Preview of data:\n")
+            self.preview_text.insert(tk.END, scheduler_core.format_preview(self.current_workplace.workers))
         
         # Hours tab
         hours_frame = ttk.Frame(notebook)
@@ -290,7 +467,13 @@ class WorkplaceSchedulerApp:
             end_entry = ttk.Entry(time_frame, textvariable=end_var, width=10)
             end_entry.pack(side=tk.LEFT, padx=5)
             
-            hours_entries[day] = (start_var, end_var)
+            # Optional explicit shifts, e.g. "6:00-14:00, 14:00-22:00"; empty splits the day evenly
+            templates = getattr(self.current_workplace, "shift_templates", None) or {}
+            shifts_var = tk.StringVar(value=", ".join(f"{s}-{e}" for s, e in templates.get(day, [])))
+            ttk.Label(time_frame, text="Shifts:").pack(side=tk.LEFT, padx=5)
+            ttk.Entry(time_frame, textvariable=shifts_var, width=30).pack(side=tk.LEFT, padx=5)
+            
+            hours_entries[day] = (start_var, end_var, shifts_var)
             
             # Add closed checkbox
             closed_var = tk.BooleanVar()
@@ -310,23 +493,26 @@ class WorkplaceSchedulerApp:
         
         def save_hours():
             hours = {}
-            for day, (start_var, end_var) in hours_entries.items():
+            templates = {}
+            for day, (start_var, end_var, shifts_var) in hours_entries.items():
                 start = start_var.get().strip()
                 end = end_var.get().strip()
                 
-                # Validate time format (simple validation)
+                # End before start runs past midnight, equal times mean open 24 hours
                 try:
                     if start and end:
-                        # Simple validation - could be enhanced
-                        if ":" not in start or ":" not in end:
-                            raise ValueError(f"Invalid time format for {day}")
-                        
+                        shift_templates.span(start, end)
                         hours[day] = (start, end)
+                        template = shift_templates.parse_template_text(shifts_var.get())
+                        if template:
+                            templates[day] = template
                 except ValueError as e:
-                    messagebox.showerror("Error", str(e))
+                    messagebox.showerror("Error", f"{day}: {e}")
                     return
             
             self.current_workplace.hours_of_operation = hours
+            self.current_workplace.shift_templates = templates or None
+            self.remember(self.current_workplace, "hours")
             messagebox.showinfo("Success", "Hours of operation saved successfully!")
         
         save_hours_button = ttk.Button(hours_frame, text="Save Hours", command=save_hours)
@@ -384,6 +570,26 @@ class WorkplaceSchedulerApp:
         min_staff_entry = ttk.Entry(staff_frame, textvariable=self.min_staff_var, width=5)
         min_staff_entry.pack(side=tk.LEFT, padx=5)
         
+        # Optimizer: balanced evens out hours and honours Max Hours/Min Hours roster columns,
+        # rolling does the same week by week, continuing from the weeks before the start date
+        mode_frame = ttk.Frame(param_frame)
+        mode_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(mode_frame, text="Optimizer:").pack(side=tk.LEFT, padx=5)
+        
+        self.mode_var = tk.StringVar(value="flow")
+        ttk.Combobox(mode_frame, textvariable=self.mode_var, values=scheduler_core.SCHEDULE_MODES,
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5)
+        
+        # Only workers holding one of these positions are scheduled
+        positions_frame = ttk.Frame(param_frame)
+        positions_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(positions_frame, text="Positions (comma-separated, blank for any):").pack(side=tk.LEFT, padx=5)
+        
+        self.positions_var = tk.StringVar()
+        ttk.Entry(positions_frame, textvariable=self.positions_var, width=24).pack(side=tk.LEFT, padx=5)
+        
         # Generate button
         def generate_schedule():
             if not self.current_workplace.workers:
@@ -396,152 +602,203 @@ class WorkplaceSchedulerApp:
                 end_date = datetime.strptime(self.end_date_var.get(), "%Y-%m-%d")
                 shift_length = float(self.shift_length_var.get())
                 min_staff = int(self.min_staff_var.get())
+                shift_templates.check_shift_length(shift_length)
+            except ValueError as e:
+                messagebox.showerror("Error", f"Error generating schedule: {str(e)}")
+                return
+            
+            workplace = self.current_workplace
+            mode = self.mode_var.get()
+            positions = scheduler_core.qualified_positions(self.positions_var.get())
+            # Rolling mode continues from the weeks before the start date
+            workplace_copy = scheduler_core.snapshot(workplace, start_date if mode == "rolling" else None)
+            
+            # Keep out workers who have overlapping shifts at other workplaces
+            other_bookings = self.other_bookings(workplace)
+            
+            def solve(progress=None):
+                # Overnight shifts of the day before reach into the range
+                booked = other_bookings(start_date - timedelta(days=1), end_date)
+                return scheduler_core.generate_ai_schedule(workplace_copy, start_date, end_date, shift_length,
+                                                           min_staff, progress=progress, mode=mode,
+                                                           exclude=booked.exclusion(workplace_copy.workers),
+                                                           positions=positions)
+            
+            def done(schedule):
+                # Save to the workplace the run was started for
+                scheduler_core.apply_schedule(workplace, schedule, start_date, end_date, shift_length,
+                                              min_staff, inputs_from=workplace_copy,
+                                              keep_history=mode == "rolling", mode=mode, positions=positions)
+                self.remember(workplace, "schedule")
                 
-                # Generate schedule (simplified algorithm)
-                schedule = self.generate_ai_schedule(start_date, end_date, shift_length, min_staff)
-                
-                # Display schedule
-                self.schedule_text.delete(1.0, tk.END)
-                self.schedule_text.insert(tk.END, "Generated Schedule:\n\n")
-                
-                for date, shifts in schedule.items():
-                    self.schedule_text.insert(tk.END, f"{date.strftime('%Y-%m-%d (%A)')}\n")
-                    self.schedule_text.insert(tk.END, "-" * 40 + "\n")
-                    
-                    for shift, workers in shifts.items():
-                        self.schedule_text.insert(tk.END, f"{shift}: {', '.join(workers)}\n")
-                    
-                    self.schedule_text.insert(tk.END, "\n")
-                
-                # Save to workplace
-                self.current_workplace.shifts = schedule
-                messagebox.showinfo("Success", "Schedule generated successfully!")
+                if self.current_workplace is workplace and self.schedule_view.winfo_exists():
+                    # Display schedule
+                    self.schedule_view.set_schedule(workplace.shifts, "Generated Schedule:")
                 
-            except Exception as e:
+                messagebox.showinfo("Success", f"Schedule for '{workplace.name}' generated successfully!")
+            
+            def failed(e):
                 messagebox.showerror("Error", f"Error generating schedule: {str(e)}")
+            
+            # Solve a copy in the background so the workplace stays editable
+            self.run_task(f"Generating schedule for {workplace.name}", solve, on_done=done, on_error=failed)
+        
+        def update_schedule():
+            # Incremental: only days touched by roster/hours changes are recomputed
+            workplace = self.current_workplace
+            inputs = workplace.schedule_inputs
+            if inputs is None:
+                messagebox.showerror("Error", "No record of how the existing schedule was generated; "
+                                              "generate it again first")
+                return
+            workplace_copy = scheduler_core.snapshot(workplace, with_schedule=True)
+            other_bookings = self.other_bookings(workplace)
+            
+            def solve(progress=None):
+                booked = other_bookings(inputs["start"] - timedelta(days=1), inputs["end"])
+                return scheduler_core.solve_reschedule(workplace_copy, progress,
+                                                       booked.exclusion(workplace_copy.workers))
+            
+            def done(result):
+                schedule, stats = result
+                if workplace.schedule_inputs is not inputs:
+                    messagebox.showerror("Error", f"The schedule for '{workplace.name}' was replaced meanwhile; "
+                                                  f"update it again")
+                    return
+                if schedule is not None:
+                    scheduler_core.apply_reschedule(workplace, schedule, inputs_from=workplace_copy)
+                    self.remember(workplace, "schedule")
+                    if self.current_workplace is workplace and self.schedule_view.winfo_exists():
+                        self.schedule_view.set_schedule(workplace.shifts, "Updated Schedule:")
+                messagebox.showinfo("Success", f"Schedule updated: {stats['shifts_changed']} shifts on "
+                                               f"{stats['days_changed']} days changed.")
+            
+            def failed(e):
+                messagebox.showerror("Error", f"Error updating schedule: {str(e)}")
+            
+            self.run_task(f"Updating schedule for {workplace.name}", solve, on_done=done, on_error=failed)
         
         generate_button = ttk.Button(schedule_frame, text="Generate Schedule", 
                                     command=generate_schedule)
         generate_button.pack(pady=10)
         
+        update_button = ttk.Button(schedule_frame, text="Update Schedule for Roster/Hours Changes",
+                                   command=update_schedule)
+        update_button.pack(pady=5)
+        
+        def export_schedule():
+            workplace = self.current_workplace
+            if not workplace.shifts:
+                messagebox.showerror("Error", "Please generate a schedule first!")
+                return
+            path = filedialog.asksaveasfilename(
+                title="Export Schedule", defaultextension=".xlsx",
+                initialfile=f"{export.safe_filename(workplace.name)}_schedule.xlsx",
+                filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Word documents", "*.docx")])
+            if not path:
+                return
+            # Schedules are replaced rather than modified, so the export can read this one in the background
+            self.run_task(f"Exporting {workplace.name}", export.export_schedule, workplace.shifts, path,
+                          on_done=lambda written: messagebox.showinfo("Success", f"Schedule exported to {written}"),
+                          on_error=lambda e: messagebox.showerror("Error", f"Error exporting schedule: {str(e)}"))
+        
+        def export_calendars():
+            workplace = self.current_workplace
+            if not workplace.shifts:
+                messagebox.showerror("Error", "Please generate a schedule first!")
+                return
+            directory = filedialog.askdirectory(title="Folder for worker calendars")
+            if not directory:
+                return
+            self.run_task(f"Exporting calendars for {workplace.name}", export.export_calendars,
+                          workplace.shifts, directory, workplace.name,
+                          on_done=lambda count: messagebox.showinfo("Success", f"Wrote {count} calendar files "
+                                                                               f"to {directory}"),
+                          on_error=lambda e: messagebox.showerror("Error", f"Error exporting calendars: {str(e)}"))
+        
+        def show_coverage():
+            workplace = self.current_workplace
+            if not workplace.shifts:
+                messagebox.showerror("Error", "Please generate a schedule first!")
+                return
+            try:
+                report = coverage_report.analyze_coverage(workplace)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            
+            report_window = tk.Toplevel(self.root)
+            report_window.title(f"Coverage - {workplace.name}")
+            report_window.geometry("750x450")
+            report_text = tk.Text(report_window, wrap=tk.NONE, font=("TkFixedFont", 10))
+            report_scroll = ttk.Scrollbar(report_window, command=report_text.yview)
+            report_text.config(yscrollcommand=report_scroll.set)
+            report_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+            report_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+            report_text.insert(tk.END, report.format(limit=200))
+            report_text.config(state="disabled")
+        
+        export_frame = ttk.Frame(schedule_frame)
+        export_frame.pack(pady=5)
+        ttk.Button(export_frame, text="Coverage Report", command=show_coverage).pack(side=tk.LEFT, padx=5)
+        ttk.Button(export_frame, text="Export Schedule...", command=export_schedule).pack(side=tk.LEFT, padx=5)
+        ttk.Button(export_frame, text="Export Worker Calendars (.ics)...",
+                   command=export_calendars).pack(side=tk.LEFT, padx=5)
+        
         # Schedule display
         schedule_display = ttk.LabelFrame(schedule_frame, text="Generated Schedule")
         schedule_display.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Add scrollbar for schedule
-        schedule_scroll = ttk.Scrollbar(schedule_display)
-        schedule_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.schedule_text = tk.Text(schedule_display, wrap=tk.WORD,
-                                    yscrollcommand=schedule_scroll.set)
-        self.schedule_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        schedule_scroll.config(command=self.schedule_text.yview)
+        # Only the rows in view are drawn, so long schedules open instantly
+        self.schedule_view = ScheduleView(schedule_display)
+        self.schedule_view.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # Display existing schedule if available
         if hasattr(self.current_workplace, 'shifts') and self.current_workplace.shifts:
-            self.schedule_text.insert(tk.END, "Existing Schedule:\n\n")
-            for date, shifts in self.current_workplace.shifts.items():
-                if isinstance(date, str):
-                    date_str = date
-                else:
-                    date_str = date.strftime('%Y-%m-%d (%A)')
-                    
-                self.schedule_text.insert(tk.END, f"{date_str}\n")
-                self.schedule_text.insert(tk.END, "-" * 40 + "\n")
-                
-                for shift, workers in shifts.items():
-                    self.schedule_text.insert(tk.END, f"{shift}: {', '.join(workers)}\n")
-                
-                self.schedule_text.insert(tk.END, "\n")
+            self.schedule_view.set_schedule(self.current_workplace.shifts, "Existing Schedule:")
     
     def generate_ai_schedule(self, start_date, end_date, shift_length, min_staff):
         """
         Generate a schedule based on workplace data and constraints.
-        This is a simplified algorithm and could be enhanced with more AI techniques.
+        Workers are matched to shifts by availability and balanced by hours worked.
         """
-        schedule = {}
-        current_date = start_date
-        
-        # Get all workers
-        workers = [w["Name"] for w in self.current_workplace.workers]
-        
-        # For each day in the date range
-        while current_date <= end_date:
-            day_name = current_date.strftime("%A")
-            
-            # Skip days when workplace is closed
-            if day_name not in self.current_workplace.hours_of_operation:
-                current_date += timedelta(days=1)
-                continue
-            
-            # Get operating hours
-            start_time_str, end_time_str = self.current_workplace.hours_of_operation.get(
-                day_name, ("9:00", "17:00"))
-            
-            # Parse time strings to datetime objects for calculation
-            start_h, start_m = map(int, start_time_str.split(":"))
-            end_h, end_m = map(int, end_time_str.split(":"))
-            
-            # Calculate total operating hours
-            total_hours = (end_h - start_h) + (end_m - start_m) / 60
-            
-            # Calculate number of shifts
-            num_shifts = max(1, int(total_hours / shift_length))
-            
-            # Hours per shift
-            hours_per_shift = total_hours / num_shifts
-            
-            # Generate shifts
-            day_shifts = {}
-            for i in range(num_shifts):
-                shift_start_h = start_h + int(i * hours_per_shift)
-                shift_start_m = int((i * hours_per_shift - int(i * hours_per_shift)) * 60)
-                
-                shift_end_h = start_h + int((i + 1) * hours_per_shift)
-                shift_end_m = int(((i + 1) * hours_per_shift - int((i + 1) * hours_per_shift)) * 60)
-                
-                # Format shift times
-                shift_start = f"{shift_start_h:02d}:{shift_start_m:02d}"
-                shift_end = f"{shift_end_h:02d}:{shift_end_m:02d}"
-                shift_name = f"{shift_start} - {shift_end}"
-                
-                # Assign workers (simplified - random assignment)
-                # In a real AI scheduler, this would consider availability, skills, fairness, etc.
-                np.random.seed(int(current_date.timestamp()) + i)  # Deterministic for demo
-                assigned_workers = np.random.choice(
-                    workers, 
-                    size=min(len(workers), min_staff + np.random.randint(0, 3)),
-                    replace=False
-                ).tolist()
-                
-                day_shifts[shift_name] = assigned_workers
-            
-            schedule[current_date] = day_shifts
-            current_date += timedelta(days=1)
-        
-        return schedule
+        return scheduler_core.generate_ai_schedule(self.current_workplace, start_date, end_date,
+                                                   shift_length, min_staff)
     
     def save_workplaces(self):
-        try:
-            with open("workplaces.pkl", "wb") as f:
-                pickle.dump(self.workplaces, f)
+        # Edits are saved as they happen; this only waits for the pending ones to reach the store
+        def done(result):
             messagebox.showinfo("Success", "All workplaces saved successfully!")
-        except Exception as e:
+        
+        def failed(e):
             messagebox.showerror("Error", f"Error saving workplaces: {str(e)}")
+        
+        if self.autosave is None:
+            failed(RuntimeError("the workplace store could not be opened"))
+            return
+        self.run_task("Saving workplaces", self.autosave.flush, on_done=done, on_error=failed)
     
     def load_workplaces(self):
         try:
-            if os.path.exists("workplaces.pkl"):
-                with open("workplaces.pkl", "rb") as f:
-                    self.workplaces = pickle.load(f)
+            # Edits journaled before a crash go into the store first
+            recovered = autosave.recover(scheduler_core.DEFAULT_STORE)
+            if recovered:
+                self.status_label.config(text=f"Recovered {recovered} unsaved changes")
+            # Names only; see select_workplace
+            self.workplaces = scheduler_core.WorkplaceList()
+            schedule_cache.use_store(scheduler_core.DEFAULT_STORE)
+            self.autosave = autosave.Autosave(scheduler_core.DEFAULT_STORE)
         except Exception as e:
             messagebox.showerror("Error", f"Error loading workplaces: {str(e)}")
-            self.workplaces = []
+            self.workplaces = scheduler_core.WorkplaceList(names=[])
 
 def main():
-    root = tk.Tk()
-    app = WorkplaceSchedulerApp(root)
-    root.mainloop()
+    # SCHEDULER_INSTRUMENT / SCHEDULER_PROFILE, see instrumentation.py
+    instrumentation.enable_from_env()
+    with instrumentation.profile(instrumentation.profile_path_from_env()):
+        root = tk.Tk()
+        app = WorkplaceSchedulerApp(root)
+        root.mainloop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,269 @@
+"""
+Background autosave for the Tk app.
+
+Every edit is handed to `Autosave.record` / `record_removed` on the UI
+thread together with the part of the workplace it changed ("hours",
+"workers" or "schedule", or "add" for a new workplace). Only the attributes
+of that part are queued, see PARTS. A background thread then:
+
+* appends the change to a journal next to the store (<store>.autosave), as
+  length- and CRC-prefixed pickles, fsynced so a crash loses nothing that was
+  recorded;
+* every `interval` seconds, or after `max_records` changes, compacts: loads
+  each changed workplace from the store, applies its changes and writes it
+  back, then deletes the journal. SQLite stores are written incrementally
+  over the thread's own connection, legacy .pkl stores are rewritten to a
+  temporary file and renamed over the old one.
+
+`recover` replays a journal left behind by a crash into the store; Main.py
+calls it before listing workplaces.
+"""
+import os
+import pickle
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import instrumentation
+import scheduler_core
+from scheduler_core import Workplace
+
+JOURNAL_SUFFIX = ".autosave"
+# Each record is (length, crc32) followed by the pickled change
+_HEADER = struct.Struct(">II")
+
+
+def journal_path(path):
+    return path + JOURNAL_SUFFIX
+
+
+# The attributes each kind of edit changes. The availability index is left
+# out: it is derived from the workers and rebuilt when the change is written.
+PARTS = {
+    "hours": ("hours_of_operation", "shift_templates"),
+    "workers": ("workers", "excel_file"),
+    "schedule": ("shifts", "schedule_inputs"),
+}
+PARTS["add"] = sum(PARTS.values(), ())
+
+
+def _capture(workplace, part):
+    """
+    The attributes of `part`, as they are now. Edits replace attributes
+    rather than mutate them, so holding on to the values is enough and costs
+    next to nothing on the UI thread.
+    """
+    values = {attribute: getattr(workplace, attribute) for attribute in PARTS[part]}
+    if "hours_of_operation" in values:
+        values["hours_of_operation"] = dict(values["hours_of_operation"])
+    return values
+
+
+def read_journal(path):
+    """
+    The changes recorded in a journal, oldest first: (part, name, values,
+    names) with `values` the attributes of PARTS[part], or ("remove", name,
+    None, names). A torn record at the end (a crash mid-write) ends the
+    journal.
+    """
+    changes = []
+    if not os.path.exists(path):
+        return changes
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            length, crc = _HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length or zlib.crc32(data) != crc:
+                break
+            changes.append(pickle.loads(data))
+    return changes
+
+
+def _merge(state, change):
+    """
+    Fold one change into `state`: {name: None if removed, else (added,
+    {attribute: value})}, where added means the workplace is not built on
+    the stored one.
+    """
+    op, name, values, _ = change
+    if op == "remove":
+        state[name] = None
+    elif op == "add":
+        state[name] = (True, dict(values))
+    elif state.get(name, ()) is not None:
+        added, merged = state.get(name, (False, {}))
+        state[name] = (added, {**merged, **values})
+
+
+def _latest(changes):
+    """(state as in _merge, full name order) after applying `changes`."""
+    state, names = {}, None
+    for change in changes:
+        _merge(state, change)
+        names = change[3]
+    return state, names
+
+
+def _rebuild(name, added, values, stored):
+    """The workplace `stored` (None if not stored) with the changed attributes `values` applied."""
+    from solver import ensure_index
+
+    workplace = Workplace(name) if added or stored is None else stored
+    for attribute, value in values.items():
+        setattr(workplace, attribute, value)
+    if "workers" in values:
+        workplace.availability_index = None
+        ensure_index(workplace)
+    return workplace
+
+
+def compact(path, state, names, store=None):
+    """
+    Write the changes `state` (see _merge) into the store at `path`, with
+    `names` as the full order of workplaces.
+    """
+    changed = {name: change for name, change in state.items() if change is not None}
+    with instrumentation.phase("autosave", store=os.path.basename(path), workplaces=len(changed)):
+        if path.endswith(".pkl"):
+            stored = {wp.name: wp for wp in scheduler_core.load_pickle(path)}
+            for name, (added, values) in changed.items():
+                stored[name] = _rebuild(name, added, values, stored.get(name))
+            scheduler_core.save_pickle([stored[name] for name in names if name in stored], path)
+        else:
+            if store is None:
+                store = scheduler_core.get_store(path)
+            workplaces = []
+            for name, (added, values) in changed.items():
+                if added:
+                    # Removed and added again: nothing of the old one may survive
+                    store.delete(name)
+                    workplaces.append(_rebuild(name, added, values, None))
+                else:
+                    workplaces.append(_rebuild(name, added, values, store.load(name)))
+            # Only the changed workplaces are written; save_all drops the removed ones
+            store.save_all(workplaces, names)
+
+
+def recover(path=scheduler_core.DEFAULT_STORE):
+    """Apply a journal left over from a crashed session to the store; returns the number of changes."""
+    journal = journal_path(path)
+    changes = read_journal(journal)
+    if changes:
+        state, names = _latest(changes)
+        compact(path, state, names)
+    if os.path.exists(journal):
+        os.remove(journal)
+    return len(changes)
+
+
+class Autosave:
+    def __init__(self, path=scheduler_core.DEFAULT_STORE, interval=10.0, max_records=50):
+        self.path = path
+        self.journal = journal_path(path)
+        self.interval = interval
+        self.max_records = max_records
+        # Last failure of the background thread, reported by flush()
+        self.error = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def record(self, workplace, names, part):
+        """
+        Queue the `part` (a key of PARTS) of `workplace` that was just edited;
+        `names` is the full workplace order.
+        """
+        self._queue.put((part, workplace.name, _capture(workplace, part), list(names)))
+
+    def record_removed(self, name, names):
+        self._queue.put(("remove", name, None, list(names)))
+
+    def flush(self, progress=None):
+        """Block until everything recorded so far is in the store; raises the last background error."""
+        done = threading.Event()
+        self._queue.put(("flush", done, None, None))
+        while not done.wait(0.5):
+            if not self._thread.is_alive():
+                raise RuntimeError("Autosave has stopped")
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        """Write out pending changes and stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        # SQLite connections belong to one thread, so the autosave thread opens its own
+        self._store = None
+        if not self.path.endswith(".pkl"):
+            from storage import SQLiteStore
+
+            self._store = SQLiteStore(os.path.abspath(self.path))
+        self._file = None
+        self._state, self._names, self._records = {}, None, 0
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = ("due", None, None, None)
+                if item is None:
+                    self._compact()
+                    return
+                op, subject, _, names = item
+                if op == "remove" or op in PARTS:
+                    self._append(item)
+                    _merge(self._state, item)
+                    self._names = names
+                    self._records += 1
+                    if self._records < self.max_records:
+                        if deadline is None:
+                            deadline = time.monotonic() + self.interval
+                        continue
+                self._compact()
+                # Failed compactions are retried after another interval
+                deadline = time.monotonic() + self.interval if self._state else None
+                if op == "flush":
+                    subject.set()
+        finally:
+            if self._file is not None:
+                self._file.close()
+            if self._store is not None:
+                self._store.close()
+
+    def _append(self, change):
+        data = pickle.dumps(change, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            if self._file is None:
+                self._file = open(self.journal, "ab")
+            self._file.write(_HEADER.pack(len(data), zlib.crc32(data)) + data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            self.error = e
+
+    def _compact(self):
+        if not self._state:
+            return
+        try:
+            compact(self.path, self._state, self._names, self._store)
+        except Exception as e:
+            # The journal still holds the changes
+            self.error = e
+            return
+        # Everything in the journal is in the store now; a crash before this line just replays it
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.journal):
+            os.remove(self.journal)
+        self._state, self._records = {}, 0
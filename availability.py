@@ -0,0 +1,324 @@
+"""
+Parsing of the free-text "Availability" column into weekly time intervals.
+
+A parsed availability is a tuple of 7 entries (Monday .. Sunday), each a
+tuple of sorted, non-overlapping (start_minute, end_minute) pairs.
+
+Rosters repeat the same few strings over and over, across workplaces too, so
+results are memoized in a bounded LRU keyed by the normalized text; see
+cache_info() for hit and miss counts.
+"""
+import re
+from functools import lru_cache
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MINUTES_PER_DAY = 24 * 60
+
+ALWAYS = tuple(((0, MINUTES_PER_DAY),) for _ in range(7))
+NEVER = tuple(() for _ in range(7))
+
+# Distinct normalized availability strings kept parsed
+CACHE_SIZE = 4096
+
+_DAY_PREFIXES = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+
+_ALWAYS_WORDS = {"any", "anytime", "all", "always", "open", "flexible", "full", "24/7"}
+_NEVER_WORDS = {"none", "unavailable", "not available", "n/a", "na", "never", "no"}
+
+# Parts of the day named in words, as (start, end) minutes
+_PERIODS = {"morning": (6 * 60, 12 * 60), "afternoon": (12 * 60, 17 * 60),
+            "evening": (17 * 60, 22 * 60), "night": (22 * 60, 6 * 60), "overnight": (22 * 60, 6 * 60)}
+
+# Letter codes from US-style exports
+_LETTER_GROUPS = {"mwf": (0, 2, 4), "tth": (1, 3)}
+
+# Full and three-letter names plus the two-letter forms some exports use ("Tu/Th")
+_DAY = r"\b(?:(?:mon|tue|wed|thu|fri|sat|sun)[a-z]*|mo|tu|we|th|fr|sa|su)\b\.?"
+# "9", "9:30", "9.30", "0930", each optionally followed by am/pm, a.m./p.m. or a lone a/p.
+# A lone letter has to end the word, so the "a" of "9-5 and Sat" is not a meridiem.
+_MERIDIEM = r"(?:[ap]\.?m\b\.?|[ap]\b\.?)"
+_TIME = r"(?:noon|midnight|\d{1,2}(?:[:.]?\d{2})?\s*" + _MERIDIEM + r"?)"
+_RANGE_SEP = r"\s*(?:-|to|until|till)\s*"
+
+_TOKEN_RE = re.compile(
+    r"(?P<dayrange>" + _DAY + _RANGE_SEP + _DAY + r")"
+    r"|(?P<group>weekdays?|weekends?|daily|every\s*day|\bm\s*-\s*f\b|\bmwf\b|\btth\b)"
+    r"|(?P<day>" + _DAY + r")"
+    r"|(?P<timerange>" + _TIME + _RANGE_SEP + _TIME + r")"
+    r"|(?P<after>\bafter\s+" + _TIME + r")"
+    r"|(?P<before>\b(?:before|until|till)\s+" + _TIME + r")"
+    r"|(?P<period>\b(?:mornings?|afternoons?|evenings?|overnights?|nights?)\b)"
+)
+_TIME_RE = re.compile(r"^(?:(noon|midnight)|(\d{1,2})(?:[:.]?(\d{2}))?\s*(?:([ap])\.?(?:m\.?)?)?)$")
+# Everything after one of these words is taken away: "Any except Sundays", "Mon-Fri, not Wed"
+_EXCEPT_RE = re.compile(r"\b(?:except|excluding|but\s+not|not|no)\b")
+# Days named right before one of these, at the end of a group, are taken away: "Mon-Fri 9-5, Sat not available"
+_OFF_RE = re.compile(r"\s*:?\s*\b(?:not\s+available|unavailable|off)\b\.?(?=\s*(?:[,;]|$))")
+_DAY_KINDS = ("dayrange", "group", "day")
+
+
+def _day_index(token):
+    token = token.strip(". ")
+    return _DAY_PREFIXES[token[:3]] if len(token) > 2 else _SHORT_DAYS[token]
+
+
+_SHORT_DAYS = {"mo": 0, "tu": 1, "we": 2, "th": 3, "fr": 4, "sa": 5, "su": 6}
+
+
+def _parse_time(text):
+    """Return (minutes, meridiem) for a single time token, meridiem being 'am', 'pm' or None."""
+    match = _TIME_RE.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid time: {text!r}")
+    word, hour, minute, meridiem = match.groups()
+    if word == "noon":
+        return 12 * 60, "pm"
+    if word == "midnight":
+        return 0, "am"
+    hour = int(hour)
+    minute = int(minute or 0)
+    if hour > 24 or minute > 59:
+        raise ValueError(f"Invalid time: {text!r}")
+    if meridiem:
+        meridiem = "am" if meridiem.startswith("a") else "pm"
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    return hour * 60 + minute, meridiem
+
+
+def _parse_time_range(text):
+    """Parse "9-5", "9:30am - 1pm", "22:00-06:00" into (start, end) minutes.
+
+    Bare hours follow the usual rota shorthand: "9-5" is 09:00-17:00 and
+    "1-5" is 13:00-17:00. The end may be <= start for overnight ranges.
+    """
+    start_text, end_text = re.split(_RANGE_SEP, text, maxsplit=1)
+    start, start_mer = _parse_time(start_text)
+    end, end_mer = _parse_time(end_text)
+
+    if start_mer is None and end_mer == "pm" and start < 12 * 60 and start + 12 * 60 < end:
+        start += 12 * 60
+    elif start_mer is None and end_mer is None and end < 12 * 60:
+        if 60 <= start < 7 * 60:
+            start += 12 * 60
+            end += 12 * 60
+        elif end <= start <= 12 * 60:
+            end += 12 * 60
+    if end == 24 * 60 and start == 0:
+        return 0, MINUTES_PER_DAY
+    return start % MINUTES_PER_DAY, end % MINUTES_PER_DAY
+
+
+def _merge(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
+def _subtract(intervals, removed):
+    """Parts of merged `intervals` not covered by merged `removed`."""
+    result = []
+    for start, end in intervals:
+        for cut_start, cut_end in removed:
+            if cut_end <= start or cut_start >= end:
+                continue
+            if cut_start > start:
+                result.append((start, cut_start))
+            start = max(start, cut_end)
+            if start >= end:
+                break
+        if start < end:
+            result.append((start, end))
+    return tuple(result)
+
+
+def _is_blank(value):
+    # pandas hands missing cells over as float NaN
+    return value is None or (isinstance(value, float) and value != value) or not str(value).strip()
+
+
+def normalize(value):
+    """Cache key for an availability cell: lower case, one kind of dash, single spaces."""
+    text = str(value).strip().lower().replace("\u2013", "-").replace("\u2014", "-")
+    # Line breaks separate groups of days like ";" does, see parse_availability()
+    text = re.sub(r"\s*[;\n]+\s*", "; ", text)
+    return re.sub(r"[ \t]+", " ", text)
+
+
+def parse_availability(value):
+    """
+    Parse an availability cell such as "Mon-Fri 9-5; Sat 10:00-14:00".
+
+    Blank or unrecognised values are treated as always available, so rosters
+    without a usable Availability column keep scheduling as before. Explicit
+    "none"/"unavailable" parses to no availability at all.
+    """
+    if _is_blank(value):
+        return ALWAYS
+    return _parse_normalized(normalize(value))
+
+
+def cache_info():
+    """Hits, misses and size of the shared parse cache."""
+    return _parse_normalized.cache_info()
+
+
+def clear_cache():
+    _parse_normalized.cache_clear()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_normalized(text):
+    if text in _ALWAYS_WORDS:
+        return ALWAYS
+    if text in _NEVER_WORDS:
+        return NEVER
+
+    text, days_off = _split_days_off(text)
+    parts = _EXCEPT_RE.split(text, maxsplit=1)
+    base = parts[0].strip(" ,;")
+    week = _parse_text(base) if base and base not in _ALWAYS_WORDS else None
+    if week is None:
+        week = ALWAYS
+    if len(parts) > 1:
+        excluded = _parse_text(parts[1])
+        if excluded is not None:
+            week = tuple(_subtract(day, removed) for day, removed in zip(week, excluded))
+    if days_off:
+        week = tuple(() if day in days_off else intervals for day, intervals in enumerate(week))
+    return week
+
+
+def _split_days_off(text):
+    """(`text` without its "<days> off" phrases, the weekdays they name)."""
+    days_off = set()
+    position = 0
+    while True:
+        match = _OFF_RE.search(text, position)
+        if match is None:
+            return text, days_off
+        # The days are the run of day tokens just before the phrase
+        first = None
+        days = []
+        for token in reversed(list(_TOKEN_RE.finditer(text, 0, match.start()))):
+            if token.lastgroup not in _DAY_KINDS:
+                break
+            first = token.start()
+            days.extend(_days_of(token.lastgroup, token.group(token.lastgroup)))
+        if not days:
+            position = match.end()
+            continue
+        days_off.update(days)
+        text = text[:first] + text[match.end():]
+        position = first
+
+
+def _parse_text(text):
+    """Parsed week for `text`, or None when nothing in it is recognised."""
+    week = [[] for _ in range(7)]
+    matched = False
+    # ";" and line breaks always start a new group of days
+    for segment in re.split(r"[;\n]+", text):
+        matched = _parse_segment(segment, week) or matched
+
+    if not matched:
+        return None
+    return tuple(_merge(day) for day in week)
+
+
+def _parse_open_end(text, kind):
+    """(start, end) for "after 5pm" / "before 2" style tokens."""
+    minutes, meridiem = _parse_time(re.sub(r"^[a-z]+\s+", "", text))
+    if meridiem is None and 60 <= minutes < 7 * 60:
+        # Bare small hours mean the afternoon, as in "after 5"
+        minutes += 12 * 60
+    if kind == "after":
+        return minutes, MINUTES_PER_DAY
+    if not minutes:
+        raise ValueError(f"Empty range: {text!r}")
+    return 0, minutes
+
+
+def _parse_segment(text, week):
+    """Add the intervals described by one segment to `week`; return whether anything matched."""
+    days = []
+    days_have_time = False
+    matched = False
+
+    def close_group():
+        # Days listed without any time range are available all day
+        if days and not days_have_time:
+            for day in days:
+                week[day].append((0, MINUTES_PER_DAY))
+
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        token = match.group(kind)
+        matched = True
+        if kind in ("timerange", "after", "before", "period"):
+            try:
+                if kind == "timerange":
+                    start, end = _parse_time_range(token)
+                elif kind == "period":
+                    start, end = _PERIODS[token.rstrip("s")]
+                else:
+                    start, end = _parse_open_end(token, kind)
+            except ValueError:
+                continue
+            for day in days or range(7):
+                if end > start:
+                    week[day].append((start, end))
+                else:
+                    # Overnight range spills into the following day
+                    week[day].append((start, MINUTES_PER_DAY))
+                    if end:
+                        week[(day + 1) % 7].append((0, end))
+            days_have_time = True
+            continue
+
+        if days_have_time:
+            days = []
+            days_have_time = False
+        elif days and kind != "day" and kind != "dayrange":
+            close_group()
+            days = []
+        days.extend(_days_of(kind, token))
+    close_group()
+    return matched
+
+
+def _days_of(kind, token):
+    """Weekday indices named by a "dayrange", "group" or "day" token."""
+    if kind == "dayrange":
+        first, last = re.split(_RANGE_SEP, token, maxsplit=1)
+        first, last = _day_index(first), _day_index(last)
+        return [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+    if kind == "group":
+        if token in _LETTER_GROUPS:
+            return list(_LETTER_GROUPS[token])
+        if token.startswith("weekday") or token.startswith("m"):
+            return list(range(5))
+        if token.startswith("weekend"):
+            return [5, 6]
+        return list(range(7))
+    return [_day_index(token)]
+
+
+def is_available(availability, weekday, start, end):
+    """
+    Check whether a parsed availability fully covers [start, end) minutes
+    on the given weekday. `end` may run past midnight (end > 1440).
+    """
+    if end > MINUTES_PER_DAY:
+        return (is_available(availability, weekday, start, MINUTES_PER_DAY)
+                and is_available(availability, (weekday + 1) % 7, 0, end - MINUTES_PER_DAY))
+    for interval_start, interval_end in availability[weekday]:
+        if interval_start <= start and end <= interval_end:
+            return True
+        if interval_start > start:
+            break
+    return False
@@ -0,0 +1,98 @@
+"""
+Bit-packed availability index for a workplace roster.
+
+The index holds one bit per worker for every 15-minute slot of every weekday,
+packed along the worker axis: `bits[weekday, slot]` is a row of
+ceil(workers / 8) bytes. Questions like "who can cover 09:00-13:00 on
+Tuesday" become an AND over a handful of rows plus a popcount.
+"""
+import hashlib
+
+import numpy as np
+
+from availability import MINUTES_PER_DAY, parse_availability
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+
+# Number of set bits in every possible byte
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def roster_signature(workers):
+    """Stable digest of the roster's names and availability, used to detect stale indexes."""
+    digest = hashlib.sha1()
+    for worker in workers:
+        digest.update(f"{worker.get('Name')}\x1f{worker.get('Availability')}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AvailabilityIndex:
+    def __init__(self, bits, worker_count, signature=None):
+        self.bits = bits
+        self.worker_count = worker_count
+        self.signature = signature
+
+    @classmethod
+    def from_workers(cls, workers):
+        """Build the index for a list of worker records (dicts with an Availability key)."""
+        worker_count = len(workers)
+        # Identical availability strings are common, so parse each one once
+        patterns = {}
+        pattern_rows = np.empty(worker_count, dtype=np.int64)
+        for i, worker in enumerate(workers):
+            key = worker.get("Availability")
+            key = None if key is None or (isinstance(key, float) and key != key) else str(key)
+            pattern_rows[i] = patterns.setdefault(key, len(patterns))
+
+        grid = np.zeros((len(patterns), 7, SLOTS_PER_DAY), dtype=bool)
+        for key, row in patterns.items():
+            for weekday, intervals in enumerate(parse_availability(key)):
+                for start, end in intervals:
+                    # Only slots the interval covers completely count as available
+                    first = -(-start // SLOT_MINUTES)
+                    last = end // SLOT_MINUTES
+                    grid[row, weekday, first:last] = True
+
+        per_worker = grid[pattern_rows]
+        bits = np.packbits(per_worker.transpose(1, 2, 0), axis=-1)
+        return cls(bits, worker_count, roster_signature(workers))
+
+    def matches(self, workers):
+        """Whether this index was built from exactly these workers."""
+        return self.worker_count == len(workers) and self.signature == roster_signature(workers)
+
+    def pack(self, flags):
+        """Pack a per-worker boolean array into the index's bitset layout."""
+        return np.packbits(np.asarray(flags, dtype=bool))
+
+    def mask(self, weekday, start, end):
+        """Bitset of workers available for all of [start, end) minutes; end may pass midnight."""
+        if end > MINUTES_PER_DAY:
+            return (self.mask(weekday, start, MINUTES_PER_DAY)
+                    & self.mask((weekday + 1) % 7, 0, end - MINUTES_PER_DAY))
+        first = start // SLOT_MINUTES
+        last = -(-end // SLOT_MINUTES)
+        if last <= first:
+            return np.full(self.bits.shape[-1], 0xFF, dtype=np.uint8)
+        return np.bitwise_and.reduce(self.bits[weekday, first:last], axis=0)
+
+    def unpack(self, mask):
+        """Worker indices set in a bitset."""
+        return np.flatnonzero(np.unpackbits(mask, count=self.worker_count))
+
+    def is_available(self, worker, weekday, start, end):
+        """Whether a single worker (by index) covers [start, end) minutes on `weekday`."""
+        # packbits stores the first worker of each byte in its highest bit
+        return bool(self.mask(weekday, start, end)[worker >> 3] & (0x80 >> (worker & 7)))
+
+    def available_workers(self, weekday, start, end):
+        return self.unpack(self.mask(weekday, start, end))
+
+    def count_available(self, weekday, start, end):
+        return int(_POPCOUNT[self.mask(weekday, start, end)].sum())
+
+    def slot_counts(self, mask=None):
+        """(7, SLOTS_PER_DAY) number of available workers per slot, optionally only those in `mask`."""
+        bits = self.bits if mask is None else self.bits & mask
+        return _POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
@@ -0,0 +1,277 @@
+"""
+Hours-balancing schedule optimizer.
+
+Unlike the per-day min-cost flow in solver.py, this mode keeps running
+per-worker totals across the whole date range and honours the roster's
+optional "Max Hours" / "Min Hours" columns, read as hours per 7 days counted
+from the start of the range.
+
+Each 7-day window is solved in two steps:
+
+* a greedy pass pops shifts from a heap keyed by how many eligible workers
+  they have left, so the hardest-to-staff shifts pick first, and gives each
+  one the workers furthest below their minimum, then those with the fewest
+  minutes so far;
+* a local-search pass moves single assignments to another eligible worker
+  whenever that lowers the total minimum-hours shortfall or, at equal
+  shortfall, the sum of squared totals (a flatter spread of hours).
+
+Windows can also start from a `Carry`: hours already worked, the shifts of
+the day before (for minimum rest between shifts) and the previous week's
+assignments to seed the greedy pass with. rolling.py builds one from the
+stored schedule.
+"""
+import heapq
+from datetime import timedelta
+
+import numpy as np
+
+import schedule_cache
+from availability import MINUTES_PER_DAY
+from shift_templates import ShiftPlan
+from solver import ensure_index
+
+WINDOW_DAYS = 7
+NO_LIMIT = np.iinfo(np.int64).max // 4
+
+
+def _hours_column(workers, column, default):
+    minutes = np.full(len(workers), default, dtype=np.int64)
+    for i, worker in enumerate(workers):
+        try:
+            hours = float(worker.get(column))
+        except (TypeError, ValueError):
+            continue
+        if hours == hours and hours >= 0:
+            minutes[i] = int(round(hours * 60))
+    return minutes
+
+
+def hour_limits(workers):
+    """(min, max) minutes per 7 days for every worker; blank cells mean no limit."""
+    return _hours_column(workers, "Min Hours", 0), _hours_column(workers, "Max Hours", NO_LIMIT)
+
+
+class Carry:
+    """
+    State a window starts from: minutes worked so far per worker, the end
+    minute of each worker's shift on the day before (-NO_LIMIT if none) and
+    {(weekday, shift name): [worker indices]} of the week before.
+    """
+
+    def __init__(self, total, last_ends=None, previous=None):
+        self.total = total
+        self.last_ends = last_ends
+        self.previous = previous or {}
+
+
+class _Window:
+    """Assignment state of one 7-day window."""
+
+    def __init__(self, slots, weekdays, worker_count, day_count, rest=0, last_ends=None):
+        self.slots = slots  # [(day, shift name, start, end, demand, candidates)]
+        self.weekdays = weekdays
+        self.assigned = [[] for _ in slots]
+        self.busy = np.zeros((day_count, worker_count), dtype=bool)
+        self.week = np.zeros(worker_count, dtype=np.int64)
+        self.rest = rest
+        # Start/end minute of each worker's shift per day; row r is day r - 1 of the
+        # window, so row 0 holds the day before and the last row the day after.
+        # Kept even without rest, so overnight shifts never overlap the next day's.
+        self.starts = np.full((day_count + 2, worker_count), NO_LIMIT, dtype=np.int64)
+        self.ends = np.full((day_count + 2, worker_count), -NO_LIMIT, dtype=np.int64)
+        if last_ends is not None:
+            self.ends[0] = last_ends
+
+    def take(self, k, workers, total):
+        day, _, start, end, _, _ = self.slots[k]
+        self.busy[day, workers] = True
+        self.week[workers] += end - start
+        total[workers] += end - start
+        self.starts[day + 1, workers] = start
+        self.ends[day + 1, workers] = end
+
+    def give_up(self, k, worker, total):
+        day, _, start, end, _, _ = self.slots[k]
+        self.busy[day, worker] = False
+        self.week[worker] -= end - start
+        total[worker] -= end - start
+        self.starts[day + 1, worker] = NO_LIMIT
+        self.ends[day + 1, worker] = -NO_LIMIT
+
+    def last_ends(self):
+        """End minutes on the window's last day, relative to that day, for the next window."""
+        return self.ends[-2].copy()
+
+
+def _eligible(window, k, min_minutes, max_minutes, candidates=None):
+    day, _, start, end, _, slot_candidates = window.slots[k]
+    if candidates is None:
+        candidates = slot_candidates
+    length = end - start
+    fits = ~window.busy[day, candidates] & (window.week[candidates] + length <= max_minutes[candidates])
+    # Enough rest after yesterday's shift and before tomorrow's (no close-then-open); with
+    # no rest this still keeps overnight shifts from overlapping the next day's
+    fits &= window.ends[day, candidates] + window.rest <= start + MINUTES_PER_DAY
+    fits &= end + window.rest <= window.starts[day + 2, candidates] + MINUTES_PER_DAY
+    return candidates[fits]
+
+
+def _seed(window, previous, total, min_minutes, max_minutes):
+    """Warm start: give each shift back to whoever held it the week before, where still allowed."""
+    for k, (_, name, _, _, demand, candidates) in enumerate(window.slots):
+        weekday = window.weekdays[k]
+        held = previous.get((weekday, name))
+        if not held:
+            continue
+        held = np.intersect1d(np.asarray(held, dtype=np.int64), candidates)
+        keep = _eligible(window, k, min_minutes, max_minutes, held)[:demand]
+        if len(keep):
+            window.take(k, keep, total)
+            window.assigned[k] = keep.tolist()
+
+
+def _greedy(window, total, min_minutes, max_minutes):
+    heap = [(len(slot[5]), k) for k, slot in enumerate(window.slots) if slot[4] > 0 and len(slot[5])]
+    heapq.heapify(heap)
+    while heap:
+        count, k = heapq.heappop(heap)
+        eligible = _eligible(window, k, min_minutes, max_minutes)
+        if len(eligible) < count:
+            # Stale key: earlier picks took some of its workers, so requeue it at its real scarcity
+            heapq.heappush(heap, (len(eligible), k))
+            continue
+        need = window.slots[k][4] - len(window.assigned[k])
+        if not len(eligible) or need <= 0:
+            continue
+        shortfall = np.maximum(min_minutes[eligible] - window.week[eligible], 0)
+        order = np.lexsort((eligible, total[eligible], -shortfall))
+        chosen = eligible[order[:need]]
+        window.take(k, chosen, total)
+        window.assigned[k] = window.assigned[k] + chosen.tolist()
+
+
+def _improve(window, total, min_minutes, max_minutes, passes):
+    for _ in range(passes):
+        moved = False
+        for k, (day, _, start, end, _, candidates) in enumerate(window.slots):
+            length = end - start
+            for position, worker in enumerate(window.assigned[k]):
+                eligible = _eligible(window, k, min_minutes, max_minutes)
+                if not len(eligible):
+                    break
+                # Shortfall change if `worker` gives this shift to each eligible worker
+                week_from = window.week[worker]
+                shortfall_from = (max(0, min_minutes[worker] - (week_from - length))
+                                  - max(0, min_minutes[worker] - week_from))
+                week_to = window.week[eligible]
+                shortfall_to = (np.maximum(min_minutes[eligible] - (week_to + length), 0)
+                                - np.maximum(min_minutes[eligible] - week_to, 0))
+                shortfall_delta = shortfall_from + shortfall_to
+                square_delta = 2 * length * (total[eligible] - total[worker] + length)
+                best = np.lexsort((eligible, square_delta, shortfall_delta))[0]
+                if shortfall_delta[best] > 0 or (shortfall_delta[best] == 0 and square_delta[best] >= 0):
+                    continue
+                other = int(eligible[best])
+                window.give_up(k, worker, total)
+                window.take(k, other, total)
+                window.assigned[k][position] = other
+                moved = True
+        if not moved:
+            break
+
+
+def balance_schedule(workplace, start_date, end_date, shift_length, min_staff, positions=None,
+                     progress=None, passes=3, rest_hours=0, carry=None, exclude=None, steps=None):
+    """
+    Generate a schedule for `workplace` between start_date and end_date
+    (inclusive) that spreads hours evenly and respects per-worker hour limits.
+
+    Takes the same arguments and returns the same {date: {shift: [names]}}
+    layout as solver.generate_schedule. `passes` bounds the local-search
+    rounds per window. `progress(days_done, total_days)` is called after
+    every window; it may raise to abort the run.
+
+    `rest_hours` is the least time off between two shifts. With a `carry`,
+    hours and rest continue from it and every window is seeded with the
+    assignments of the week before. `exclude` drops candidates booked
+    elsewhere and `steps` caches windows, as in solver.generate_schedule.
+    """
+    roster = workplace.workers
+    index = ensure_index(workplace)
+    names = [w.name for w in roster]
+    qualified = index.pack([name.strip() != "" and (positions is None or w.position in positions)
+                            for name, w in zip(names, roster)])
+    min_minutes, max_minutes = hour_limits(roster)
+    rest = int(round(rest_hours * 60))
+    if carry is not None:
+        total = np.array(carry.total, dtype=np.int64)
+        last_ends, previous = carry.last_ends, carry.previous
+    else:
+        total = np.zeros(len(roster), dtype=np.int64)
+        last_ends, previous = None, None
+
+    plan = ShiftPlan.for_workplace(workplace, shift_length)
+    slots = plan.slots(start_date, end_date)
+    total_days = (end_date - start_date).days + 1
+    slot_days = slots["day"].tolist()
+    mask_cache = {}
+
+    schedule = {}
+    first = 0
+    for window_start in range(0, total_days, WINDOW_DAYS):
+        if progress is not None:
+            progress(window_start, total_days)
+        day_count = min(WINDOW_DAYS, total_days - window_start)
+        last = first
+        while last < len(slot_days) and slot_days[last] < window_start + day_count:
+            last += 1
+
+        window_slots, weekdays = [], []
+        for j in range(first, last):
+            weekday, shift = int(slots["weekday"][j]), int(slots["shift"][j])
+            start, end = int(slots["start"][j]), int(slots["end"][j])
+            # The same weekday shift recurs every week; unpack its candidates once
+            candidates = mask_cache.get((weekday, shift))
+            if candidates is None:
+                candidates = mask_cache[(weekday, shift)] = index.unpack(index.mask(weekday, start, end) & qualified)
+            if exclude is not None:
+                candidates = exclude(start_date + timedelta(days=slot_days[j]), start, end, candidates)
+            window_slots.append((slot_days[j] - window_start, plan.names[weekday][shift], start, end,
+                                 min_staff, candidates))
+            weekdays.append(weekday)
+        first = last
+
+        window = _Window(window_slots, weekdays, len(roster), day_count, rest, last_ends)
+        cached = None
+        if steps is not None:
+            # A window's result only depends on the inputs and the state it starts from
+            label = ("window", (start_date + timedelta(days=window_start)).toordinal(), day_count, passes, rest)
+            state = schedule_cache.state_digest(total, last_ends, sorted(previous.items()) if previous else None)
+            cached = steps.get(label, state)
+        if cached is not None:
+            for k, assigned in enumerate(cached):
+                if assigned:
+                    window.take(k, np.asarray(assigned, dtype=np.int64), total)
+                    window.assigned[k] = list(assigned)
+        else:
+            if previous:
+                _seed(window, previous, total, min_minutes, max_minutes)
+            _greedy(window, total, min_minutes, max_minutes)
+            _improve(window, total, min_minutes, max_minutes, passes)
+            if steps is not None:
+                steps.put(label, state, [list(assigned) for assigned in window.assigned])
+        last_ends = window.last_ends()
+        if carry is not None:
+            previous = {(weekday, slot[1]): assigned
+                        for weekday, slot, assigned in zip(weekdays, window_slots, window.assigned)}
+
+        for day in range(day_count):
+            date = start_date + timedelta(days=window_start + day)
+            if not plan.counts[date.weekday()]:
+                continue
+            schedule[date] = {name: [names[i] for i in sorted(assigned)]
+                              for (slot_day, name, *_), assigned in zip(window.slots, window.assigned)
+                              if slot_day == day}
+
+    return schedule
@@ -0,0 +1,148 @@
+"""
+Parallel schedule generation for many workplaces at once.
+
+Every workplace is solved as an independent task on a process pool, over
+its whole date range, so each schedule is the one generating that workplace
+on its own would give, and the merged result is identical for any
+`max_workers`.
+
+In "flow" mode, `days_per_chunk` also cuts long ranges into fixed chunks
+solved as separate tasks. Chunk boundaries depend only on the date range,
+never on the number of processes, but every chunk starts counting hours from
+zero: hours are evened out within each chunk only, and the result depends on
+the chunk size. The "balanced" and "rolling" modes carry hour totals across
+the whole range, so they are never chunked.
+
+Workplaces that share workers (see registry.py) form one task: chunk by
+chunk, each of them is solved in turn against a shared registry, so nobody
+is booked at two workplaces at overlapping times.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import instrumentation
+from scheduler_core import apply_schedule, generate_ai_schedule, snapshot
+
+
+def split_range(start_date, end_date, days_per_chunk=7):
+    """Split [start_date, end_date] into consecutive (chunk_start, chunk_end) pairs."""
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=days_per_chunk - 1), end_date)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def new_pool(max_workers=None):
+    """Process pool for solve_all."""
+    # Workers would otherwise inherit instrumentation and all write to the same rolling log
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1, initializer=instrumentation.disable)
+
+
+def _solve_chunk(task):
+    group, workplaces, chunks, shift_length, min_staff, mode, positions, registry = task
+    solved = []
+    for chunk_start, chunk_end in chunks:
+        for index, workplace in zip(group, workplaces):
+            exclude = registry.exclusion(workplace.workers) if registry is not None else None
+            schedule = generate_ai_schedule(workplace, chunk_start, chunk_end, shift_length, min_staff, mode=mode,
+                                            exclude=exclude, positions=positions)
+            if len(workplaces) > 1:
+                # The group's later workplaces must see these bookings
+                registry.commit_schedule(workplace.name, workplace.workers, schedule)
+            solved.append((index, schedule))
+    return solved
+
+
+def solve_all(workplaces, start_date, end_date, shift_length, min_staff,
+              max_workers=None, days_per_chunk=None, progress=None, mode="flow", booked=None, pool=None,
+              positions=None):
+    """
+    Solve every workplace with imported workers without modifying any of
+    them. Returns (workplace, schedule) pairs in input order.
+
+    `max_workers` defaults to all cores; 1 solves everything in this process.
+    `days_per_chunk` splits flow ranges into chunks, see the module docstring.
+    `progress(tasks_done, total_tasks)` may raise to abort the run.
+    `booked` is a registry.WorkerRegistry of shifts workers already have at
+    workplaces not being solved; they are kept out of those times. `pool` is
+    a ProcessPoolExecutor to run on instead of starting one for this call.
+    `positions` limits shifts to workers holding one of them.
+    """
+    from registry import WorkerRegistry, shared_groups, shared_keys, worker_key
+
+    scheduled = [wp for wp in workplaces if wp.workers]
+    if mode in ("balanced", "rolling") or days_per_chunk is None:
+        chunks = [(start_date, end_date)]
+    else:
+        chunks = split_range(start_date, end_date, days_per_chunk)
+    # Ship only what the solver needs; past schedules can be large
+    snapshots = [snapshot(workplace, history_before=start_date if mode == "rolling" else None)
+                 for workplace in scheduled]
+    tasks = []
+    for group in shared_groups(snapshots):
+        members = [snapshots[position] for position in group]
+        registry = None
+        if booked is not None:
+            registry = booked.subset({worker_key(w) for wp in members for w in wp.workers} - {None})
+            if not registry.booked:
+                registry = None
+        if len(group) > 1:
+            registry = registry or WorkerRegistry()
+            registry.watch(shared_keys(members))
+            tasks.append((group, members, chunks, shift_length, min_staff, mode, positions, registry))
+        else:
+            for chunk in chunks:
+                tasks.append((group, members, [chunk], shift_length, min_staff, mode, positions, registry))
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    with instrumentation.phase("generate_all", workplaces=len(scheduled), tasks=len(tasks), mode=mode,
+                               jobs=max_workers):
+        results = []
+        if pool is None and (max_workers == 1 or len(tasks) <= 1):
+            for task in tasks:
+                results.append(_solve_chunk(task))
+                if progress is not None:
+                    progress(len(results), len(tasks))
+        else:
+            chunksize = max(1, len(tasks) // (max_workers * 4))
+            own_pool = pool is None
+            if own_pool:
+                pool = new_pool(max_workers)
+            try:
+                for result in pool.map(_solve_chunk, tasks, chunksize=chunksize):
+                    results.append(result)
+                    if progress is not None:
+                        progress(len(results), len(tasks))
+            except BaseException:
+                # A shared pool keeps running; dropping the map iterator cancels the tasks it has not started
+                if own_pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            finally:
+                if own_pool:
+                    pool.shutdown()
+
+    schedules = [{} for _ in scheduled]
+    for result in results:
+        for index, schedule in result:
+            schedules[index].update(schedule)
+    return [(workplace, dict(sorted(schedule.items()))) for workplace, schedule in zip(scheduled, schedules)]
+
+
+def generate_all(workplaces, start_date, end_date, shift_length, min_staff,
+                 max_workers=None, days_per_chunk=None, progress=None, mode="flow", booked=None, positions=None):
+    """
+    Generate schedules for every workplace with imported workers and store
+    them in each `Workplace.shifts`. Returns the workplaces that were scheduled.
+    """
+    solved = solve_all(workplaces, start_date, end_date, shift_length, min_staff,
+                       max_workers, days_per_chunk, progress, mode, booked, positions=positions)
+    for workplace, schedule in solved:
+        apply_schedule(workplace, schedule, start_date, end_date, shift_length, min_staff,
+                       keep_history=mode == "rolling", mode=mode, positions=positions)
+    return [workplace for workplace, _ in solved]
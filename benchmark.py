@@ -0,0 +1,305 @@
+"""
+Scheduling benchmark suite.
+
+Builds synthetic workplaces across size tiers and times the main phases:
+roster import (CSV and xlsx), schedule generation (solved, and again as a
+cache hit), pickle and SQLite save/load, and schedule rendering. Results are
+printed as JSON so runs can be diffed between versions.
+
+It also measures cold start in a fresh interpreter: importing Main and
+listing the workplaces of a populated store, and which heavy modules got
+imported along the way (none should be, until a workplace is opened).
+
+    python benchmark.py                         # 50/1k/10k workers x 7/90/365 days
+    python benchmark.py --workers 50,1000 --days 7 --output bench.json
+    python benchmark.py --startup-only
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import availability
+import schedule_cache
+import scheduler_core
+from scheduler_core import Workplace
+
+WORKER_TIERS = [50, 1000, 10000]
+DAY_TIERS = [7, 90, 365]
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn",
+               "Drew", "Skyler", "Reese", "Rowan", "Hayden", "Parker", "Emerson", "Finley", "Logan", "Sage"]
+LAST_NAMES = ["Smith", "Johnson", "Lee", "Garcia", "Brown", "Davis", "Miller", "Wilson", "Moore", "Clark",
+              "Lewis", "Walker", "Hall", "Young", "King", "Wright", "Scott", "Green", "Baker", "Adams"]
+# Modules the home screen must not need; importing any of them at startup is a regression
+HEAVY_MODULES = ["numpy", "scipy", "pandas", "openpyxl", "docx", "pyarrow"]
+STARTUP_RUNS = 5
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import Main
+imported = time.perf_counter()
+names = Main.scheduler_core.WorkplaceList(sys.argv[1]).names
+listed = time.perf_counter()
+print(json.dumps({"import_seconds": imported - start, "list_seconds": listed - imported,
+                  "workplaces": len(names),
+                  "heavy_modules": sorted(set(sys.argv[2:]) & set(sys.modules))}))
+"""
+
+POSITIONS = ["Cashier", "Stock", "Supervisor", "Barista", "Cook", "Host", "Cleaner"]
+
+# Weighted like real rosters: a few patterns shared by most people, a long tail of one-offs
+AVAILABILITY_PATTERNS = [
+    ("Mon-Fri 9-5", 20), ("Mon-Fri 8:00-16:00", 10), ("Weekends", 8), ("Any", 10), ("", 5),
+    ("Mon, Wed, Fri 9am-1pm", 5), ("Tue-Thu 12-20", 5), ("Sat-Sun 10:00-18:00", 5),
+    ("Mon-Sun 6:00-14:00", 4), ("Mon-Sun 14:00-22:00", 4), ("Fri-Sun 16:00-23:00", 3),
+]
+
+HOURS_VARIANTS = [
+    {day: ("9:00", "17:00") for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]},
+    dict({day: ("8:00", "20:00") for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]},
+         Saturday=("10:00", "18:00")),
+    {day: ("6:00", "22:00") for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday",
+                                        "Saturday", "Sunday"]},
+]
+
+
+def random_availability(rng):
+    if rng.random() < 0.1:
+        # One-off patterns
+        days = rng.sample(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"], rng.randint(1, 4))
+        start = rng.randint(6, 14)
+        return f"{', '.join(days)} {start}:00-{start + rng.randint(4, 8)}:00"
+    patterns, weights = zip(*AVAILABILITY_PATTERNS)
+    return rng.choices(patterns, weights)[0]
+
+
+def make_workers(count, seed=0):
+    rng = random.Random(seed)
+    return [{"Name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+             "Position": rng.choice(POSITIONS),
+             "Availability": random_availability(rng)}
+            for i in range(count)]
+
+
+def make_workplace(worker_count, seed=0, name=None):
+    """Synthetic workplace with `worker_count` workers and one of a few opening-hour layouts."""
+    rng = random.Random(seed)
+    return Workplace(name or f"Bench {worker_count}", dict(rng.choice(HOURS_VARIANTS)),
+                     make_workers(worker_count, seed))
+
+
+def write_roster_csv(workers, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name", "Position", "Availability", "Employee Notes"])
+        for w in workers:
+            writer.writerow([w["Name"], w["Position"], w["Availability"], "n/a"])
+
+
+def write_roster_xlsx(workers, path):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Roster")
+    sheet.append(["Name", "Position", "Availability", "Employee Notes"])
+    for w in workers:
+        sheet.append([w["Name"], w["Position"], w["Availability"], "n/a"])
+    workbook.save(path)
+
+
+def measure(func, memory=True):
+    """Run func() and return (result, seconds, peak traced bytes or None)."""
+    gc.collect()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        # A second, traced run keeps tracemalloc overhead out of the timing
+        gc.collect()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+@contextmanager
+def schedule_cache_at(value):
+    """Point SCHEDULER_CACHE at `value` ("off" or a path) for the duration, see schedule_cache.py."""
+    previous = os.environ.get("SCHEDULER_CACHE")
+    os.environ["SCHEDULER_CACHE"] = value
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("SCHEDULER_CACHE", None)
+        else:
+            os.environ["SCHEDULER_CACHE"] = previous
+
+
+def run_tier(worker_count, day_count, workdir, memory=True, shift_length=8, min_staff=2):
+    results = {"workers": worker_count, "days": day_count, "phases": {}}
+    phases = results["phases"]
+
+    def record(phase, func, **extra):
+        result, seconds, peak = measure(func, memory)
+        phases[phase] = dict({"seconds": round(seconds, 6), "peak_bytes": peak}, **extra)
+        return result
+
+    workers = make_workers(worker_count)
+    csv_path = os.path.join(workdir, f"roster_{worker_count}.csv")
+    xlsx_path = os.path.join(workdir, f"roster_{worker_count}.xlsx")
+    if not os.path.exists(csv_path):
+        write_roster_csv(workers, csv_path)
+        write_roster_xlsx(workers, xlsx_path)
+
+    workplace = make_workplace(worker_count)
+    # Start each tier cold so the parse cache counters are per tier
+    availability.clear_cache()
+    record("import_csv", lambda: scheduler_core.import_roster(workplace, csv_path), rows=worker_count)
+    record("import_xlsx", lambda: scheduler_core.import_roster(workplace, xlsx_path), rows=worker_count)
+
+    start_date = datetime(2025, 1, 6)
+    end_date = start_date + timedelta(days=day_count - 1)
+    # Time the solver itself; cache hits are measured separately below
+    with schedule_cache_at("off"):
+        schedule = record("generate", lambda: scheduler_core.generate_ai_schedule(
+            workplace, start_date, end_date, shift_length, min_staff))
+    phases["generate"]["shifts"] = sum(len(day) for day in schedule.values())
+    # A tier-specific cache in the temporary directory, filled once before timing
+    def generate():
+        return scheduler_core.generate_ai_schedule(workplace, start_date, end_date, shift_length, min_staff)
+
+    with schedule_cache_at(os.path.join(workdir, f"cache_{worker_count}_{day_count}.db")):
+        generate()
+        record("generate_cached", generate)
+        schedule_cache.close_default()
+    scheduler_core.apply_schedule(workplace, schedule, start_date, end_date, shift_length, min_staff)
+
+    record("render", lambda: sum(1 for _ in scheduler_core.format_schedule(workplace.shifts)))
+
+    pickle_path = os.path.join(workdir, f"store_{worker_count}_{day_count}.pkl")
+    record("save_pickle", lambda: scheduler_core.save_pickle([workplace], pickle_path))
+    phases["save_pickle"]["file_bytes"] = os.path.getsize(pickle_path)
+    record("load_pickle", lambda: scheduler_core.load_pickle(pickle_path))
+
+    from storage import SQLiteStore
+
+    db_path = os.path.join(workdir, f"store_{worker_count}_{day_count}.db")
+
+    def save_sqlite():
+        # A fresh store each time so every run writes everything
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        store = SQLiteStore(db_path)
+        store.save_all([workplace])
+        store.close()
+
+    def load_sqlite():
+        store = SQLiteStore(db_path)
+        loaded = store.load_all()
+        store.close()
+        return loaded
+
+    record("save_sqlite", save_sqlite)
+    phases["save_sqlite"]["file_bytes"] = os.path.getsize(db_path)
+    record("load_sqlite", load_sqlite)
+    results["availability_cache"] = availability.cache_info()._asdict()
+    return results
+
+
+def run_startup(workdir, workplace_count=10, worker_count=1000, day_count=28, runs=STARTUP_RUNS):
+    """Median cold-start timings over `runs` fresh interpreters against a populated SQLite store."""
+    from storage import SQLiteStore
+
+    db_path = os.path.join(workdir, "startup.db")
+    if not os.path.exists(db_path):
+        start_date = datetime(2025, 1, 6)
+        end_date = start_date + timedelta(days=day_count - 1)
+        store = SQLiteStore(db_path)
+        workplaces = []
+        for k in range(workplace_count):
+            workplace = make_workplace(worker_count, seed=k, name=f"Startup {k}")
+            with schedule_cache_at("off"):
+                schedule = scheduler_core.generate_ai_schedule(workplace, start_date, end_date, 8, 2)
+            scheduler_core.apply_schedule(workplace, schedule, start_date, end_date, 8, 2)
+            workplaces.append(workplace)
+        store.save_all(workplaces)
+        store.close()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    env.pop("SCHEDULER_INSTRUMENT", None)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, db_path] + HEAVY_MODULES,
+                                capture_output=True, text=True, check=True, cwd=workdir, env=env).stdout
+        sample = json.loads(output)
+        sample["process_seconds"] = time.perf_counter() - start
+        samples.append(sample)
+
+    result = {"workplaces": workplace_count, "workers": worker_count, "days": day_count, "runs": runs}
+    for key in ("import_seconds", "list_seconds", "process_seconds"):
+        result[key] = round(statistics.median(sample[key] for sample in samples), 6)
+    result["heavy_modules"] = sorted({name for sample in samples for name in sample["heavy_modules"]})
+    if result["heavy_modules"]:
+        print(f"warning: startup imported {', '.join(result['heavy_modules'])}", file=sys.stderr)
+    return result
+
+
+def parse_tiers(value):
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scheduling phases across size tiers.")
+    parser.add_argument("--workers", type=parse_tiers, default=WORKER_TIERS,
+                        help="comma-separated worker counts (default: 50,1000,10000)")
+    parser.add_argument("--days", type=parse_tiers, default=DAY_TIERS,
+                        help="comma-separated schedule lengths in days (default: 7,90,365)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run for peak memory")
+    parser.add_argument("--no-startup", action="store_true", help="skip the cold-start measurement")
+    parser.add_argument("--startup-only", action="store_true", help="only measure cold start")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tiers": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="scheduler-bench-") as workdir:
+        if not args.no_startup:
+            print("benchmarking startup", file=sys.stderr)
+            report["startup"] = run_startup(workdir)
+        for worker_count in [] if args.startup_only else args.workers:
+            for day_count in args.days:
+                print(f"benchmarking {worker_count} workers x {day_count} days", file=sys.stderr)
+                report["tiers"].append(run_tier(worker_count, day_count, workdir, memory=not args.no_memory))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
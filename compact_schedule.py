@@ -0,0 +1,197 @@
+"""
+Array-backed schedule storage.
+
+A generated schedule used to live in `Workplace.shifts` as
+{datetime: {"HH:MM - HH:MM": [worker names]}}, repeating every name and
+shift label thousands of times over a year. CompactSchedule keeps the same
+content as integer arrays:
+
+    days        day offset from `start` of every scheduled day
+    slot_day    for every shift slot, the position of its day in `days`
+    slot_shift  for every slot, an index into the shift-name table
+    offsets     slot k's workers are assignee[offsets[k]:offsets[k + 1]]
+    assignee    indices into the worker-name table
+
+It is a read-only Mapping with the old layout (schedule[date] builds that
+day's dict on demand), so existing code keeps working, plus a few queries
+that never build the dicts at all.
+"""
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+def _small(values):
+    """`values` in the narrowest unsigned dtype that holds them, to keep pickles small."""
+    values = np.asarray(values)
+    top = int(values.max()) if len(values) else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if top <= np.iinfo(dtype).max:
+            return values.astype(dtype)
+    return values
+
+
+def _as_date(key):
+    """Datetime for a schedule key; older stores may hold "YYYY-MM-DD..." strings. None if unknown."""
+    if isinstance(key, datetime):
+        return key
+    try:
+        return datetime.fromisoformat(str(key)[:10])
+    except ValueError:
+        return None
+
+
+class CompactSchedule(Mapping):
+    def __init__(self, start, days, slot_day, slot_shift, offsets, assignee, shift_names, names, other=None):
+        self.start = start
+        self.days = days
+        self.slot_day = slot_day
+        self.slot_shift = slot_shift
+        self.offsets = offsets
+        self.assignee = assignee
+        self.shift_names = shift_names
+        self.names = names
+        # Keys that are not dates at all, kept as plain dicts after the dated days
+        self.other = other or {}
+        self._positions = None
+
+    @classmethod
+    def from_dict(cls, schedule):
+        """Pack a {date: {shift: [names]}} schedule; a CompactSchedule is returned as is."""
+        if isinstance(schedule, cls):
+            return schedule
+        dated = {}
+        other = {}
+        for key, day_shifts in schedule.items():
+            date = _as_date(key)
+            if date is None:
+                other[key] = day_shifts
+            else:
+                dated[date] = day_shifts
+
+        start = min(dated) if dated else None
+        shift_ids, name_ids = {}, {}
+        days, slot_day, slot_shift, offsets, assignee = [], [], [], [0], []
+        for date in sorted(dated):
+            delta = date - start
+            if delta.seconds or delta.microseconds:
+                # Not aligned to whole days from the first one, cannot be indexed
+                other[date] = dated[date]
+                continue
+            days.append(delta.days)
+            for shift, workers in dated[date].items():
+                slot_day.append(len(days) - 1)
+                slot_shift.append(shift_ids.setdefault(shift, len(shift_ids)))
+                assignee.extend(name_ids.setdefault(name, len(name_ids)) for name in workers)
+                offsets.append(len(assignee))
+
+        return cls(start, np.array(days, dtype=np.int32), np.array(slot_day, dtype=np.int32),
+                   np.array(slot_shift, dtype=np.int32), np.array(offsets, dtype=np.int64),
+                   np.array(assignee, dtype=np.int32), list(shift_ids), list(name_ids), other)
+
+    # Mapping interface: date -> {shift: [names]}
+
+    def _day_position(self, key):
+        if self._positions is None:
+            self._positions = {int(day): i for i, day in enumerate(self.days.tolist())}
+        date = _as_date(key) if self.start is not None else None
+        if date is None:
+            return None
+        delta = date - self.start
+        if delta.seconds or delta.microseconds:
+            return None
+        return self._positions.get(delta.days)
+
+    def _slot_range(self, position):
+        first, last = np.searchsorted(self.slot_day, [position, position + 1])
+        return int(first), int(last)
+
+    def _day_shifts(self, position):
+        first, last = self._slot_range(position)
+        names, shift_names, assignee, offsets = self.names, self.shift_names, self.assignee, self.offsets
+        return {shift_names[self.slot_shift[k]]: [names[i] for i in assignee[offsets[k]:offsets[k + 1]].tolist()]
+                for k in range(first, last)}
+
+    def __getitem__(self, key):
+        if key in self.other:
+            return self.other[key]
+        position = self._day_position(key)
+        if position is None:
+            raise KeyError(key)
+        return self._day_shifts(position)
+
+    def __iter__(self):
+        for day in self.days.tolist():
+            yield self.start + timedelta(days=day)
+        yield from self.other
+
+    def __len__(self):
+        return len(self.days) + len(self.other)
+
+    def __contains__(self, key):
+        return key in self.other or self._day_position(key) is not None
+
+    def __reduce__(self):
+        # Per-day slot counts and per-slot headcounts are enough to rebuild slot_day and offsets
+        slots_per_day = np.bincount(self.slot_day, minlength=len(self.days))
+        return _unpack, (self.start, _small(self.days), _small(slots_per_day), _small(self.slot_shift),
+                         _small(self.headcounts()), _small(self.assignee), self.shift_names, self.names,
+                         self.other)
+
+    # Queries
+
+    def shift_counts(self):
+        """Number of shifts on each day, in iteration order."""
+        counts = np.bincount(self.slot_day, minlength=len(self.days)).tolist()
+        return counts + [len(day_shifts) for day_shifts in self.other.values()]
+
+    def headcounts(self):
+        """Workers assigned to every slot, as an array parallel to slot_day/slot_shift."""
+        return np.diff(self.offsets)
+
+    def workers_on(self, date):
+        """Sorted names of everyone working on `date`."""
+        position = self._day_position(date)
+        if position is None:
+            return sorted({name for workers in self.other.get(date, {}).values() for name in workers})
+        first, last = self._slot_range(position)
+        ids = np.unique(self.assignee[self.offsets[first]:self.offsets[last]])
+        return sorted(self.names[i] for i in ids.tolist())
+
+    def shifts_of(self, name):
+        """[(date, shift name), ...] worked by `name`, in date order."""
+        try:
+            worker = self.names.index(name)
+        except ValueError:
+            worker = None
+        result = []
+        if worker is not None:
+            positions = np.flatnonzero(self.assignee == worker)
+            slots = np.searchsorted(self.offsets, positions, side="right") - 1
+            for k in slots.tolist():
+                day = int(self.days[self.slot_day[k]])
+                result.append((self.start + timedelta(days=day), self.shift_names[self.slot_shift[k]]))
+        for key, day_shifts in self.other.items():
+            result.extend((key, shift) for shift, workers in day_shifts.items() if name in workers)
+        return result
+
+    def coverage(self, min_staff=None):
+        """
+        [(date, shift name, headcount), ...] for every slot; with `min_staff`,
+        only the slots that have fewer workers than that.
+        """
+        headcounts = self.headcounts()
+        slots = np.arange(len(headcounts))
+        if min_staff is not None:
+            slots = np.flatnonzero(headcounts < min_staff)
+        return [(self.start + timedelta(days=int(self.days[self.slot_day[k]])),
+                 self.shift_names[self.slot_shift[k]], int(headcounts[k])) for k in slots.tolist()]
+
+
+def _unpack(start, days, slots_per_day, slot_shift, headcounts, assignee, shift_names, names, other):
+    offsets = np.zeros(len(headcounts) + 1, dtype=np.int64)
+    np.cumsum(headcounts, out=offsets[1:])
+    slot_day = np.repeat(np.arange(len(days), dtype=np.int32), slots_per_day)
+    return CompactSchedule(start, days.astype(np.int32), slot_day, slot_shift.astype(np.int32), offsets,
+                           assignee.astype(np.int32), shift_names, names, other)
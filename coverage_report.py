@@ -0,0 +1,198 @@
+"""
+Coverage and gap analytics over 15-minute slots.
+
+For every slot of a date range the report holds three headcounts, as
+(days, SLOTS_PER_DAY) arrays:
+
+    required   min_staff for every shift of the plan that covers the slot
+    assigned   workers the schedule puts on the slot
+    available  workers whose availability covers the slot
+
+Shift intervals are added with a difference array and one cumulative sum,
+availability comes straight from the bit-packed index, so a quarter of a
+large site takes milliseconds. Shifts running past midnight spill into the
+next day's slots.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+from availability_index import SLOT_MINUTES, SLOTS_PER_DAY
+from compact_schedule import CompactSchedule
+from shift_templates import ShiftPlan, parse_shift_name
+from solver import ensure_index
+
+
+def _add_intervals(timeline, days, starts, ends, counts):
+    """Add counts[k] over [starts[k], ends[k]) minutes of day days[k] to a flat slot timeline."""
+    if not len(days):
+        return
+    first = days * SLOTS_PER_DAY + starts // SLOT_MINUTES
+    # A shift covers every slot it touches
+    last = days * SLOTS_PER_DAY + -(-ends // SLOT_MINUTES)
+    np.add.at(timeline, first, counts)
+    np.add.at(timeline, last, -counts)
+
+
+class CoverageReport:
+    def __init__(self, start_date, required, assigned, available, positions, assigned_by_position,
+                 available_by_position):
+        self.start_date = start_date
+        self.required = required
+        self.assigned = assigned
+        self.available = available
+        self.positions = positions
+        # (positions, days, SLOTS_PER_DAY)
+        self.assigned_by_position = assigned_by_position
+        self.available_by_position = available_by_position
+
+    @property
+    def shortfall(self):
+        return np.maximum(self.required - self.assigned, 0)
+
+    def _slot_time(self, flat_slot):
+        return self.start_date + timedelta(minutes=int(flat_slot) * SLOT_MINUTES)
+
+    def understaffed_windows(self):
+        """
+        Runs of consecutive short slots as dicts with start, end, the worst
+        shortfall in the run, and the least assigned/available headcounts.
+        """
+        short = (self.shortfall > 0).ravel()
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], short.astype(np.int8), [0]])))
+        starts, ends = edges[0::2], edges[1::2]
+        shortfall, assigned, available = self.shortfall.ravel(), self.assigned.ravel(), self.available.ravel()
+        return [{"start": self._slot_time(first), "end": self._slot_time(last),
+                 "shortfall": int(shortfall[first:last].max()),
+                 "assigned": int(assigned[first:last].min()),
+                 "available": int(available[first:last].min())}
+                for first, last in zip(starts.tolist(), ends.tolist())]
+
+    def position_shortfalls(self):
+        """
+        Per position: assigned and available staff-hours during required slots,
+        and the hours that were short while that position had nobody available.
+        """
+        hours = SLOT_MINUTES / 60
+        needed = self.required > 0
+        short = self.shortfall > 0
+        rows = []
+        for k, position in enumerate(self.positions):
+            available = self.available_by_position[k]
+            rows.append({"position": position,
+                         "assigned_hours": float(self.assigned_by_position[k][needed].sum() * hours),
+                         "available_hours": float(available[needed].sum() * hours),
+                         "short_hours_none_available": float((short & (available == 0)).sum() * hours)})
+        return rows
+
+    def summary(self):
+        hours = SLOT_MINUTES / 60
+        needed = self.required > 0
+        return {"days": int(self.required.shape[0]),
+                "required_hours": float(self.required.sum() * hours),
+                "assigned_hours": float(np.minimum(self.assigned, self.required).sum() * hours),
+                "short_hours": float(self.shortfall.sum() * hours),
+                "short_slots": int((self.shortfall > 0).sum()),
+                "slots_short_of_available": int((needed & (self.available < self.required)).sum())}
+
+    def format(self, limit=20):
+        """Plain-text report: totals, the first `limit` understaffed windows and positions."""
+        summary = self.summary()
+        lines = [f"Coverage over {summary['days']} days: {summary['assigned_hours']:.1f} of "
+                 f"{summary['required_hours']:.1f} required staff-hours filled, "
+                 f"{summary['short_hours']:.1f} short",
+                 f"Slots where fewer workers are available than required: {summary['slots_short_of_available']}",
+                 ""]
+        windows = self.understaffed_windows()
+        lines.append(f"Understaffed windows: {len(windows)}")
+        for window in windows[:limit]:
+            lines.append(f"  {window['start']:%Y-%m-%d %a %H:%M} - {window['end']:%H:%M}  "
+                         f"short {window['shortfall']} (assigned {window['assigned']}, "
+                         f"available {window['available']})")
+        if len(windows) > limit:
+            lines.append(f"  ... {len(windows) - limit} more")
+        if self.positions:
+            lines += ["", "By position (hours during required slots):"]
+            width = max(len(str(position)) for position in self.positions)
+            for row in self.position_shortfalls():
+                lines.append(f"  {str(row['position']).ljust(width)}  assigned {row['assigned_hours']:8.1f}  "
+                             f"available {row['available_hours']:9.1f}  "
+                             f"short with none available {row['short_hours_none_available']:7.1f}")
+        return "\n".join(lines)
+
+
+def analyze_coverage(workplace, start_date=None, end_date=None, min_staff=None, shift_length=None):
+    """
+    Coverage report for the workplace's current schedule.
+
+    The range, minimum staff and shift length default to the ones the
+    schedule was generated with (or the scheduled days, 2 and 8 hours).
+    """
+    inputs = getattr(workplace, "schedule_inputs", None) or {}
+    schedule = CompactSchedule.from_dict(workplace.shifts)
+    if start_date is None:
+        start_date = inputs.get("start") or schedule.start
+    if end_date is None:
+        end_date = inputs.get("end") or (schedule.start + timedelta(days=int(schedule.days.max()))
+                                         if len(schedule.days) else None)
+    if start_date is None or end_date is None:
+        raise ValueError("No schedule to analyse; generate one first")
+    if min_staff is None:
+        min_staff = inputs.get("min_staff", 2)
+    if shift_length is None:
+        shift_length = inputs.get("shift_length", 8)
+    start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    day_count = (end_date - start_date).days + 1
+    # One spare day for shifts that run past midnight on the last day
+    size = (day_count + 1) * SLOTS_PER_DAY + 1
+
+    plan = ShiftPlan.for_workplace(workplace, shift_length)
+    slots = plan.slots(start_date, end_date)
+    required = np.zeros(size, dtype=np.int64)
+    _add_intervals(required, slots["day"], slots["start"], slots["end"],
+                   np.full(len(slots["day"]), min_staff, dtype=np.int64))
+
+    # Scheduled slots inside the range, with their shift bounds in minutes
+    roster = workplace.workers
+    position_names = sorted({w.position for w in roster if w.position is not None}, key=str)
+    position_ids = {position: k for k, position in enumerate(position_names)}
+    worker_position = {w.name: position_ids.get(w.position, -1) for w in roster}
+
+    assigned = np.zeros(size, dtype=np.int64)
+    assigned_by_position = np.zeros((len(position_names), size), dtype=np.int64)
+    if len(schedule.slot_day):
+        bounds = [parse_shift_name(name) for name in schedule.shift_names]
+        shift_start = np.array([b[0] if b else 0 for b in bounds], dtype=np.int64)
+        shift_end = np.array([b[1] if b else 0 for b in bounds], dtype=np.int64)
+        offset = (schedule.start.replace(hour=0, minute=0, second=0, microsecond=0) - start_date).days
+        slot_days = schedule.days[schedule.slot_day].astype(np.int64) + offset
+        keep = (slot_days >= 0) & (slot_days < day_count)
+        starts, ends = shift_start[schedule.slot_shift], shift_end[schedule.slot_shift]
+        _add_intervals(assigned, slot_days[keep], starts[keep], ends[keep], schedule.headcounts()[keep])
+
+        if position_names:
+            name_position = np.array([worker_position.get(name, -1) for name in schedule.names], dtype=np.int64)
+            slot_of = np.repeat(np.arange(len(schedule.slot_day)), schedule.headcounts())
+            positions = name_position[schedule.assignee]
+            use = keep[slot_of] & (positions >= 0)
+            for k in range(len(position_names)):
+                mine = use & (positions == k)
+                _add_intervals(assigned_by_position[k], slot_days[slot_of[mine]], starts[slot_of[mine]],
+                               ends[slot_of[mine]], np.ones(int(mine.sum()), dtype=np.int64))
+
+    def per_day(timeline):
+        return np.cumsum(timeline, axis=-1)[..., :day_count * SLOTS_PER_DAY].reshape(
+            timeline.shape[:-1] + (day_count, SLOTS_PER_DAY))
+
+    # Available headcount per weekday slot, overall and per position, from the packed index
+    index = ensure_index(workplace)
+    weekdays = (start_date.weekday() + np.arange(day_count)) % 7
+    available = index.slot_counts()[weekdays]
+    worker_positions = [position_ids.get(w.position, -1) for w in roster]
+    available_by_position = np.zeros((len(position_names), day_count, SLOTS_PER_DAY), dtype=np.int64)
+    for k in range(len(position_names)):
+        members = index.pack([p == k for p in worker_positions])
+        available_by_position[k] = index.slot_counts(members)[weekdays]
+
+    return CoverageReport(start_date, per_day(required), per_day(assigned), available, position_names,
+                          per_day(assigned_by_position), available_by_position)
@@ -0,0 +1,179 @@
+"""
+Schedule export to CSV, Excel, per-worker iCalendar files and Word rosters.
+
+CSV, xlsx (openpyxl write-only mode) and .ics files are written row by row
+from the schedule, so memory stays flat however long the schedule is.
+python-docx has no streaming writer and keeps the whole document in memory
+until it is saved; Word rosters are therefore written per workplace, which
+bounds memory by the largest single schedule rather than the whole batch.
+"""
+import csv
+import hashlib
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import instrumentation
+from compact_schedule import CompactSchedule
+from shift_templates import parse_shift_name
+
+FORMATS = ("csv", "xlsx", "ics", "docx")
+COLUMNS = ["Date", "Day", "Shift", "Start", "End", "Worker"]
+
+
+def _days(schedule, progress=None):
+    """Yield (date, shifts) and report progress once per day; progress may raise to abort."""
+    total = len(schedule)
+    for done, (date, shifts) in enumerate(schedule.items()):
+        if progress is not None:
+            progress(done, total)
+        yield date, shifts
+
+
+def schedule_rows(schedule, progress=None):
+    """Yield one row per assigned worker (and one with no worker for an unstaffed shift)."""
+    for date, shifts in _days(schedule, progress):
+        if isinstance(date, datetime):
+            day, weekday = date.strftime("%Y-%m-%d"), date.strftime("%A")
+        else:
+            day, weekday = str(date), ""
+        for shift, workers in shifts.items():
+            start, _, end = shift.partition(" - ")
+            for worker in workers or [""]:
+                yield [day, weekday, shift, start, end, worker]
+
+
+def export_csv(schedule, path, progress=None):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(schedule_rows(schedule, progress))
+    return path
+
+
+def export_xlsx(schedule, path, progress=None):
+    from openpyxl import Workbook
+
+    # Write-only workbooks stream rows to disk instead of keeping cell objects
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Schedule")
+    sheet.append(COLUMNS)
+    for row in schedule_rows(schedule, progress):
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def export_docx(schedule, path, title=None, progress=None):
+    from docx import Document
+
+    document = Document()
+    document.add_heading(title or "Schedule", level=1)
+    for date, shifts in _days(schedule, progress):
+        document.add_heading(date.strftime("%Y-%m-%d (%A)") if isinstance(date, datetime) else str(date), level=2)
+        table = document.add_table(rows=1, cols=2)
+        table.rows[0].cells[0].text, table.rows[0].cells[1].text = "Shift", "Workers"
+        for shift, workers in shifts.items():
+            cells = table.add_row().cells
+            cells[0].text, cells[1].text = shift, ", ".join(workers)
+    document.save(path)
+    return path
+
+
+def _ics_text(value):
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\n", "\\n"))
+
+
+def _ics_time(date, minutes):
+    # Floating local time: calendars show the shift at the workplace's wall-clock time
+    return (date.replace(hour=0, minute=0, second=0, microsecond=0)
+            + timedelta(minutes=minutes)).strftime("%Y%m%dT%H%M%S")
+
+
+def safe_filename(name):
+    return re.sub(r"[^\w.-]+", "_", str(name)).strip("._") or "unnamed"
+
+
+def _worker_slots(compact):
+    """Yield (name, slot indices) per worker, using one sort instead of a scan per worker."""
+    order = np.argsort(compact.assignee, kind="stable")
+    workers = compact.assignee[order]
+    slots = np.searchsorted(compact.offsets, order, side="right") - 1
+    bounds = np.flatnonzero(np.diff(workers)) + 1
+    for group_workers, group_slots in zip(np.split(workers, bounds), np.split(slots, bounds)):
+        if len(group_workers):
+            yield compact.names[int(group_workers[0])], group_slots.tolist()
+
+
+def export_calendars(schedule, directory, workplace_name=None, progress=None):
+    """Write one .ics file per worker into `directory`; returns the number of files written."""
+    compact = CompactSchedule.from_dict(schedule)
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    location = f"LOCATION:{_ics_text(workplace_name)}\r\n" if workplace_name else ""
+    total = len(set(compact.assignee.tolist()))
+    written = 0
+    for name, slots in _worker_slots(compact):
+        if progress is not None:
+            progress(written, total)
+        path = os.path.join(directory, f"{safe_filename(name)}.ics")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Workplace Scheduler//EN\r\n"
+                    f"X-WR-CALNAME:{_ics_text(name)}\r\n")
+            for k in slots:
+                date = compact.start + timedelta(days=int(compact.days[compact.slot_day[k]]))
+                shift = compact.shift_names[compact.slot_shift[k]]
+                bounds = parse_shift_name(shift)
+                if bounds is None:
+                    continue
+                uid = hashlib.sha1(f"{workplace_name}|{name}|{date:%Y%m%d}|{shift}".encode("utf-8")).hexdigest()
+                f.write("BEGIN:VEVENT\r\n"
+                        f"UID:{uid}@workplace-scheduler\r\n"
+                        f"DTSTAMP:{stamp}\r\n"
+                        f"DTSTART:{_ics_time(date, bounds[0])}\r\n"
+                        f"DTEND:{_ics_time(date, bounds[1])}\r\n"
+                        f"SUMMARY:{_ics_text(f'Shift {shift}')}\r\n"
+                        f"{location}"
+                        "END:VEVENT\r\n")
+            f.write("END:VCALENDAR\r\n")
+        written += 1
+    return written
+
+
+_WRITERS = {"csv": export_csv, "xlsx": export_xlsx, "docx": export_docx}
+
+
+def export_schedule(schedule, path, progress=None):
+    """Export to a single file, the format picked from the extension (.csv, .xlsx or .docx)."""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    writer = _WRITERS.get(extension)
+    if writer is None:
+        raise ValueError(f"Unsupported export type '.{extension}'. Use .csv, .xlsx or .docx")
+    return writer(schedule, path, progress=progress)
+
+
+def export_workplace(workplace, directory, formats=FORMATS, progress=None):
+    """
+    Write the workplace's schedule in each of `formats` under
+    directory/<workplace name>/; returns the paths written.
+    """
+    target = os.path.join(directory, safe_filename(workplace.name))
+    os.makedirs(target, exist_ok=True)
+    written = []
+    with instrumentation.phase("export", workplace=workplace.name, formats=",".join(formats),
+                               days=len(workplace.shifts)):
+        for fmt in formats:
+            if fmt == "ics":
+                export_calendars(workplace.shifts, os.path.join(target, "calendars"), workplace.name, progress)
+                written.append(os.path.join(target, "calendars"))
+            elif fmt == "docx":
+                written.append(export_docx(workplace.shifts, os.path.join(target, "schedule.docx"),
+                                           f"{workplace.name} schedule", progress))
+            elif fmt in _WRITERS:
+                written.append(_WRITERS[fmt](workplace.shifts, os.path.join(target, f"schedule.{fmt}"), progress))
+            else:
+                raise ValueError(f"Unknown export format: {fmt!r}")
+    return written
@@ -0,0 +1,148 @@
+"""
+Opt-in timing and memory instrumentation.
+
+Off by default and close to free when off. Turn it on with the environment
+variable SCHEDULER_INSTRUMENT (or the CLI's --instrument flag):
+
+    SCHEDULER_INSTRUMENT=1      wall time, counts and peak traced memory per phase
+    SCHEDULER_INSTRUMENT=time   wall time and counts only (no tracemalloc overhead)
+
+Every phase (import, generate, save, load, ...) appends one JSON line to a
+rolling log, scheduler_metrics.log by default or SCHEDULER_METRICS_LOG.
+SCHEDULER_PROFILE=run.prof (or --profile) additionally runs the whole
+command under cProfile and dumps the stats there for pstats/snakeviz.
+
+This module sits on the app's startup path, so logging, tracemalloc and
+cProfile are only imported once they are turned on.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_LOG = "scheduler_metrics.log"
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+
+_state = {"enabled": False, "memory": False, "log_path": None, "logger": None}
+# Open phases per thread, so nested phases can hand their peak memory up
+_local = threading.local()
+
+
+def enable(log_path=None, memory=True):
+    """Start recording phases to `log_path` (default: SCHEDULER_METRICS_LOG or scheduler_metrics.log)."""
+    import logging
+    import tracemalloc
+    from logging.handlers import RotatingFileHandler
+
+    log_path = os.path.abspath(log_path or os.environ.get("SCHEDULER_METRICS_LOG") or DEFAULT_LOG)
+    logger = logging.getLogger("scheduler.metrics")
+    if _state["log_path"] != log_path:
+        logger.propagate = False
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        handler = RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                      encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    _state.update(enabled=True, memory=memory, log_path=log_path, logger=logger)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _state["enabled"] = False
+    if _state["memory"]:
+        import tracemalloc
+
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+    _state["memory"] = False
+
+
+def is_enabled():
+    return _state["enabled"]
+
+
+def log_path():
+    return _state["log_path"]
+
+
+def enable_from_env():
+    """Apply SCHEDULER_INSTRUMENT; returns whether instrumentation is on."""
+    value = os.environ.get("SCHEDULER_INSTRUMENT", "").strip().lower()
+    if value and value not in ("0", "false", "no", "off"):
+        enable(memory=value != "time")
+    return is_enabled()
+
+
+@contextmanager
+def phase(name, **counts):
+    """
+    Time the body as phase `name`. The yielded dict is logged with the
+    timing, so callers can add counts (rows, shifts, ...) as they learn them.
+    """
+    metrics = dict(counts)
+    if not _state["enabled"]:
+        yield metrics
+        return
+
+    import tracemalloc
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    entry = {"peak": 0, "base": 0}
+    if _state["memory"] and tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        entry["base"] = current
+    stack.append(entry)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield metrics
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        record = {"time": datetime.now().isoformat(timespec="milliseconds"), "phase": name,
+                  "seconds": round(seconds, 6)}
+        if _state["memory"] and tracemalloc.is_tracing():
+            peak = max(entry["peak"], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            record["peak_bytes"] = max(0, peak - entry["base"])
+        if error is not None:
+            record["error"] = error
+        record.update(metrics)
+        _state["logger"].info(json.dumps(record, default=str))
+
+
+@contextmanager
+def profile(path):
+    """Run the body under cProfile and dump the stats to `path` (no-op when path is empty)."""
+    if not path:
+        yield None
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+def profile_path_from_env():
+    return os.environ.get("SCHEDULER_PROFILE") or None
@@ -0,0 +1,235 @@
+"""
+Cross-workplace worker registry.
+
+The same person can be on the roster of several workplaces. The registry
+identifies them by `worker_key` (the roster's ID column when there is one,
+otherwise the name with case and spacing normalized) and keeps every shift
+they are committed to, at any workplace, as an IntervalSet of absolute
+minutes. Committed intervals never overlap, so each set is a pair of sorted
+lists and an overlap check is two bisections.
+
+Schedulers take an `exclude(date, start, end, candidates)` callback from
+`WorkerRegistry.exclusion`, which drops candidates already booked elsewhere
+at overlapping times. batch.solve_all uses `shared_groups` to solve
+workplaces that share workers one after another against one registry,
+while unrelated workplaces still run in parallel.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+import numpy as np
+
+from availability import MINUTES_PER_DAY
+from compact_schedule import CompactSchedule
+from shift_templates import parse_shift_name
+
+
+def worker_key(worker):
+    """
+    Identity of a worker across workplaces: "id:<ID>" if the roster has one,
+    else "name:<name>"; None for rows with neither (they are never scheduled).
+    """
+    worker_id = getattr(worker, "id", None)
+    if worker_id is not None and str(worker_id).strip():
+        return "id:" + str(worker_id).strip().casefold()
+    return name_key(worker.name)
+
+
+def name_key(name):
+    name = " ".join(str(name).split()).casefold()
+    return "name:" + name if name else None
+
+
+def minute_of(date, minute):
+    """Absolute minute of `minute` past midnight on `date`; shifts past midnight just run over."""
+    return date.toordinal() * MINUTES_PER_DAY + minute
+
+
+class IntervalSet:
+    """Non-overlapping [start, end) intervals kept sorted by start, each with a tag."""
+
+    __slots__ = ("starts", "ends", "tags")
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.tags = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlapping(self, start, end):
+        """Tag of an interval overlapping [start, end), or None."""
+        i = bisect_right(self.starts, start)
+        # Only the last interval starting at or before `start` and the first one after can overlap
+        if i and self.ends[i - 1] > start:
+            return self.tags[i - 1]
+        if i < len(self.starts) and self.starts[i] < end:
+            return self.tags[i]
+        return None
+
+    def add(self, start, end, tag=None):
+        """Insert [start, end); returns the tag it overlaps instead of inserting, else None."""
+        clash = self.overlapping(start, end)
+        if clash is not None or end <= start:
+            return clash
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.tags.insert(i, tag)
+        return None
+
+
+class WorkerRegistry:
+    def __init__(self):
+        # worker key -> IntervalSet of committed shifts
+        self.booked = {}
+        # Keys that may be booked later in a coordinated run, see watch()
+        self.watched = set()
+        # Double-bookings met while committing: (key, tag, clashing tag)
+        self.conflicts = []
+
+    def commit(self, key, start, end, tag=None):
+        """Book [start, end) for `key`; returns False (and records the conflict) if it overlaps."""
+        intervals = self.booked.get(key)
+        if intervals is None:
+            intervals = self.booked[key] = IntervalSet()
+        clash = intervals.add(start, end, tag)
+        if clash is not None:
+            self.conflicts.append((key, tag, clash))
+            return False
+        return True
+
+    def booking(self, key, start, end):
+        """Tag of the shift `key` is committed to during [start, end), or None if free."""
+        intervals = self.booked.get(key)
+        return intervals.overlapping(start, end) if intervals is not None else None
+
+    def commit_schedule(self, workplace_name, workers, schedule, first=None, last=None):
+        """
+        Book every assignment of `schedule` (optionally only days first..last).
+        Tags are (workplace name, date, shift). Returns the number of conflicts found.
+        """
+        compact = CompactSchedule.from_dict(schedule)
+        if not len(compact.slot_day):
+            return 0
+        keys = {w.name: worker_key(w) for w in workers}
+        name_keys = [keys.get(name) or name_key(name) for name in compact.names]
+        bounds = [parse_shift_name(name) for name in compact.shift_names]
+        conflicts = len(self.conflicts)
+        for k in range(len(compact.slot_day)):
+            date = compact.start + timedelta(days=int(compact.days[compact.slot_day[k]]))
+            if (first is not None and date < first) or (last is not None and date > last):
+                continue
+            shift = compact.shift_names[compact.slot_shift[k]]
+            shift_bounds = bounds[compact.slot_shift[k]]
+            if shift_bounds is None:
+                continue
+            start, end = minute_of(date, shift_bounds[0]), minute_of(date, shift_bounds[1])
+            for i in compact.assignee[compact.offsets[k]:compact.offsets[k + 1]].tolist():
+                self.commit(name_keys[i], start, end, (workplace_name, date, shift))
+        return len(self.conflicts) - conflicts
+
+    def watch(self, keys):
+        self.watched.update(keys)
+
+    def subset(self, keys):
+        """A registry with only the bookings of `keys`, small enough to ship to another process."""
+        registry = WorkerRegistry()
+        registry.booked = {key: self.booked[key] for key in keys if key in self.booked}
+        registry.watched = self.watched & set(keys)
+        return registry
+
+    def exclusion(self, workers):
+        """
+        exclude(date, start, end, candidates) for a roster: returns the
+        candidate indices (sorted) minus workers booked elsewhere during the
+        shift. None when nobody on the roster can be booked elsewhere.
+        """
+        keys = [worker_key(w) for w in workers]
+        tracked = [i for i, key in enumerate(keys) if key in self.booked or key in self.watched]
+        if not tracked:
+            return None
+        tracked = np.array(tracked, dtype=np.int64)
+
+        def exclude(date, start, end, candidates):
+            hits = candidates[np.isin(candidates, tracked, assume_unique=True)]
+            if not len(hits):
+                return candidates
+            first, last = minute_of(date, start), minute_of(date, end)
+            blocked = [i for i in hits.tolist() if self.booking(keys[i], first, last) is not None]
+            return np.setdiff1d(candidates, blocked, assume_unique=True) if blocked else candidates
+
+        return exclude
+
+
+def shared_groups(workplaces):
+    """
+    Split workplaces into groups linked by shared workers (directly or
+    through other workplaces). Returns lists of positions in input order,
+    groups ordered by their first workplace.
+    """
+    parent = list(range(len(workplaces)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    seen = {}
+    for position, workplace in enumerate(workplaces):
+        for worker in workplace.workers:
+            key = worker_key(worker)
+            if key is None:
+                continue
+            other = seen.setdefault(key, position)
+            if other != position:
+                parent[find(position)] = find(other)
+
+    groups = {}
+    for position in range(len(workplaces)):
+        groups.setdefault(find(position), []).append(position)
+    return sorted(groups.values(), key=lambda group: group[0])
+
+
+def shared_keys(workplaces):
+    """Worker keys on more than one of the workplaces' rosters."""
+    sites = {}
+    for position, workplace in enumerate(workplaces):
+        for worker in workplace.workers:
+            sites.setdefault(worker_key(worker), set()).add(position)
+    return {key for key, positions in sites.items() if key is not None and len(positions) > 1}
+
+
+def registry_from_store(path, names, first=None, last=None, registry=None):
+    """
+    Add the stored schedules of the workplaces `names` (optionally only days
+    first..last) to `registry` (a new one by default), reading just their
+    rosters and those days. Opens its own connection, so it can run off the
+    thread that owns the app's store.
+    """
+    from storage import SQLiteStore
+
+    registry = registry if registry is not None else WorkerRegistry()
+    # Legacy .pkl stores have no index to query; their workplaces are all loaded anyway
+    if not names or path.endswith(".pkl"):
+        return registry
+    store = SQLiteStore(path)
+    try:
+        for name in names:
+            found = store.bookings(name, first, last)
+            if found is not None and found[1]:
+                registry.commit_schedule(name, found[0], found[1], first, last)
+    finally:
+        store.close()
+    return registry
+
+
+def registry_from(workplaces, first=None, last=None):
+    """Registry of the stored schedules of `workplaces` (optionally only days first..last)."""
+    registry = WorkerRegistry()
+    for workplace in workplaces:
+        if workplace.shifts:
+            registry.commit_schedule(workplace.name, workplace.workers, workplace.shifts, first, last)
+    return registry
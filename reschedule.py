@@ -0,0 +1,300 @@
+"""
+Incremental rescheduling after roster or opening-hours changes.
+
+The inputs a schedule was generated from are recorded on the workplace
+(`Workplace.schedule_inputs`). Rescheduling diffs them against the current
+roster and hours and only recomputes what the difference touches:
+
+* days whose opening hours or shift templates changed are solved again from scratch;
+* assignments of removed workers, or of workers whose availability or
+  position no longer allows the shift, are dropped;
+* shifts left short (or already short, when someone gained availability)
+  get their vacancies filled without moving anyone else.
+
+Every other assignment stays exactly as it was, and nothing changes at all
+when the inputs are the same. Vacancies are filled within the limits of the
+mode the schedule was generated in: nobody works overlapping shifts, and
+balanced and rolling schedules also keep Max Hours per 7 days and, for
+rolling, the rest between shifts.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from availability import DAY_NAMES, MINUTES_PER_DAY
+from shift_templates import ShiftPlan, parse_shift_name
+from solver import assign_day, ensure_index
+
+
+def schedule_inputs(workplace, start_date, end_date, shift_length, min_staff, mode="flow", positions=None):
+    """Snapshot of everything a schedule depends on, stored next to it for later diffs."""
+    return {
+        "mode": mode,
+        "positions": positions,
+        "start": start_date,
+        "end": end_date,
+        "shift_length": shift_length,
+        "min_staff": min_staff,
+        "hours": dict(workplace.hours_of_operation),
+        "templates": dict(getattr(workplace, "shift_templates", None) or {}),
+        "workers": {w.name: (w.position, w.availability) for w in workplace.workers},
+    }
+
+
+def diff_inputs(old, new):
+    """Return (changed weekday names, removed workers, changed workers, added workers)."""
+    old_templates, new_templates = old.get("templates", {}), new.get("templates", {})
+    changed_days = {day for day in DAY_NAMES if old["hours"].get(day) != new["hours"].get(day)
+                    or old_templates.get(day) != new_templates.get(day)}
+    old_workers, new_workers = old["workers"], new["workers"]
+    removed = {name for name in old_workers if name not in new_workers}
+    added = {name for name in new_workers if name not in old_workers}
+    changed = {name for name, data in new_workers.items()
+               if name in old_workers and old_workers[name] != data}
+    return changed_days, removed, changed, added
+
+
+class _Limits:
+    """
+    What a worker taking a vacancy must respect besides availability: no
+    shift overlapping (or, in rolling mode, closer than the rest period to)
+    their shifts on the day before and after, and in balanced and rolling
+    mode their Max Hours per 7 days counted from the start of the range.
+    """
+
+    def __init__(self, mode, roster, by_name, schedule, start_date, end_date):
+        from balancing import hour_limits
+        from rolling import REST_HOURS
+
+        self.by_name = by_name
+        self.schedule = schedule
+        self.start_date = start_date
+        self.rest = REST_HOURS * 60 if mode == "rolling" else 0
+        self.max_minutes = None
+        if mode != "flow":
+            self.max_minutes = hour_limits(roster)[1]
+            weeks = (end_date - start_date).days // 7 + 1
+            self.week = np.zeros((weeks, len(roster)), dtype=np.int64)
+        self._bounds = {}
+
+    def _week(self, date):
+        offset = (date - self.start_date).days
+        return offset // 7 if offset >= 0 and self.max_minutes is not None and offset // 7 < len(self.week) else None
+
+    def count(self, date, indices, minutes):
+        """Add `minutes` (negative to take them off) to the week of `date` for `indices`."""
+        week = self._week(date)
+        if week is not None:
+            self.week[week, indices] += minutes
+
+    def changed(self, date):
+        """Forget the shifts cached for `date` after it was rewritten."""
+        self._bounds.pop(date, None)
+
+    def bounds(self, date):
+        """(worker indices, starts, ends) of the shifts on `date`."""
+        cached = self._bounds.get(date)
+        if cached is None:
+            indices, starts, ends = [], [], []
+            for shift, assigned in (self.schedule.get(date) or {}).items():
+                shift_bounds = parse_shift_name(shift)
+                if shift_bounds is None:
+                    continue
+                for name in assigned:
+                    i = self.by_name.get(name)
+                    if i is not None:
+                        indices.append(i)
+                        starts.append(shift_bounds[0])
+                        ends.append(shift_bounds[1])
+            cached = self._bounds[date] = (np.array(indices, dtype=np.int64), np.array(starts, dtype=np.int64),
+                                           np.array(ends, dtype=np.int64))
+        return cached
+
+    def allowed(self, date, start, end, candidates):
+        """`candidates` minus those the limits keep off the shift start..end on `date`."""
+        indices, _, ends = self.bounds(date - timedelta(days=1))
+        blocked = [indices[ends - MINUTES_PER_DAY + self.rest > start]]
+        indices, starts, _ = self.bounds(date + timedelta(days=1))
+        blocked.append(indices[starts + MINUTES_PER_DAY < end + self.rest])
+        blocked = np.concatenate(blocked)
+        if len(blocked):
+            candidates = candidates[~np.isin(candidates, blocked)]
+        week = self._week(date)
+        if week is not None:
+            candidates = candidates[self.week[week, candidates] + (end - start) <= self.max_minutes[candidates]]
+        return candidates
+
+
+def reschedule(workplace, progress=None, exclude=None):
+    """
+    Bring `workplace.shifts` up to date with the current roster and hours.
+
+    The date range, shift length, minimum staff, mode and positions are the
+    ones the schedule was generated with; `exclude` keeps out workers booked
+    at other workplaces, see registry.py. Returns (schedule, stats) where
+    stats counts the days and shifts that were touched, and schedule is None
+    when nothing the schedule depends on has changed. The workplace itself
+    is left alone, so this can run on a snapshot. Raises ValueError when the
+    schedule has no recorded inputs to diff against.
+    """
+    old = getattr(workplace, "schedule_inputs", None)
+    if old is None:
+        raise ValueError("No record of how the existing schedule was generated; generate it again first")
+
+    start_date, end_date = old["start"], old["end"]
+    shift_length, min_staff = old["shift_length"], old["min_staff"]
+    # Inputs recorded before modes existed are flow schedules
+    mode = old.get("mode", "flow")
+    positions = old.get("positions")
+    new = schedule_inputs(workplace, start_date, end_date, shift_length, min_staff, mode, positions)
+    changed_days, removed, changed, added = diff_inputs(old, new)
+    stats = {"days_changed": 0, "shifts_changed": 0}
+    if not (changed_days or removed or changed or added):
+        return None, stats
+
+    roster = workplace.workers
+    index = ensure_index(workplace)
+    names = [w.name for w in roster]
+    by_name = {}
+    for i, name in enumerate(names):
+        by_name.setdefault(name, i)
+    qualified = index.pack([_is_qualified(w, positions) for w in roster])
+
+    schedule = dict(workplace.shifts)
+    plan = ShiftPlan.for_workplace(workplace, shift_length)
+    # Days with new opening hours are rebuilt, so their old shifts neither count nor block anyone
+    for date in list(schedule):
+        if isinstance(date, datetime) and start_date <= date <= end_date and DAY_NAMES[date.weekday()] in changed_days:
+            del schedule[date]
+    limits = _Limits(mode, roster, by_name, schedule, start_date, end_date)
+
+    # Minutes each worker already has, so vacancies go to the least loaded
+    worked = np.zeros(len(roster), dtype=np.int64)
+    day_shift_minutes = {}
+    for date, day_shifts in schedule.items():
+        if not isinstance(date, datetime):
+            continue
+        minutes = _shift_minutes(plan, date)
+        day_shift_minutes[date] = minutes
+        for shift, assigned in day_shifts.items():
+            if shift in minutes:
+                start, end = minutes[shift]
+                indices = [by_name[name] for name in assigned if name in by_name]
+                worked[indices] += end - start
+                limits.count(date, indices, end - start)
+
+    # Workers whose changes can invalidate an assignment; anyone new or changed may fill vacancies
+    recheck = removed | changed
+    may_fill = bool(added or changed)
+
+    def fill(kept, minutes, vacancies, date):
+        filled = _fill_vacancies(kept, minutes, vacancies, index, qualified, by_name, names, worked, date,
+                                 exclude, limits)
+        if filled is not kept:
+            for shift in filled:
+                extra = [by_name[name] for name in filled[shift][len(kept[shift]):]]
+                limits.count(date, extra, minutes[shift][1] - minutes[shift][0])
+        return filled
+
+    total_days = (end_date - start_date).days + 1
+    for offset in range(total_days):
+        date = start_date + timedelta(days=offset)
+        weekday = date.weekday()
+        if progress is not None:
+            progress(offset, total_days)
+
+        if DAY_NAMES[weekday] in changed_days:
+            # Opening hours changed: solve the whole day again
+            minutes = _shift_minutes(plan, date)
+            if minutes:
+                empty = {shift: [] for shift in minutes}
+                schedule[date] = fill(empty, minutes, [min_staff] * len(minutes), date)
+                limits.changed(date)
+                stats["shifts_changed"] += len(minutes)
+            stats["days_changed"] += 1
+            continue
+
+        minutes = day_shift_minutes.get(date)
+        if minutes is None:
+            continue
+        day_shifts = schedule[date]
+        kept = {}
+        dirty = False
+        for shift, assigned in day_shifts.items():
+            start, end = minutes.get(shift, (None, None))
+            valid = []
+            for name in assigned:
+                if name in recheck:
+                    i = by_name.get(name)
+                    if i is None or start is None or not (
+                            _is_qualified(roster[i], positions) and index.is_available(i, weekday, start, end)
+                            and (exclude is None or len(exclude(date, start, end, np.array([i], dtype=np.int64))))):
+                        if i is not None and start is not None:
+                            worked[i] -= end - start
+                            limits.count(date, [i], start - end)
+                        dirty = True
+                        continue
+                valid.append(name)
+            kept[shift] = valid
+
+        vacancies = [max(0, min_staff - len(kept[shift])) if shift in minutes else 0 for shift in kept]
+        if not dirty and not (may_fill and any(vacancies)):
+            continue
+
+        filled = fill(kept, minutes, vacancies, date)
+        changed_shifts = sum(1 for shift in day_shifts if filled[shift] != day_shifts[shift])
+        if changed_shifts:
+            schedule[date] = filled
+            limits.changed(date)
+            stats["days_changed"] += 1
+            stats["shifts_changed"] += changed_shifts
+
+    return dict(sorted(schedule.items(), key=_day_sort_key)), stats
+
+
+def _day_sort_key(item):
+    # Older stores may hold plain string keys; keep them after real dates
+    date = item[0]
+    return (not isinstance(date, datetime), str(date) if not isinstance(date, datetime) else date.isoformat())
+
+
+def _is_qualified(worker, positions):
+    """As in solver.generate_schedule: a name and, when limited, one of the `positions`."""
+    return worker.name.strip() != "" and (positions is None or worker.position in positions)
+
+
+def _shift_minutes(plan, date):
+    """Shift name -> (start, end) minutes for one day, empty when closed."""
+    return {name: (start, end) for name, start, end in plan.day_shifts(date.weekday())}
+
+
+def _fill_vacancies(kept, minutes, vacancies, index, qualified, by_name, names, worked, date, exclude, limits):
+    """Top up short shifts of one day, leaving the workers already on them in place."""
+    if not any(vacancies):
+        return kept
+    busy = np.zeros(len(names), dtype=bool)
+    for assigned in kept.values():
+        for name in assigned:
+            i = by_name.get(name)
+            if i is not None:
+                busy[i] = True
+    free = qualified & index.pack(~busy)
+
+    open_shifts = [shift for shift, vacancy in zip(kept, vacancies) if vacancy]
+    candidates = []
+    for shift in open_shifts:
+        start, end = minutes[shift]
+        shift_candidates = index.unpack(index.mask(date.weekday(), start, end) & free)
+        if exclude is not None:
+            shift_candidates = exclude(date, start, end, shift_candidates)
+        candidates.append(limits.allowed(date, start, end, shift_candidates))
+    demands = [vacancy for vacancy in vacancies if vacancy]
+    assigned = assign_day(open_shifts, candidates, worked, demands)
+
+    filled = dict(kept)
+    for shift, extra in zip(open_shifts, assigned):
+        start, end = minutes[shift]
+        for i in extra:
+            worked[i] += end - start
+        filled[shift] = kept[shift] + [names[i] for i in extra]
+    return filled
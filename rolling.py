@@ -0,0 +1,73 @@
+"""
+Rolling-horizon scheduling: the next N weeks, continuing from the schedule
+already stored on the workplace.
+
+The weeks before the start date are read back into a balancing.Carry:
+
+* minutes each worker was given over the last HISTORY_WEEKS weeks, so hours
+  keep evening out across runs instead of restarting from zero;
+* the shifts worked on the day before, so the first new day honours the
+  minimum rest (no closing shift followed by an opening one);
+* the previous week's assignments, which seed the first new week (and each
+  new week seeds the next), so unchanged rosters keep stable schedules.
+
+Each week is then solved on its own by the balancing optimizer, so cost
+grows linearly with the number of weeks.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from balancing import NO_LIMIT, Carry, balance_schedule
+from shift_templates import parse_shift_name
+
+HISTORY_WEEKS = 4
+# Least time off between two shifts, e.g. closing at 22:00 means no shift before 09:00
+REST_HOURS = 11
+
+
+def history_days(start_date, weeks=HISTORY_WEEKS):
+    """(first, last) day of the history read before `start_date`."""
+    start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start_date - timedelta(days=7 * weeks), start_date - timedelta(days=1)
+
+
+def read_carry(schedule, workers, start_date, weeks=HISTORY_WEEKS):
+    """Build the Carry for a run starting at `start_date` from an existing schedule."""
+    first, last = history_days(start_date, weeks)
+    by_name = {}
+    for i, worker in enumerate(workers):
+        by_name.setdefault(worker.name, i)
+    total = np.zeros(len(workers), dtype=np.int64)
+    last_ends = np.full(len(workers), -NO_LIMIT, dtype=np.int64)
+    previous = {}
+    for date in schedule:
+        # Older stores may hold plain string keys; they carry nothing over
+        if not isinstance(date, datetime) or not first <= date <= last:
+            continue
+        in_last_week = (last - date).days < 7
+        for shift, assigned in schedule[date].items():
+            bounds = parse_shift_name(shift)
+            if bounds is None:
+                continue
+            start, end = bounds
+            indices = [by_name[name] for name in assigned if name in by_name]
+            total[indices] += end - start
+            if date == last:
+                last_ends[indices] = np.maximum(last_ends[indices], end)
+            if in_last_week and indices:
+                previous[(date.weekday(), shift)] = indices
+    return Carry(total, last_ends, previous)
+
+
+def rolling_schedule(workplace, start_date, end_date, shift_length, min_staff, positions=None,
+                     progress=None, rest_hours=REST_HOURS, history_weeks=HISTORY_WEEKS, exclude=None,
+                     steps=None):
+    """
+    Schedule start_date..end_date week by week, warm-started from the
+    workplace's stored schedule before start_date. Returns only the new days,
+    in the {date: {shift: [names]}} layout of the other modes.
+    """
+    carry = read_carry(workplace.shifts, workplace.workers, start_date, history_weeks)
+    return balance_schedule(workplace, start_date, end_date, shift_length, min_staff, positions=positions,
+                            progress=progress, rest_hours=rest_hours, carry=carry, exclude=exclude, steps=steps)
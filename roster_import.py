@@ -0,0 +1,197 @@
+"""
+Streaming roster import for Excel, CSV and Parquet files.
+
+Rows are read in chunks and only the roster columns are kept, so large HR
+exports never sit in memory as a full DataFrame. Every row is validated as
+it streams past and turned straight into a compact worker record.
+"""
+import csv
+import os
+
+from worker import Worker
+
+REQUIRED_COLUMNS = ["Name", "Position", "Availability"]
+OPTIONAL_COLUMNS = ["ID", "Email", "Max Hours", "Min Hours"]
+CHUNK_SIZE = 5000
+
+# How many row problems are kept for reporting
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportResult:
+    def __init__(self, workers, rows_read, skipped, errors, sheets):
+        self.workers = workers
+        self.rows_read = rows_read
+        self.skipped = skipped
+        self.errors = errors
+        self.sheets = sheets
+        self.availability_index = None
+
+    def __len__(self):
+        return len(self.workers)
+
+
+def _normalize_header(value):
+    return " ".join(str(value).replace("_", " ").split()).lower() if value is not None else ""
+
+
+_CANONICAL = {_normalize_header(col): col for col in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+
+
+def _projection(header):
+    """Map canonical column name -> position in `header` for the columns we keep."""
+    positions = {}
+    for i, value in enumerate(header):
+        column = _CANONICAL.get(_normalize_header(value))
+        if column is not None and column not in positions:
+            positions[column] = i
+    return positions
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _iter_xlsx(file_path):
+    """Yield (sheet_name, header, row_iterator) for every sheet of an xlsx workbook."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is not None:
+                yield sheet.title, header, rows
+    finally:
+        workbook.close()
+
+
+def _iter_csv(file_path):
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        rows = csv.reader(f)
+        header = next(rows, None)
+        if header is not None:
+            yield os.path.basename(file_path), header, rows
+
+
+def _iter_parquet(file_path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Reading Parquet files requires the pyarrow package")
+
+    parquet_file = pq.ParquetFile(file_path)
+    header = parquet_file.schema_arrow.names
+    positions = list(_projection(header).values())
+    wanted = [header[i] for i in positions]
+
+    def rows():
+        # Only the roster columns are decoded; everything else stays on disk
+        for batch in parquet_file.iter_batches(batch_size=CHUNK_SIZE, columns=wanted):
+            columns = [batch.column(name).to_pylist() for name in wanted]
+            for values in zip(*columns):
+                row = [None] * len(header)
+                for i, value in zip(positions, values):
+                    row[i] = value
+                yield row
+
+    yield os.path.basename(file_path), header, rows()
+
+
+def _iter_xls(file_path):
+    # Legacy .xls has no streaming reader; fall back to pandas for just the needed columns
+    import pandas as pd
+
+    sheets = pd.read_excel(file_path, sheet_name=None,
+                           usecols=lambda col: _normalize_header(col) in _CANONICAL)
+    for sheet_name, df in sheets.items():
+        yield sheet_name, list(df.columns), df.itertuples(index=False, name=None)
+
+
+_READERS = {
+    ".xlsx": _iter_xlsx,
+    ".xlsm": _iter_xlsx,
+    ".csv": _iter_csv,
+    ".parquet": _iter_parquet,
+    ".xls": _iter_xls,
+}
+
+
+def iter_worker_chunks(file_path, chunk_size=CHUNK_SIZE, result=None, progress=None):
+    """
+    Yield lists of up to `chunk_size` validated worker records from a roster file.
+
+    Sheets without the required columns are skipped; if no sheet has them a
+    ValueError names the missing columns. Row problems are counted on
+    `result` (an ImportResult) when given. `progress(rows_read, None)` is
+    called once per chunk and may raise to abort the import.
+    """
+    if not file_path or not os.path.exists(file_path):
+        raise ValueError("Please select a valid roster file!")
+    extension = os.path.splitext(file_path)[1].lower()
+    reader = _READERS.get(extension)
+    if reader is None:
+        raise ValueError(f"Unsupported file type '{extension}'. Use .xlsx, .xls, .csv or .parquet")
+
+    missing_columns = None
+    found_sheet = False
+    rows_read = 0
+    for sheet_name, header, rows in reader(file_path):
+        positions = _projection(header)
+        missing = [col for col in REQUIRED_COLUMNS if col not in positions]
+        if missing:
+            missing_columns = missing_columns or missing
+            continue
+        found_sheet = True
+        if result is not None:
+            result.sheets.append(sheet_name)
+
+        projected = list(positions.items())
+        chunk = []
+        # Header is row 1 of the sheet
+        for row_number, row in enumerate(rows, start=2):
+            rows_read += 1
+            if result is not None:
+                result.rows_read += 1
+            record = {}
+            for column, i in projected:
+                value = _clean(row[i]) if i < len(row) else None
+                if value is not None:
+                    record[column] = value
+            if not record:
+                continue
+
+            if "Name" not in record:
+                if result is not None:
+                    result.skipped += 1
+                    if len(result.errors) < MAX_REPORTED_ERRORS:
+                        result.errors.append(f"{sheet_name} row {row_number}: missing Name")
+                continue
+
+            chunk.append(Worker.from_record(record))
+            if len(chunk) >= chunk_size:
+                if progress is not None:
+                    progress(rows_read, None)
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    if not found_sheet:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns or REQUIRED_COLUMNS)}")
+
+
+def read_workers(file_path, chunk_size=CHUNK_SIZE, progress=None):
+    """Stream a roster file into an ImportResult holding compact worker records."""
+    result = ImportResult([], 0, 0, [], [])
+    for chunk in iter_worker_chunks(file_path, chunk_size, result, progress):
+        result.workers.extend(chunk)
+    return result
@@ -0,0 +1,237 @@
+"""
+On-disk cache of generated schedules, keyed by a fingerprint of the inputs.
+
+Two kinds of entries live in one SQLite file:
+
+* whole results, keyed by (inputs, mode, date range): generating again with
+  an unchanged roster, hours and parameters is a single lookup;
+* solver steps, keyed by (inputs, mode, day or week, solver state at its
+  start): a day of the flow solver or a week of the balancing optimizer.
+  The state is the hours everyone has worked so far in the run, so an
+  extended or shifted range with the same start replays the days it shares
+  with earlier runs and only solves the new ones.
+
+Every entry records when it was last used; once the file holds more than
+`max_bytes` of results the least recently used entries are dropped.
+
+    SCHEDULER_CACHE=path/to/cache.db   (default schedule_cache.db next to the
+                                        workplace store; "off" disables)
+    SCHEDULER_CACHE_MB=64              (size bound)
+
+Runs that keep workers out for bookings at other workplaces are not cached,
+since their result depends on those other schedules too.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE = "schedule_cache.db"
+# Directory of the workplace store, see use_store()
+_STORE_DIR_ENV = "SCHEDULER_STORE_DIR"
+DEFAULT_MAX_MB = 64
+# Bump whenever solver changes alter results for the same inputs
+CACHE_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries(used);
+"""
+
+_caches = {}
+
+
+def _hash(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else pickle.dumps(part, protocol=pickle.HIGHEST_PROTOCOL))
+    return digest.hexdigest()
+
+
+def fingerprint(workplace, shift_length, min_staff, mode, positions=None):
+    """Digest of everything a schedule depends on apart from the date range."""
+    workers = [(w.name, w.position, w.availability, w.get("Min Hours"), w.get("Max Hours"))
+               for w in workplace.workers]
+    templates = getattr(workplace, "shift_templates", None) or {}
+    return _hash(CACHE_VERSION, mode, float(shift_length), min_staff,
+                 sorted(workplace.hours_of_operation.items()), sorted(templates.items()),
+                 sorted(positions) if positions is not None else None, workers)
+
+
+def range_key(fingerprint, start_date, end_date):
+    """Key of the whole schedule for start_date..end_date."""
+    return _hash(fingerprint, "range", start_date, end_date)
+
+
+def state_digest(*arrays):
+    """Digest of solver state (numpy arrays, None or plain picklable values)."""
+    return _hash(*[value.tobytes() if hasattr(value, "tobytes") else value for value in arrays])
+
+
+class ScheduleCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        # Generation runs on worker threads, so one connection is shared under a lock
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._size = self._stored_size()
+
+    def _stored_size(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, key, touch=True):
+        """The cached value for `key`, or None. touch=False leaves marking it used to touch()."""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if touch:
+                with self.conn:
+                    self.conn.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(row[0])
+
+    def touch(self, keys):
+        """Mark entries as just used, so eviction keeps them."""
+        if not keys:
+            return
+        now = time.time()
+        with self._lock:
+            with self.conn:
+                self.conn.executemany("UPDATE entries SET used = ? WHERE key = ?", [(now, key) for key in keys])
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def put_many(self, items):
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO entries (key, value, size, used) VALUES (?, ?, ?, ?)",
+                                      rows)
+            self._size += sum(row[2] for row in rows)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other processes write too, so start from the real total
+        self._size = self._stored_size()
+        target = self.max_bytes * 0.9
+        if self._size <= target:
+            return
+        drop, freed = [], 0
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY used"):
+            drop.append((key,))
+            freed += size
+            if self._size - freed <= target:
+                break
+        with self.conn:
+            self.conn.executemany("DELETE FROM entries WHERE key = ?", drop)
+        self._size -= freed
+
+    def clear(self):
+        with self._lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM entries")
+            self.conn.execute("VACUUM")
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+
+def use_store(store_path):
+    """
+    Keep the default cache next to the workplace store at `store_path`
+    rather than in the working directory. Set through the environment, so
+    batch worker processes started afterwards use the same file.
+    """
+    os.environ[_STORE_DIR_ENV] = os.path.dirname(os.path.abspath(store_path))
+
+
+def cache_path():
+    """Path of the default cache, or None when SCHEDULER_CACHE turns it off."""
+    value = os.environ.get("SCHEDULER_CACHE", "").strip()
+    if value.lower() in ("0", "off", "false", "no"):
+        return None
+    if value:
+        return os.path.abspath(value)
+    return os.path.join(os.environ.get(_STORE_DIR_ENV) or os.path.abspath(os.curdir), DEFAULT_CACHE)
+
+
+def default_cache():
+    """This process's cache for SCHEDULER_CACHE (opened on first use), or None if disabled."""
+    path = cache_path()
+    if path is None:
+        return None
+    key = (os.getpid(), path)
+    cache = _caches.get(key)
+    if cache is None:
+        try:
+            max_mb = float(os.environ.get("SCHEDULER_CACHE_MB") or DEFAULT_MAX_MB)
+        except ValueError:
+            max_mb = DEFAULT_MAX_MB
+        cache = _caches[key] = ScheduleCache(path, int(max_mb * 1024 * 1024))
+    return cache
+
+
+def close_default():
+    """Close this process's cache for SCHEDULER_CACHE, if it was opened."""
+    path = cache_path()
+    cache = _caches.pop((os.getpid(), path), None) if path is not None else None
+    if cache is not None:
+        cache.close()
+
+
+class Steps:
+    """
+    Step lookups for one solver run. Hits are marked used and new results
+    written together by flush(), in one transaction each rather than one
+    per day.
+    """
+
+    def __init__(self, cache, fingerprint):
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.hits = self.misses = 0
+        self._used = []
+        self._pending = {}
+
+    def get(self, label, state):
+        key = _hash(self.fingerprint, label, state)
+        value = self.cache.get(key, touch=False)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._used.append(key)
+        return value
+
+    def put(self, label, state, value):
+        self._pending[_hash(self.fingerprint, label, state)] = value
+
+    def flush(self):
+        self.cache.touch(self._used)
+        self.cache.put_many(self._pending)
+        self._used, self._pending = [], {}
@@ -0,0 +1,127 @@
+"""
+Virtualized schedule display.
+
+Instead of inserting every line of a schedule into a tk.Text, the view only
+keeps the number of lines each day takes. On every scroll it draws the
+handful of rows that fit in the window, building their text on demand.
+Opening a year-long schedule costs the same as opening a week.
+"""
+import bisect
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+
+from compact_schedule import CompactSchedule
+from scheduler_core import day_label
+
+# Rows around each day's shifts: date, separator line, blank spacer
+_DAY_HEADER_ROWS = 2
+_DAY_FOOTER_ROWS = 1
+
+
+class ScheduleView(ttk.Frame):
+    def __init__(self, parent, font=("TkFixedFont", 10), **kwargs):
+        super().__init__(parent, **kwargs)
+        self.font = tkfont.Font(font=font)
+        self.line_height = self.font.metrics("linespace") + 2
+
+        self.scrollbar = ttk.Scrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.canvas = tk.Canvas(self, background="white", highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda event: self._render())
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.canvas.bind("<Enter>", lambda event: self.canvas.focus_set())
+        for key, rows in (("<Up>", -1), ("<Down>", 1)):
+            self.canvas.bind(key, lambda event, rows=rows: self.scroll_rows(rows))
+        self.canvas.bind("<Prior>", lambda event: self.scroll_rows(-self._visible_rows()))
+        self.canvas.bind("<Next>", lambda event: self.scroll_rows(self._visible_rows()))
+
+        self.set_schedule({})
+
+    def set_schedule(self, schedule, heading=None):
+        """Show `schedule` (date -> {shift: [workers]}); nothing is formatted until it is visible."""
+        self.schedule = schedule
+        self.days = list(schedule.keys())
+        self.heading_rows = [heading, ""] if heading else []
+
+        # day_starts[i] is the first row of day i; built from shift counts only
+        if isinstance(schedule, CompactSchedule):
+            counts = schedule.shift_counts()
+        else:
+            counts = [len(schedule[day]) for day in self.days]
+        self.day_starts = []
+        row = len(self.heading_rows)
+        for count in counts:
+            self.day_starts.append(row)
+            row += _DAY_HEADER_ROWS + count + _DAY_FOOTER_ROWS
+        self.total_rows = row
+
+        self._row_cache = {}
+        self.first_row = 0
+        self._render()
+
+    def clear(self):
+        self.set_schedule({})
+
+    def row_text(self, row):
+        text = self._row_cache.get(row)
+        if text is None:
+            text = self._row_cache[row] = self._build_row(row)
+            if len(self._row_cache) > 2000:
+                self._row_cache.clear()
+        return text
+
+    def _build_row(self, row):
+        if row < len(self.heading_rows):
+            return self.heading_rows[row]
+        i = bisect.bisect_right(self.day_starts, row) - 1
+        day = self.days[i]
+        offset = row - self.day_starts[i]
+        if offset == 0:
+            return day_label(day)
+        if offset == 1:
+            return "-" * 40
+        shifts = self.schedule[day]
+        shift_index = offset - _DAY_HEADER_ROWS
+        if shift_index < len(shifts):
+            # Only the visible day's shifts are touched
+            shift, workers = list(shifts.items())[shift_index]
+            return f"{shift}: {', '.join(workers)}"
+        return ""
+
+    def _visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.line_height)
+
+    def _render(self):
+        self.canvas.delete("all")
+        visible = self._visible_rows()
+        self.first_row = max(0, min(self.first_row, self.total_rows - visible))
+        last_row = min(self.total_rows, self.first_row + visible + 1)
+        for offset, row in enumerate(range(self.first_row, last_row)):
+            self.canvas.create_text(5, offset * self.line_height, anchor="nw",
+                                    text=self.row_text(row), font=self.font)
+        if self.total_rows:
+            self.scrollbar.set(self.first_row / self.total_rows, min(1.0, last_row / self.total_rows))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_rows(self, rows):
+        self.first_row += rows
+        self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first_row = int(float(amount) * self.total_rows)
+            self._render()
+        elif action == "scroll":
+            step = self._visible_rows() if unit == "pages" else 1
+            self.scroll_rows(int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll_rows(-3 * delta)
@@ -0,0 +1,340 @@
+"""
+Headless command line for batch schedule generation.
+
+    python -m scheduler_cli list
+    python -m scheduler_cli import "Main Street" roster.xlsx
+    python -m scheduler_cli generate --start 2025-01-06 --end 2025-01-12 --shift-length 8 --min-staff 2
+    python -m scheduler_cli generate --start 2025-01-06 --end 2025-03-30 --jobs 8
+    python -m scheduler_cli generate --start 2025-01-06 --end 2025-03-30 --mode balanced
+    python -m scheduler_cli generate --start 2025-04-07 --weeks 4 --mode rolling
+    python -m scheduler_cli reschedule --workplace "Main Street"
+    python -m scheduler_cli export --format csv,ics --output exports
+    python -m scheduler_cli coverage --workplace "Main Street"
+    python -m scheduler_cli conflicts
+    python -m scheduler_cli cache --clear
+    python -m scheduler_cli --instrument --profile generate.prof generate --start 2025-01-06 --end 2025-01-12
+
+Never imports tkinter, so it runs from cron on display-less servers.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+import batch
+import instrumentation
+import schedule_cache
+import scheduler_core
+from scheduler_core import Workplace
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD")
+
+
+def select_workplaces(workplaces, names):
+    """Pick the named workplaces (all of them when no names are given)."""
+    if not names:
+        return list(workplaces)
+    by_name = {wp.name: wp for wp in workplaces}
+    missing = [name for name in names if name not in by_name]
+    if missing:
+        raise SystemExit(f"error: unknown workplace(s): {', '.join(missing)}")
+    return [by_name[name] for name in names]
+
+
+def cmd_list(args):
+    for wp in scheduler_core.load_workplaces(args.store):
+        print(f"{wp.name}\t{len(wp.workers)} workers\t{len(wp.shifts)} scheduled days")
+    return 0
+
+
+def cmd_import(args):
+    workplaces = scheduler_core.load_workplaces(args.store)
+    workplace = next((wp for wp in workplaces if wp.name == args.workplace), None)
+    if workplace is None:
+        workplace = Workplace(args.workplace)
+        workplaces.append(workplace)
+    try:
+        result = scheduler_core.import_roster(workplace, args.file)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    scheduler_core.save_workplaces(workplaces, args.store)
+    print(f"Imported {len(result)} workers into '{workplace.name}'")
+    if result.skipped:
+        print(f"Skipped {result.skipped} invalid rows", file=sys.stderr)
+        for error in result.errors:
+            print(f"  {error}", file=sys.stderr)
+    return 0
+
+
+def cmd_generate(args):
+    if args.weeks is not None:
+        args.end = args.start + timedelta(days=7 * args.weeks - 1)
+    if args.end < args.start:
+        print("error: --end is before --start", file=sys.stderr)
+        return 1
+    if args.chunk_days is not None and args.chunk_days < 1:
+        print("error: --chunk-days must be at least 1", file=sys.stderr)
+        return 1
+    workplaces = scheduler_core.load_workplaces(args.store)
+    selected = select_workplaces(workplaces, args.workplace)
+    for workplace in selected:
+        if not workplace.workers:
+            print(f"Skipping '{workplace.name}': no worker data imported", file=sys.stderr)
+
+    # Shifts people already have at the workplaces left alone; overnight ones reach into the range
+    others = [wp for wp in workplaces if all(wp is not chosen for chosen in selected)]
+    booked = None
+    if others:
+        from registry import registry_from
+
+        booked = registry_from(others, args.start - timedelta(days=1), args.end)
+    scheduled = batch.generate_all(selected, args.start, args.end, args.shift_length, args.min_staff,
+                                   max_workers=args.jobs, days_per_chunk=args.chunk_days, mode=args.mode,
+                                   booked=booked, positions=scheduler_core.qualified_positions(args.position))
+    for workplace in scheduled:
+        print(f"Scheduled '{workplace.name}': {len(workplace.shifts)} days")
+        if args.print:
+            for line in scheduler_core.format_schedule(workplace.shifts):
+                print(line)
+    scheduler_core.save_workplaces(workplaces, args.store)
+    return 0
+
+
+def cmd_reschedule(args):
+    from registry import registry_from
+
+    workplaces = scheduler_core.load_workplaces(args.store)
+    for workplace in select_workplaces(workplaces, args.workplace):
+        if not workplace.shifts:
+            continue
+        inputs = workplace.schedule_inputs
+        exclude = None
+        others = [wp for wp in workplaces if wp is not workplace]
+        if inputs is not None and others:
+            # Their current shifts, including any updated above, so a shared worker is never booked twice
+            booked = registry_from(others, inputs["start"] - timedelta(days=1), inputs["end"])
+            exclude = booked.exclusion(workplace.workers)
+        try:
+            stats = scheduler_core.reschedule(workplace, exclude=exclude)
+        except ValueError as e:
+            print(f"Skipping '{workplace.name}': {e}", file=sys.stderr)
+            continue
+        print(f"Updated '{workplace.name}': {stats['shifts_changed']} shifts on {stats['days_changed']} days")
+    scheduler_core.save_workplaces(workplaces, args.store)
+    return 0
+
+
+def parse_shift_length(value):
+    from shift_templates import check_shift_length
+
+    try:
+        check_shift_length(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return float(value)
+
+
+def parse_formats(value):
+    import export
+
+    formats = [part.strip().lower() for part in value.split(",") if part.strip()]
+    unknown = [fmt for fmt in formats if fmt not in export.FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(f"unknown format(s) {', '.join(unknown) or value!r}, "
+                                         f"choose from {', '.join(export.FORMATS)}")
+    return formats
+
+
+def cmd_export(args):
+    import export
+
+    wanted = set(args.workplace or ())
+    exported = 0
+    # One workplace in memory at a time, so whole-store exports stay bounded
+    for workplace in scheduler_core.iter_workplaces(args.store):
+        if wanted and workplace.name not in wanted:
+            continue
+        wanted.discard(workplace.name)
+        if not workplace.shifts:
+            print(f"Skipping '{workplace.name}': no schedule generated", file=sys.stderr)
+            continue
+        try:
+            paths = export.export_workplace(workplace, args.output, args.format)
+        except ImportError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+        exported += 1
+        print(f"Exported '{workplace.name}': {', '.join(paths)}")
+    if wanted:
+        print(f"error: unknown workplace(s): {', '.join(sorted(wanted))}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_coverage(args):
+    import coverage_report
+
+    workplaces = scheduler_core.load_workplaces(args.store)
+    status = 0
+    for workplace in select_workplaces(workplaces, args.workplace):
+        if not workplace.shifts:
+            continue
+        try:
+            report = coverage_report.analyze_coverage(workplace, args.start, args.end, args.min_staff)
+        except ValueError as e:
+            print(f"Skipping '{workplace.name}': {e}", file=sys.stderr)
+            status = 1
+            continue
+        print(f"== {workplace.name} ==")
+        print(report.format(args.limit))
+        print()
+    return status
+
+
+def cmd_conflicts(args):
+    from registry import registry_from
+
+    registry = registry_from(scheduler_core.load_workplaces(args.store), args.start, args.end)
+    for key, (workplace, date, shift), (other, other_date, other_shift) in registry.conflicts:
+        print(f"{key.partition(':')[2]}: {workplace} {date:%Y-%m-%d} {shift} overlaps "
+              f"{other} {other_date:%Y-%m-%d} {other_shift}")
+    print(f"{len(registry.conflicts)} double-bookings", file=sys.stderr)
+    return 1 if registry.conflicts else 0
+
+
+def cmd_cache(args):
+    cache = schedule_cache.default_cache()
+    if cache is None:
+        print("Schedule cache is turned off (SCHEDULER_CACHE)", file=sys.stderr)
+        return 0
+    if args.clear:
+        cache.clear()
+    stats = cache.stats()
+    print(f"{stats['path']}\t{stats['entries']} entries\t{stats['bytes'] / 2 ** 20:.1f} of "
+          f"{stats['max_bytes'] / 2 ** 20:.0f} MB")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m scheduler_cli",
+                                     description="Generate workplace schedules without the GUI.")
+    parser.add_argument("--store", default=scheduler_core.DEFAULT_STORE,
+                        help=f"SQLite workplace store to read and update, or a legacy .pkl file "
+                             f"(default: {scheduler_core.DEFAULT_STORE})")
+    parser.add_argument("--instrument", action="store_true",
+                        help="log time, counts and peak memory per phase as JSON lines to "
+                             f"SCHEDULER_METRICS_LOG (default: {instrumentation.DEFAULT_LOG}); "
+                             "same as SCHEDULER_INSTRUMENT=1")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="with --instrument, skip tracemalloc and record time and counts only")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="run the command under cProfile and write the stats to PATH "
+                             "(default: SCHEDULER_PROFILE, if set)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="solve everything again instead of reusing cached results; "
+                             "same as SCHEDULER_CACHE=off")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list workplaces in the store")
+    list_parser.set_defaults(func=cmd_list)
+
+    import_parser = commands.add_parser("import", help="import a roster spreadsheet into a workplace")
+    import_parser.add_argument("workplace", help="workplace name (created if missing)")
+    import_parser.add_argument("file", help="Excel, CSV or Parquet file with Name, Position and Availability columns")
+    import_parser.set_defaults(func=cmd_import)
+
+    generate_parser = commands.add_parser("generate", help="generate and store schedules in parallel")
+    generate_parser.add_argument("--workplace", action="append",
+                                 help="workplace to schedule, may be repeated (default: all)")
+    generate_parser.add_argument("--start", type=parse_date, required=True, help="first day, YYYY-MM-DD")
+    span = generate_parser.add_mutually_exclusive_group(required=True)
+    span.add_argument("--end", type=parse_date, help="last day, YYYY-MM-DD")
+    span.add_argument("--weeks", type=int, help="schedule this many weeks from --start instead of --end")
+    generate_parser.add_argument("--shift-length", type=parse_shift_length, default=8, help="shift length in hours (default: 8)")
+    generate_parser.add_argument("--min-staff", type=int, default=2, help="minimum staff per shift (default: 2)")
+    generate_parser.add_argument("--jobs", type=int, default=None,
+                                 help="worker processes (default: all cores, 1 runs in-process)")
+    generate_parser.add_argument("--chunk-days", type=int, default=None,
+                                 help="flow mode: solve long ranges in chunks of this many days in parallel; "
+                                      "hours are then only evened out within each chunk (default: whole range "
+                                      "per workplace, as when generating it alone). Results never depend on --jobs")
+    generate_parser.add_argument("--mode", choices=scheduler_core.SCHEDULE_MODES, default="flow",
+                                 help="flow: fast per-day assignment; balanced: even out hours across the range "
+                                      "and respect Max Hours/Min Hours roster columns; rolling: balanced week by "
+                                      "week, continuing hours, rest periods and assignments from the stored weeks "
+                                      "before --start (default: flow)")
+    generate_parser.add_argument("--position", action="append",
+                                 help="only schedule workers with this Position, may be repeated (default: any)")
+    generate_parser.add_argument("--print", action="store_true", help="print the generated schedules")
+    generate_parser.set_defaults(func=cmd_generate)
+
+    reschedule_parser = commands.add_parser(
+        "reschedule", help="update existing schedules for roster/hours changes, keeping other assignments")
+    reschedule_parser.add_argument("--workplace", action="append",
+                                   help="workplace to update, may be repeated (default: all)")
+    reschedule_parser.set_defaults(func=cmd_reschedule)
+
+    export_parser = commands.add_parser("export", help="write schedules to CSV, Excel, iCalendar or Word files")
+    export_parser.add_argument("--workplace", action="append",
+                               help="workplace to export, may be repeated (default: all)")
+    export_parser.add_argument("--format", type=parse_formats, default=["csv"],
+                               help="comma-separated formats: csv, xlsx, ics (one file per worker), docx "
+                                    "(default: csv)")
+    export_parser.add_argument("--output", default="exports",
+                               help="directory to write into, one folder per workplace (default: exports)")
+    export_parser.set_defaults(func=cmd_export)
+
+    coverage_parser = commands.add_parser(
+        "coverage", help="report assigned vs. available vs. required staff and understaffed windows")
+    coverage_parser.add_argument("--workplace", action="append",
+                                 help="workplace to analyse, may be repeated (default: all)")
+    coverage_parser.add_argument("--start", type=parse_date, help="first day (default: schedule start)")
+    coverage_parser.add_argument("--end", type=parse_date, help="last day (default: schedule end)")
+    coverage_parser.add_argument("--min-staff", type=int,
+                                 help="required staff per shift (default: the value the schedule used)")
+    coverage_parser.add_argument("--limit", type=int, default=20,
+                                 help="understaffed windows to list (default: 20)")
+    coverage_parser.set_defaults(func=cmd_coverage)
+
+    conflicts_parser = commands.add_parser(
+        "conflicts", help="list workers booked at overlapping times across workplaces (exit status 1 if any)")
+    conflicts_parser.add_argument("--start", type=parse_date, help="first day to check (default: all)")
+    conflicts_parser.add_argument("--end", type=parse_date, help="last day to check (default: all)")
+    conflicts_parser.set_defaults(func=cmd_conflicts)
+
+    cache_parser = commands.add_parser(
+        "cache", help="show the size of the schedule cache (SCHEDULER_CACHE, default: schedule_cache.db next to the store)")
+    cache_parser.add_argument("--clear", action="store_true", help="drop every cached result first")
+    cache_parser.set_defaults(func=cmd_cache)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    schedule_cache.use_store(args.store)
+    if args.no_cache:
+        # Through the environment, so batch worker processes see it too
+        os.environ["SCHEDULER_CACHE"] = "off"
+    if args.instrument:
+        instrumentation.enable(memory=not args.no_memory)
+    else:
+        instrumentation.enable_from_env()
+    profile_path = args.profile or instrumentation.profile_path_from_env()
+    try:
+        with instrumentation.profile(profile_path):
+            return args.func(args)
+    finally:
+        if instrumentation.is_enabled():
+            print(f"Metrics written to {instrumentation.log_path()}", file=sys.stderr)
+        if profile_path:
+            print(f"Profile written to {profile_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
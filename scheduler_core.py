@@ -0,0 +1,413 @@
+"""
+Scheduling core shared by the Tk app and the command line.
+
+Nothing in here imports tkinter, so it can run on display-less servers.
+The numpy-backed modules are imported where they are first needed, so the
+app can list workplaces before paying for them.
+"""
+import os
+import pickle
+from datetime import datetime
+
+import instrumentation
+from worker import as_workers
+
+DEFAULT_STORE = "workplaces.db"
+# "flow" solves each day on its own; "balanced" evens out hours and honours Max/Min Hours, see balancing.py;
+# "rolling" is balanced week by week, continuing from the stored schedule with rest between shifts, see rolling.py
+SCHEDULE_MODES = ("flow", "balanced", "rolling")
+LEGACY_STORE = "workplaces.pkl"
+
+# Open SQLite stores by absolute path, see get_store()
+_open_stores = {}
+
+
+class Workplace:
+    def __init__(self, name, hours_of_operation=None, workers=None, shifts=None):
+        from compact_schedule import CompactSchedule
+
+        self.name = name
+        self.hours_of_operation = hours_of_operation or {"Monday": ("9:00", "17:00"),
+                                                         "Tuesday": ("9:00", "17:00"),
+                                                         "Wednesday": ("9:00", "17:00"),
+                                                         "Thursday": ("9:00", "17:00"),
+                                                         "Friday": ("9:00", "17:00"),
+                                                         "Saturday": ("10:00", "16:00"),
+                                                         "Sunday": ("10:00", "16:00")}
+        self.workers = as_workers(workers or [])
+        self.shifts = CompactSchedule.from_dict(shifts or {})
+        self.excel_file = None
+        self.availability_index = None
+        # What the current shifts were generated from, see reschedule.py
+        self.schedule_inputs = None
+        # Optional explicit shifts per day: {"Monday": [("6:00", "14:00"), ...]}, see shift_templates.py
+        self.shift_templates = None
+
+    def __setstate__(self, state):
+        from compact_schedule import CompactSchedule
+
+        # Pickles from older versions: row dicts for workers and fewer attributes
+        self.__dict__.update(state)
+        self.workers = as_workers(self.workers)
+        self.shifts = CompactSchedule.from_dict(self.shifts)
+        for attribute in ("excel_file", "availability_index", "schedule_inputs", "shift_templates"):
+            self.__dict__.setdefault(attribute, None)
+
+    def __str__(self):
+        return self.name
+
+
+def read_roster(file_path, progress=None):
+    """Stream and index a roster file without touching any workplace (safe off the UI thread)."""
+    from availability_index import AvailabilityIndex
+    from roster_import import read_workers
+
+    with instrumentation.phase("import", file=os.path.basename(str(file_path))) as metrics:
+        result = read_workers(file_path, progress=progress)
+        result.availability_index = AvailabilityIndex.from_workers(result.workers)
+        metrics.update(rows=result.rows_read, workers=len(result.workers), skipped=result.skipped)
+    return result
+
+
+def apply_roster(workplace, result, file_path):
+    workplace.workers = result.workers
+    workplace.excel_file = file_path
+    workplace.availability_index = result.availability_index
+
+
+def import_roster(workplace, file_path, progress=None):
+    """Replace the workplace's workers with the roster in `file_path`; returns the ImportResult."""
+    result = read_roster(file_path, progress)
+    apply_roster(workplace, result, file_path)
+    return result
+
+
+def snapshot(workplace, history_before=None, with_schedule=False):
+    """
+    Copy of the inputs the solver needs, safe to hand to a background
+    thread or another process while the original keeps being edited.
+    Past schedules are left out since they can be large, except for the
+    few weeks before `history_before` that rolling mode continues from, or
+    all of it together with the inputs it was generated from when
+    `with_schedule` is set (for rescheduling).
+    """
+    from solver import ensure_index
+
+    history = None
+    if with_schedule:
+        history = workplace.shifts
+    elif history_before is not None and workplace.shifts:
+        from rolling import history_days
+
+        first, last = history_days(history_before)
+        history = {date: workplace.shifts[date] for date in workplace.shifts
+                   if isinstance(date, datetime) and first <= date <= last}
+    copy = Workplace(workplace.name, dict(workplace.hours_of_operation), workplace.workers, history)
+    copy.availability_index = ensure_index(workplace)
+    copy.shift_templates = getattr(workplace, "shift_templates", None)
+    if with_schedule:
+        copy.schedule_inputs = workplace.schedule_inputs
+    return copy
+
+
+def format_preview(workers, limit=5):
+    """Render the first `limit` workers as a plain text table."""
+    rows = workers[:limit]
+    columns = []
+    for worker in rows:
+        for column in worker:
+            if column not in columns:
+                columns.append(column)
+    table = [columns] + [["" if w.get(col) is None else str(w.get(col)) for col in columns] for w in rows]
+    widths = [max(len(row[i]) for row in table) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+                     for row in table)
+
+
+def generate_ai_schedule(workplace, start_date, end_date, shift_length, min_staff, progress=None, mode="flow",
+                         exclude=None, positions=None):
+    """
+    Generate a schedule based on workplace data and constraints.
+    Workers are matched to shifts by availability and balanced by hours worked.
+    `exclude` keeps out workers booked at other workplaces, see registry.py.
+    `positions` limits shifts to workers whose Position is one of them, see
+    qualified_positions().
+
+    Results are cached on disk by their inputs (see schedule_cache.py), except
+    with `exclude`, whose bookings are not part of the key.
+    """
+    from shift_templates import check_shift_length
+
+    if mode not in SCHEDULE_MODES:
+        raise ValueError(f"Unknown schedule mode: {mode!r}")
+    check_shift_length(shift_length)
+    with instrumentation.phase("generate", workplace=workplace.name, mode=mode, workers=len(workplace.workers),
+                               days=(end_date - start_date).days + 1) as metrics:
+        import schedule_cache
+
+        cache = schedule_cache.default_cache() if exclude is None else None
+        steps = key = None
+        if cache is not None:
+            fingerprint = schedule_cache.fingerprint(workplace, shift_length, min_staff, mode, positions)
+            # Rolling runs also depend on the stored history; its weeks are cached as steps only
+            if mode != "rolling":
+                key = schedule_cache.range_key(fingerprint, start_date, end_date)
+                schedule = cache.get(key)
+                if schedule is not None:
+                    metrics["cache"] = "hit"
+                    metrics["shifts"] = sum(len(day_shifts) for day_shifts in schedule.values())
+                    return schedule
+            steps = schedule_cache.Steps(cache, fingerprint)
+
+        if mode == "balanced":
+            from balancing import balance_schedule
+
+            schedule = balance_schedule(workplace, start_date, end_date, shift_length, min_staff, positions,
+                                        progress=progress, exclude=exclude, steps=steps)
+        elif mode == "rolling":
+            from rolling import rolling_schedule
+
+            schedule = rolling_schedule(workplace, start_date, end_date, shift_length, min_staff, positions,
+                                        progress=progress, exclude=exclude, steps=steps)
+        else:
+            from solver import generate_schedule
+
+            schedule = generate_schedule(workplace, start_date, end_date, shift_length, min_staff, positions,
+                                         progress=progress, exclude=exclude, steps=steps)
+        if steps is not None:
+            steps.flush()
+            if key is not None:
+                cache.put(key, schedule)
+            metrics.update(cache="miss", step_hits=steps.hits, step_misses=steps.misses)
+        metrics["shifts"] = sum(len(day_shifts) for day_shifts in schedule.values())
+    return schedule
+
+
+def qualified_positions(values):
+    """
+    The positions a schedule is limited to, as a sorted tuple, from a list or
+    comma-separated text; None (anyone qualifies) when there are none.
+    """
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = values.split(",")
+    positions = tuple(sorted({str(value).strip() for value in values} - {""}))
+    return positions or None
+
+
+def apply_schedule(workplace, schedule, start_date, end_date, shift_length, min_staff, inputs_from=None,
+                   keep_history=False, mode="flow", positions=None):
+    """
+    Store a generated schedule on `workplace` together with the inputs it was
+    built from (taken from `inputs_from`, e.g. the snapshot that was solved),
+    the `mode` it was generated in and the `positions` it was limited to.
+    With `keep_history`, days before start_date stay in the schedule
+    (rolling mode), otherwise the new schedule replaces the old one.
+    """
+    from compact_schedule import CompactSchedule
+    from reschedule import schedule_inputs
+
+    if keep_history and workplace.shifts:
+        earlier = {date: workplace.shifts[date] for date in workplace.shifts
+                   if isinstance(date, datetime) and date < start_date}
+        schedule = {**earlier, **schedule}
+    workplace.shifts = CompactSchedule.from_dict(schedule)
+    workplace.schedule_inputs = schedule_inputs(inputs_from or workplace, start_date, end_date,
+                                                shift_length, min_staff, mode, positions)
+
+
+def solve_reschedule(workplace, progress=None, exclude=None):
+    """
+    Work out the update of the workplace's schedule for roster/hours changes
+    without touching it, see reschedule.py; returns (schedule, stats) with
+    schedule None when nothing changed. `exclude` keeps out workers booked
+    at other workplaces, as in generate_ai_schedule.
+    """
+    import reschedule as incremental
+
+    inputs = workplace.schedule_inputs
+    mode = inputs.get("mode", "flow") if inputs is not None else None
+    with instrumentation.phase("reschedule", workplace=workplace.name, mode=mode) as metrics:
+        schedule, stats = incremental.reschedule(workplace, progress, exclude)
+        metrics.update(stats)
+    return schedule, stats
+
+
+def apply_reschedule(workplace, schedule, inputs_from=None):
+    """Store a schedule from solve_reschedule on `workplace`, keeping the range, mode and limits it had."""
+    inputs = workplace.schedule_inputs
+    apply_schedule(workplace, schedule, inputs["start"], inputs["end"], inputs["shift_length"],
+                   inputs["min_staff"], inputs_from, mode=inputs.get("mode", "flow"),
+                   positions=inputs.get("positions"))
+
+
+def reschedule(workplace, progress=None, exclude=None):
+    """Update the workplace's schedule for roster/hours changes; returns the change stats."""
+    schedule, stats = solve_reschedule(workplace, progress, exclude)
+    if schedule is not None:
+        apply_reschedule(workplace, schedule)
+    return stats
+
+
+def day_label(date):
+    # Older stores may hold plain string keys
+    if isinstance(date, str):
+        return date
+    return date.strftime('%Y-%m-%d (%A)')
+
+
+def format_schedule(schedule):
+    """Yield the text lines used to show a schedule."""
+    for date, shifts in schedule.items():
+        yield day_label(date)
+        yield "-" * 40
+        for shift, workers in shifts.items():
+            yield f"{shift}: {', '.join(workers)}"
+        yield ""
+
+
+class _WorkplaceUnpickler(pickle.Unpickler):
+    # Stores written by running Main.py as a script reference __main__.Workplace
+    def find_class(self, module, name):
+        if name == "Workplace" and module in ("__main__", "Main"):
+            return Workplace
+        return super().find_class(module, name)
+
+
+def save_pickle(workplaces, path):
+    # Write beside the old file and rename over it, so a crash mid-write never leaves half a pickle
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump(workplaces, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def load_pickle(path):
+    """Load a list of workplaces from a pickle file; a missing file is an empty list."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        return _WorkplaceUnpickler(f).load()
+
+
+def get_store(path=DEFAULT_STORE):
+    """
+    Return the open SQLite store for `path`. Stores are kept open so their
+    change tracking carries over between loads and saves. A new database
+    picks up a legacy workplaces.pkl from the same directory.
+    """
+    from storage import open_store
+
+    key = os.path.abspath(path)
+    store = _open_stores.get(key)
+    if store is None:
+        legacy = os.path.join(os.path.dirname(key), LEGACY_STORE)
+        store = _open_stores[key] = open_store(key, legacy_pickle=legacy)
+    return store
+
+
+def save_workplaces(workplaces, path=DEFAULT_STORE, names=None):
+    """
+    Save workplaces; .pkl paths are rewritten whole, anything else goes to
+    SQLite incrementally. `names` is the full ordered list of workplaces when
+    `workplaces` only holds the loaded ones; the rest keep their stored data.
+    """
+    with instrumentation.phase("save", store=os.path.basename(path), workplaces=len(workplaces)):
+        if path.endswith(".pkl"):
+            save_pickle(workplaces, path)
+        else:
+            get_store(path).save_all(workplaces, names)
+
+
+def load_workplaces(path=DEFAULT_STORE):
+    with instrumentation.phase("load", store=os.path.basename(path)) as metrics:
+        workplaces = load_pickle(path) if path.endswith(".pkl") else get_store(path).load_all()
+        metrics.update(workplaces=len(workplaces), workers=sum(len(wp.workers) for wp in workplaces),
+                       days=sum(len(wp.shifts) for wp in workplaces))
+    return workplaces
+
+
+def load_workplace(name, path=DEFAULT_STORE):
+    """Load a single workplace by name; raises KeyError if it is not stored."""
+    with instrumentation.phase("load", store=os.path.basename(path), workplace=name) as metrics:
+        if path.endswith(".pkl"):
+            workplace = next((wp for wp in load_pickle(path) if wp.name == name), None)
+        else:
+            workplace = get_store(path).load(name)
+        if workplace is None:
+            raise KeyError(name)
+        metrics.update(workers=len(workplace.workers), days=len(workplace.shifts))
+    return workplace
+
+
+class WorkplaceList:
+    """
+    The workplaces of a store, listed by name and each loaded on first use.
+    Listing an SQLite store only reads the names; legacy .pkl files have no
+    index and are read whole.
+    """
+
+    def __init__(self, path=DEFAULT_STORE, names=None):
+        self.path = path
+        self._loaded = {}
+        if names is not None:
+            self.names = list(names)
+        elif path.endswith(".pkl"):
+            workplaces = load_workplaces(path)
+            self.names = [wp.name for wp in workplaces]
+            self._loaded = {wp.name: wp for wp in workplaces}
+        else:
+            self.names = get_store(path).workplace_names()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __getitem__(self, index):
+        return self.get(self.names[index])
+
+    def __iter__(self):
+        # Loads every workplace; use .names when only the names are needed
+        for name in list(self.names):
+            yield self.get(name)
+
+    def get(self, name):
+        workplace = self._loaded.get(name)
+        if workplace is None:
+            if name not in self.names:
+                raise KeyError(name)
+            workplace = self._loaded[name] = load_workplace(name, self.path)
+        return workplace
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def append(self, workplace):
+        if workplace.name in self.names:
+            raise ValueError(f"Workplace '{workplace.name}' already exists")
+        self.names.append(workplace.name)
+        self._loaded[workplace.name] = workplace
+
+    def remove(self, name):
+        self.names.remove(name)
+        self._loaded.pop(name, None)
+
+    def save(self):
+        """Save the loaded workplaces and the list order; unopened workplaces are left as stored."""
+        save_workplaces([self._loaded[name] for name in self.names if name in self._loaded], self.path,
+                        names=list(self.names))
+
+
+def iter_workplaces(path=DEFAULT_STORE):
+    """Yield stored workplaces one at a time; SQLite stores only ever hold one in memory."""
+    if path.endswith(".pkl"):
+        yield from load_pickle(path)
+        return
+    store = get_store(path)
+    for name in store.workplace_names():
+        yield store.load(name)
@@ -0,0 +1,430 @@
+"""
+Local HTTP/JSON scheduling service.
+
+    python -m scheduler_server --port 8765 --jobs 4
+
+    GET  /workplaces                          names in store order
+    GET  /workplaces/<name>                   hours, shift templates and counts
+    GET  /workplaces/<name>/workers           the roster
+    GET  /workplaces/<name>/schedule          stored schedule (?start=&end= to narrow it)
+    POST /workplaces/<name>/generate          {"start": "2025-01-06", "end": "2025-01-12" or "weeks": 4,
+                                               "shift_length": 8, "min_staff": 2, "mode": "flow",
+                                               "positions": ["Cashier"], "save": false}
+
+    curl -X POST localhost:8765/workplaces/Main%20Street/generate -d '{"start": "2025-01-06", "weeks": 4}'
+
+Schedules come back as one JSON object, {"workplace": ..., "schedule":
+{"YYYY-MM-DD": {shift: [names]}}}, sent with chunked transfer encoding a
+month at a time, so long ranges start arriving before they are serialized.
+
+Generate requests arriving within `--batch-window` of each other are solved
+together: requests with the same parameters share one batch.solve_all call
+(workplaces sharing workers are coordinated as in the CLI) on a process pool
+that stays up for the life of the server. Shifts people already have at the
+other workplaces of the store are kept out, as in `scheduler_cli generate`.
+
+Runs on the standard library alone (asyncio streams, HTTP/1.1 with
+keep-alive). Workplaces are loaded once and kept in memory, and every store
+access happens on one thread, so the server should be the only process
+writing to its store while it runs. Bind it to localhost: there is no
+authentication.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import batch
+import instrumentation
+import schedule_cache
+import scheduler_core
+from shift_templates import check_shift_length
+
+DEFAULT_PORT = 8765
+# Days per chunk of a streamed schedule
+STREAM_DAYS = 31
+MAX_BODY = 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _date(value, field):
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d")
+    except ValueError:
+        raise HTTPError(400, f"invalid {field} {value!r}, expected YYYY-MM-DD")
+
+
+def _day_key(date):
+    return date.strftime("%Y-%m-%d") if isinstance(date, datetime) else str(date)
+
+
+def generate_params(body):
+    """(start, end, shift_length, min_staff, mode, positions, save) from a generate request body."""
+    if not isinstance(body, dict):
+        raise HTTPError(400, "request body must be a JSON object")
+    if "start" not in body:
+        raise HTTPError(400, "missing start")
+    start = _date(body["start"], "start")
+    if "weeks" in body:
+        try:
+            end = start + timedelta(days=7 * int(body["weeks"]) - 1)
+        except (TypeError, ValueError):
+            raise HTTPError(400, f"invalid weeks {body['weeks']!r}")
+    elif "end" in body:
+        end = _date(body["end"], "end")
+    else:
+        raise HTTPError(400, "give end or weeks")
+    if end < start:
+        raise HTTPError(400, "end is before start")
+    try:
+        shift_length = float(body.get("shift_length", 8))
+        min_staff = int(body.get("min_staff", 2))
+    except (TypeError, ValueError):
+        raise HTTPError(400, "shift_length must be a number and min_staff an integer")
+    try:
+        check_shift_length(shift_length)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    if min_staff < 0:
+        raise HTTPError(400, "min_staff must be at least 0")
+    mode = body.get("mode", "flow")
+    if mode not in scheduler_core.SCHEDULE_MODES:
+        raise HTTPError(400, f"unknown mode {mode!r}, choose from {', '.join(scheduler_core.SCHEDULE_MODES)}")
+    positions = body.get("positions")
+    if positions is not None and (not isinstance(positions, list)
+                                  or not all(isinstance(position, str) for position in positions)):
+        raise HTTPError(400, "positions must be a list of strings")
+    positions = scheduler_core.qualified_positions(positions)
+    return start, end, shift_length, min_staff, mode, positions, bool(body.get("save", False))
+
+
+class GenerateBatcher:
+    """
+    Collects generate requests for `window` seconds, then solves each group
+    of requests with equal parameters in one batch.solve_all call on `pool`.
+    """
+
+    def __init__(self, server, pool, jobs, window=0.05):
+        self.server = server
+        self.pool = pool
+        self.jobs = jobs
+        self.window = window
+        self._pending = []
+        self._timer = None
+        # The event loop only keeps weak references to tasks
+        self._running = set()
+
+    async def submit(self, name, start, end, shift_length, min_staff, mode, positions, save):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(((start, end, shift_length, min_staff, mode, positions), name, save, future))
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        self._timer = None
+        pending, self._pending = self._pending, []
+        groups = {}
+        for params, name, save, future in pending:
+            groups.setdefault(params, []).append((name, save, future))
+        for params, requests in groups.items():
+            task = asyncio.ensure_future(self._solve(params, requests))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _solve(self, params, requests):
+        start, end, shift_length, min_staff, mode, positions = params
+        names = list(dict.fromkeys(name for name, _, _ in requests))
+        loop = asyncio.get_running_loop()
+        try:
+            snapshots, booked, errors = await self.server.on_store(self.server.prepare, names, start, end, mode)
+            # Requests for unknown or empty workplaces fail on their own, not the rest of the batch
+            for name, _, future in requests:
+                if name in errors and not future.done():
+                    future.set_exception(errors[name])
+            requests = [request for request in requests if request[0] not in errors]
+            if not requests:
+                return
+            solved = await loop.run_in_executor(
+                None, partial(batch.solve_all, snapshots, start, end, shift_length, min_staff,
+                              max_workers=self.jobs, mode=mode, booked=booked, pool=self.pool,
+                              positions=positions))
+            schedules = {snapshot.name: (snapshot, schedule) for snapshot, schedule in solved}
+            save = [snapshot.name for snapshot in snapshots
+                    if any(n == snapshot.name and s for n, s, _ in requests)]
+            if save:
+                await self.server.on_store(self.server.store_schedules, save, schedules, *params)
+        except Exception as e:
+            for _, _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for name, _, future in requests:
+            if not future.done():
+                future.set_result(schedules[name][1])
+
+
+class SchedulerServer:
+    def __init__(self, path=scheduler_core.DEFAULT_STORE, jobs=None, window=0.05):
+        self.path = path
+        # Before the pool starts, so its workers use the same cache
+        schedule_cache.use_store(path)
+        # SQLite connections and the in-memory workplaces belong to this one thread
+        self.store_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduler-store")
+        self.workplaces = None
+        jobs = jobs or os.cpu_count() or 1
+        self.pool = batch.new_pool(jobs)
+        self.batcher = GenerateBatcher(self, self.pool, jobs, window)
+
+    def on_store(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.store_thread, func, *args)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        self.store_thread.shutdown()
+
+    # Store access, always on store_thread
+
+    def _open(self):
+        if self.workplaces is None:
+            self.workplaces = scheduler_core.WorkplaceList(self.path)
+        return self.workplaces
+
+    def _workplace(self, name):
+        workplaces = self._open()
+        if name not in workplaces:
+            raise HTTPError(404, f"unknown workplace {name!r}")
+        return workplaces.get(name)
+
+    def list_workplaces(self):
+        return {"workplaces": list(self._open().names)}
+
+    def describe(self, name):
+        workplace = self._workplace(name)
+        dates = [date for date in workplace.shifts if isinstance(date, datetime)]
+        return {
+            "name": workplace.name,
+            "hours_of_operation": {day: list(hours) for day, hours in workplace.hours_of_operation.items()},
+            "shift_templates": {day: [list(shift) for shift in shifts]
+                                for day, shifts in (workplace.shift_templates or {}).items()},
+            "workers": len(workplace.workers),
+            "scheduled_days": len(workplace.shifts),
+            "first_day": _day_key(min(dates)) if dates else None,
+            "last_day": _day_key(max(dates)) if dates else None,
+        }
+
+    def workers(self, name):
+        workplace = self._workplace(name)
+        return {"workplace": name,
+                "workers": [{"name": w.name, "position": w.position, "availability": w.availability,
+                             "id": w.id} for w in workplace.workers]}
+
+    def schedule_days(self, name, first=None, last=None):
+        """(date, shifts) pairs of the stored schedule, optionally only days first..last."""
+        schedule = self._workplace(name).shifts
+        return [(date, schedule[date]) for date in schedule
+                if not isinstance(date, datetime)
+                or ((first is None or date >= first) and (last is None or date <= last))]
+
+    def prepare(self, names, start, end, mode):
+        """
+        Snapshots of the named workplaces that can be scheduled, the bookings
+        at every other workplace and {name: HTTPError} for those that cannot.
+        """
+        from registry import registry_from
+
+        workplaces, errors = [], {}
+        for name in names:
+            try:
+                workplace = self._workplace(name)
+            except HTTPError as e:
+                errors[name] = e
+                continue
+            if not workplace.workers:
+                errors[name] = HTTPError(400, f"no worker data imported for {name!r}")
+                continue
+            workplaces.append(workplace)
+        history_before = start if mode == "rolling" else None
+        snapshots = [scheduler_core.snapshot(wp, history_before) for wp in workplaces]
+        others = [self._open().get(name) for name in self._open().names if name not in names]
+        booked = registry_from(others, start - timedelta(days=1), end) if others else None
+        return snapshots, booked, errors
+
+    def store_schedules(self, names, schedules, start, end, shift_length, min_staff, mode, positions):
+        workplaces = []
+        for name in names:
+            workplace = self._workplace(name)
+            solved_copy, schedule = schedules[name]
+            scheduler_core.apply_schedule(workplace, schedule, start, end, shift_length, min_staff,
+                                          inputs_from=solved_copy, keep_history=mode == "rolling", mode=mode,
+                                          positions=positions)
+            workplaces.append(workplace)
+        scheduler_core.save_workplaces(workplaces, self.path, names=list(self._open().names))
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.send_json(writer, 400, {"error": "malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY:
+                    await self.send_json(writer, 413 if length > 0 else 400, {"error": "bad request body"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                await self.dispatch(writer, method, target, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, writer, method, target, body, keep_alive):
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            with instrumentation.phase("request", method=method, path=url.path) as metrics:
+                if parts == ["workplaces"]:
+                    self._allow(method, "GET")
+                    await self.send_json(writer, 200, await self.on_store(self.list_workplaces), keep_alive)
+                elif len(parts) == 2 and parts[0] == "workplaces":
+                    self._allow(method, "GET")
+                    await self.send_json(writer, 200, await self.on_store(self.describe, parts[1]), keep_alive)
+                elif len(parts) == 3 and parts[0] == "workplaces" and parts[2] == "workers":
+                    self._allow(method, "GET")
+                    await self.send_json(writer, 200, await self.on_store(self.workers, parts[1]), keep_alive)
+                elif len(parts) == 3 and parts[0] == "workplaces" and parts[2] == "schedule":
+                    self._allow(method, "GET")
+                    first = _date(query["start"], "start") if "start" in query else None
+                    last = _date(query["end"], "end") if "end" in query else None
+                    days = await self.on_store(self.schedule_days, parts[1], first, last)
+                    metrics["days"] = len(days)
+                    await self.send_schedule(writer, parts[1], days, keep_alive)
+                elif len(parts) == 3 and parts[0] == "workplaces" and parts[2] == "generate":
+                    self._allow(method, "POST")
+                    try:
+                        params = generate_params(json.loads(body or b"{}"))
+                    except json.JSONDecodeError as e:
+                        raise HTTPError(400, f"invalid JSON: {e}")
+                    schedule = await self.batcher.submit(parts[1], *params)
+                    metrics["days"] = len(schedule)
+                    await self.send_schedule(writer, parts[1], list(schedule.items()), keep_alive)
+                else:
+                    raise HTTPError(404, f"no such endpoint {url.path!r}")
+        except HTTPError as e:
+            await self.send_json(writer, e.status, {"error": str(e)}, keep_alive)
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            await self.send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive)
+
+    @staticmethod
+    def _allow(method, allowed):
+        if method != allowed:
+            raise HTTPError(405, f"use {allowed}")
+
+    @staticmethod
+    def _head(status, keep_alive, extra):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", "Content-Type: application/json",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}", *extra, "", ""]
+        return "\r\n".join(lines).encode("latin-1")
+
+    async def send_json(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(self._head(status, keep_alive, [f"Content-Length: {len(data)}"]) + data)
+        await writer.drain()
+
+    async def send_schedule(self, writer, name, days, keep_alive):
+        """Send {"workplace": name, "schedule": {...}} in chunks of STREAM_DAYS days."""
+        writer.write(self._head(200, keep_alive, ["Transfer-Encoding: chunked"]))
+        pieces = [f'{{"workplace": {json.dumps(name)}, "schedule": {{']
+        for position in range(0, len(days), STREAM_DAYS):
+            chunk = ", ".join(f"{json.dumps(_day_key(date))}: {json.dumps(shifts)}"
+                              for date, shifts in days[position:position + STREAM_DAYS])
+            pieces.append((", " if position else "") + chunk)
+            self._write_chunk(writer, "".join(pieces))
+            pieces = []
+            await writer.drain()
+        pieces.append("}}")
+        self._write_chunk(writer, "".join(pieces))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer, text):
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        # Read the store list before the first request
+        await self.on_store(self._open)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scheduler_server",
+                                     description="Serve workplaces and schedule generation over HTTP/JSON.")
+    parser.add_argument("--store", default=scheduler_core.DEFAULT_STORE,
+                        help=f"SQLite workplace store, or a legacy .pkl file (default: {scheduler_core.DEFAULT_STORE})")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("--jobs", type=int, default=None, help="solver processes (default: all cores)")
+    parser.add_argument("--batch-window", type=float, default=50,
+                        help="milliseconds to collect generate requests into one batch (default: 50)")
+    args = parser.parse_args(argv)
+
+    instrumentation.enable_from_env()
+    server = SchedulerServer(args.store, args.jobs, args.batch_window / 1000)
+
+    def ready(listener):
+        addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in listener.sockets)
+        print(f"Serving {args.store} on {addresses}", file=sys.stderr)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Shift templates: opening hours parsed once into minute offsets.
+
+A ShiftPlan holds, for each weekday, the start and end minute of every shift
+(measured from midnight of that day; an end past 1440 runs into the next
+day). Days are either split evenly into shifts of about `shift_length` hours,
+with integer minute boundaries so nothing is lost on uneven splits, or use
+the explicit templates configured for the workplace.
+
+Opening hours where the close time is earlier than the open time run past
+midnight; equal open and close times mean the workplace is open 24 hours.
+"""
+import re
+
+import numpy as np
+
+from availability import DAY_NAMES, MINUTES_PER_DAY
+
+_CLOCK_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def parse_clock(text):
+    """Parse "H:MM" / "HH:MM" into minutes after midnight; "24:00" is allowed."""
+    match = _CLOCK_RE.match(str(text))
+    if not match:
+        raise ValueError(f"Invalid time format: {text!r} (expected H:MM)")
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if minutes > 59 or hours > 24 or (hours == 24 and minutes):
+        raise ValueError(f"Invalid time: {text!r}")
+    return hours * 60 + minutes
+
+
+def format_clock(minutes):
+    minutes %= MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def shift_name(start, end):
+    return f"{format_clock(start)} - {format_clock(end)}"
+
+
+def parse_shift_name(name):
+    """(start, end) minutes of a "HH:MM - HH:MM" shift name, or None if it isn't one."""
+    try:
+        start_text, end_text = str(name).split(" - ")
+        return span(start_text, end_text)
+    except ValueError:
+        return None
+
+
+def span(start_text, end_text):
+    """(start, end) minutes for a pair of clock strings, end > start (overnight / 24h aware)."""
+    start, end = parse_clock(start_text), parse_clock(end_text)
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+def parse_template_text(text):
+    """Parse "6:00-14:00, 14:00-22:00" into [("6:00", "14:00"), ("14:00", "22:00")]."""
+    template = []
+    for part in re.split(r"[,;]", text or ""):
+        if not part.strip():
+            continue
+        pieces = part.split("-")
+        if len(pieces) != 2:
+            raise ValueError(f"Invalid shift {part.strip()!r} (expected START-END)")
+        start, end = (piece.strip() for piece in pieces)
+        span(start, end)
+        template.append((start, end))
+    return template
+
+
+def check_shift_length(shift_length):
+    """Return `shift_length` (hours) as whole minutes; ValueError if it is under a minute."""
+    try:
+        shift_minutes = float(shift_length) * 60
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid shift length {shift_length!r}")
+    # Also catches NaN; infinity fails the int() below
+    if not shift_minutes >= 1:
+        raise ValueError(f"Shift length must be at least one minute, got {shift_length} hours")
+    try:
+        return int(round(shift_minutes))
+    except OverflowError:
+        raise ValueError(f"Invalid shift length {shift_length!r}")
+
+
+def split_evenly(start, end, shift_length):
+    """Split [start, end) minutes into about `shift_length`-hour shifts on whole minutes."""
+    total = end - start
+    shift_minutes = check_shift_length(shift_length)
+    count = max(1, total // shift_minutes)
+    bounds = start + (np.arange(count + 1) * total) // count
+    return bounds[:-1], bounds[1:]
+
+
+class ShiftPlan:
+    def __init__(self, starts, ends):
+        # starts[weekday] / ends[weekday] are int arrays of shift bounds
+        self.starts = starts
+        self.ends = ends
+        self.counts = np.array([len(day) for day in starts], dtype=np.int64)
+        self.names = [[shift_name(s, e) for s, e in zip(day_starts.tolist(), day_ends.tolist())]
+                      for day_starts, day_ends in zip(starts, ends)]
+
+    @classmethod
+    def for_workplace(cls, workplace, shift_length):
+        return cls.build(workplace.hours_of_operation, shift_length,
+                         getattr(workplace, "shift_templates", None))
+
+    @classmethod
+    def build(cls, hours_of_operation, shift_length, templates=None):
+        """Build the plan from opening hours (and optional per-day explicit templates)."""
+        templates = templates or {}
+        starts, ends = [], []
+        for day in DAY_NAMES:
+            if day not in hours_of_operation:
+                day_starts = day_ends = np.empty(0, dtype=np.int64)
+            elif templates.get(day):
+                pairs = [span(start, end) for start, end in templates[day]]
+                day_starts = np.array([s for s, _ in pairs], dtype=np.int64)
+                day_ends = np.array([e for _, e in pairs], dtype=np.int64)
+            else:
+                day_starts, day_ends = split_evenly(*span(*hours_of_operation[day]), shift_length)
+            starts.append(day_starts)
+            ends.append(day_ends)
+        return cls(starts, ends)
+
+    def day_shifts(self, weekday):
+        """[(name, start, end), ...] for one weekday."""
+        return list(zip(self.names[weekday], self.starts[weekday].tolist(), self.ends[weekday].tolist()))
+
+    def slots(self, start_date, end_date):
+        """
+        All shift slots from start_date to end_date (inclusive) as parallel arrays:
+        day offset from start_date, weekday, shift number within the day, start and end minute.
+        """
+        day_count = (end_date - start_date).days + 1
+        if day_count <= 0:
+            empty = np.empty(0, dtype=np.int64)
+            return {"day": empty, "weekday": empty, "shift": empty, "start": empty, "end": empty}
+
+        weekdays = (start_date.weekday() + np.arange(day_count)) % 7
+        per_day = self.counts[weekdays]
+        day = np.repeat(np.arange(day_count), per_day)
+        weekday = weekdays[day]
+        # Position of each slot within its day
+        first_of_day = np.repeat(np.cumsum(per_day) - per_day, per_day)
+        shift = np.arange(len(day)) - first_of_day
+
+        offsets = np.concatenate([[0], np.cumsum(self.counts)[:-1]])
+        all_starts = np.concatenate(self.starts) if self.counts.sum() else np.empty(0, dtype=np.int64)
+        all_ends = np.concatenate(self.ends) if self.counts.sum() else np.empty(0, dtype=np.int64)
+        flat = offsets[weekday] + shift
+        return {"day": day, "weekday": weekday, "shift": shift,
+                "start": all_starts[flat], "end": all_ends[flat]}
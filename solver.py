@@ -0,0 +1,223 @@
+"""
+Availability-aware shift assignment engine.
+
+Every day of the requested range is solved as a small min-cost flow:
+
+    source -> shift (capacity min_staff)
+           -> qualified, available worker (capacity 1, cost = minutes worked so far)
+           -> sink (capacity 1, so nobody works two shifts on the same day)
+
+Overnight shifts reach into the next day; whoever works one is left out of
+the next day's shifts that start before it ends.
+
+Only the `demand` cheapest candidates of a shift can appear in an optimal
+solution (any more expensive pick can be swapped for one of them that is
+left unused), so each shift's candidate list is pruned to that many workers
+before the graph is built. Per-day graphs stay tiny even for rosters with
+thousands of workers.
+"""
+from collections import deque
+from datetime import timedelta
+
+import numpy as np
+
+import schedule_cache
+from availability import MINUTES_PER_DAY
+from availability_index import AvailabilityIndex
+from shift_templates import ShiftPlan
+
+INF = float("inf")
+
+
+class MinCostFlow:
+    """Successive shortest path min-cost flow, meant for small per-day graphs."""
+
+    def __init__(self, node_count):
+        # Edges are stored as [to, capacity, cost, index of reverse edge]
+        self.graph = [[] for _ in range(node_count)]
+
+    def add_edge(self, u, v, capacity, cost):
+        edge = [v, capacity, cost, len(self.graph[v])]
+        self.graph[u].append(edge)
+        self.graph[v].append([u, 0, -cost, len(self.graph[u]) - 1])
+        return edge
+
+    def flow(self, source, sink, max_flow):
+        """Push up to `max_flow` units at minimum cost; return (flow, cost)."""
+        graph = self.graph
+        node_count = len(graph)
+        total_flow = total_cost = 0
+
+        while total_flow < max_flow:
+            # Bellman-Ford queue (SPFA): residual edges may have negative cost
+            dist = [INF] * node_count
+            prev = [None] * node_count
+            in_queue = [False] * node_count
+            dist[source] = 0
+            queue = deque([source])
+            while queue:
+                u = queue.popleft()
+                in_queue[u] = False
+                for i, (v, capacity, cost, _) in enumerate(graph[u]):
+                    if capacity > 0 and dist[u] + cost < dist[v]:
+                        dist[v] = dist[u] + cost
+                        prev[v] = (u, i)
+                        if not in_queue[v]:
+                            in_queue[v] = True
+                            queue.append(v)
+
+            if dist[sink] == INF:
+                break
+
+            push = max_flow - total_flow
+            v = sink
+            while v != source:
+                u, i = prev[v]
+                push = min(push, graph[u][i][1])
+                v = u
+            v = sink
+            while v != source:
+                u, i = prev[v]
+                edge = graph[u][i]
+                edge[1] -= push
+                graph[v][edge[3]][1] += push
+                v = u
+
+            total_flow += push
+            total_cost += push * dist[sink]
+
+        return total_flow, total_cost
+
+
+def _cheapest(candidates, worked, count):
+    """The `count` candidates with the fewest minutes worked, ties broken by index."""
+    candidates = np.asarray(candidates, dtype=np.int64)
+    if len(candidates) > count:
+        keys = worked[candidates] * (len(worked) + 1) + candidates
+        candidates = candidates[np.argpartition(keys, count - 1)[:count]]
+    return candidates.tolist()
+
+
+def ensure_index(workplace):
+    """Return the workplace's availability index, rebuilding it if the roster changed."""
+    index = getattr(workplace, "availability_index", None)
+    if index is None or not index.matches(workplace.workers):
+        index = AvailabilityIndex.from_workers(workplace.workers)
+        workplace.availability_index = index
+    return index
+
+
+def assign_day(shifts, candidates, worked, min_staff):
+    """
+    Fill each shift with up to `min_staff` workers for a single day.
+
+    `candidates[k]` is an array of the worker indices qualified and
+    available for shift k, `worked[i]` is the number of minutes worker i has
+    been given so far. `min_staff` may also be a list with one headcount per
+    shift. Returns one sorted list of worker indices per shift.
+    """
+    if isinstance(min_staff, int):
+        min_staff = [min_staff] * len(shifts)
+    demand = sum(min_staff)
+    if demand <= 0:
+        return [[] for _ in shifts]
+
+    pruned = [_cheapest(shift_candidates, worked, demand) for shift_candidates in candidates]
+    worker_nodes = {}
+    for shift_candidates in pruned:
+        for i in shift_candidates:
+            worker_nodes.setdefault(i, 2 + len(shifts) + len(worker_nodes))
+
+    # Node 0 is the source, node 1 the sink, then shifts, then workers
+    network = MinCostFlow(2 + len(shifts) + len(worker_nodes))
+    source, sink = 0, 1
+    assignment_edges = []
+    for k, shift_candidates in enumerate(pruned):
+        network.add_edge(source, 2 + k, min_staff[k], 0)
+        assignment_edges.append([(i, network.add_edge(2 + k, worker_nodes[i], 1, int(worked[i])))
+                                 for i in shift_candidates])
+    for node in worker_nodes.values():
+        network.add_edge(node, sink, 1, 0)
+
+    network.flow(source, sink, demand)
+
+    # A saturated shift -> worker edge means that worker got the shift
+    return [sorted(i for i, edge in edges if edge[1] == 0) for edges in assignment_edges]
+
+
+def generate_schedule(workplace, start_date, end_date, shift_length, min_staff, positions=None,
+                      progress=None, exclude=None, steps=None):
+    """
+    Generate a schedule for `workplace` between start_date and end_date (inclusive).
+
+    Workers are only placed on shifts their Availability fully covers and,
+    when `positions` is given, whose Position is one of them. Load is spread
+    by preferring whoever has worked the fewest minutes so far. Shifts that
+    cannot be fully staffed keep the workers that could be found.
+
+    `progress(days_done, total_days)` is called after every day; it may raise
+    to abort the run. `exclude(date, start, end, candidates)` may drop
+    candidates that are booked elsewhere, see registry.py. `steps` is a
+    schedule_cache.Steps that days are looked up in and stored to.
+    """
+    roster = workplace.workers
+    index = ensure_index(workplace)
+    names = [w.name for w in roster]
+    qualified = index.pack([name.strip() != "" and (positions is None or w.position in positions)
+                            for name, w in zip(names, roster)])
+    worked = np.zeros(len(roster), dtype=np.int64)
+    # Minutes into the current day that each worker's shift of the day before runs
+    spill = np.zeros(len(roster), dtype=np.int64)
+
+    plan = ShiftPlan.for_workplace(workplace, shift_length)
+    slots = plan.slots(start_date, end_date)
+    # slots are ordered by day, so each day's shifts are one contiguous run
+    total_days = (end_date - start_date).days + 1
+    day_bounds = np.searchsorted(slots["day"], np.arange(total_days + 1))
+
+    schedule = {}
+    for offset in range(total_days):
+        if progress is not None:
+            progress(offset, total_days)
+        first, last = day_bounds[offset], day_bounds[offset + 1]
+        # Skip days when workplace is closed
+        if first == last:
+            spill[:] = 0
+            continue
+
+        current_date = start_date + timedelta(days=offset)
+        weekday = current_date.weekday()
+        names_of_day = plan.names[weekday]
+        shifts = [(names_of_day[k], start, end) for k, start, end in zip(
+            slots["shift"][first:last].tolist(), slots["start"][first:last].tolist(),
+            slots["end"][first:last].tolist())]
+
+        assigned = None
+        if steps is not None:
+            # A day's result only depends on the inputs, the minutes worked before it and yesterday's spill-over
+            state = schedule_cache.state_digest(worked, spill)
+            assigned = steps.get(("day", current_date.toordinal()), state)
+        if assigned is None:
+            candidates = [index.unpack(index.mask(weekday, start, end) & qualified)
+                          for _, start, end in shifts]
+            if exclude is not None:
+                candidates = [exclude(current_date, start, end, shift_candidates)
+                              for (_, start, end), shift_candidates in zip(shifts, candidates)]
+            if spill.any():
+                candidates = [shift_candidates[spill[shift_candidates] <= start]
+                              for (_, start, _), shift_candidates in zip(shifts, candidates)]
+            assigned = assign_day(shifts, candidates, worked, min_staff)
+            if steps is not None:
+                steps.put(("day", current_date.toordinal()), state, assigned)
+
+        day_shifts = {}
+        spill[:] = 0
+        for (shift_name, start, end), workers in zip(shifts, assigned):
+            for i in workers:
+                worked[i] += end - start
+                spill[i] = max(0, end - MINUTES_PER_DAY)
+            day_shifts[shift_name] = [names[i] for i in workers]
+
+        schedule[current_date] = day_shifts
+
+    return schedule
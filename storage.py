@@ -0,0 +1,307 @@
+"""
+Incremental SQLite storage for workplaces.
+
+Each workplace is split into sections (settings, hours, workers and one
+entry per scheduled day). The store remembers a digest of every section it
+last read or wrote, so saving a workplace only touches the sections that
+actually changed. Workplaces are loaded one at a time by name.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+from datetime import datetime
+
+from scheduler_core import Workplace
+from worker import as_workers
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workplaces (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    sort_order INTEGER NOT NULL DEFAULT 0,
+    excel_file TEXT,
+    availability_index BLOB,
+    schedule_inputs BLOB,
+    shift_templates BLOB
+);
+CREATE TABLE IF NOT EXISTS hours (
+    workplace_id INTEGER NOT NULL REFERENCES workplaces(id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    PRIMARY KEY (workplace_id, day)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    workplace_id INTEGER NOT NULL REFERENCES workplaces(id) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    name TEXT,
+    position TEXT,
+    availability TEXT,
+    record BLOB NOT NULL,
+    PRIMARY KEY (workplace_id, row)
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    workplace_id INTEGER NOT NULL REFERENCES workplaces(id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    shift TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    worker TEXT,
+    PRIMARY KEY (workplace_id, day, slot, seq)
+);
+"""
+
+DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _digest(value):
+    return hashlib.sha1(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).digest()
+
+
+def _day_key(day):
+    return day.isoformat() if hasattr(day, "isoformat") else str(day)
+
+
+def _parse_day_key(key):
+    try:
+        return datetime.fromisoformat(key)
+    except ValueError:
+        return key
+
+
+def _text(value):
+    # Missing spreadsheet cells arrive as NaN
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
+
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self._upgrade_schema()
+        # name -> {section: digest} as last read from or written to the database
+        self._digests = {}
+
+    def _upgrade_schema(self):
+        # Databases from older versions lack the columns added since
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(workplaces)")}
+        for column in ("schedule_inputs", "shift_templates"):
+            if column not in columns:
+                with self.conn:
+                    self.conn.execute(f"ALTER TABLE workplaces ADD COLUMN {column} BLOB")
+
+    def close(self):
+        self.conn.close()
+
+    def workplace_names(self):
+        """Names of all stored workplaces, without loading any of their data."""
+        rows = self.conn.execute("SELECT name FROM workplaces ORDER BY sort_order, id")
+        return [name for (name,) in rows]
+
+    def load(self, name):
+        """Load a single workplace by name, or None if it is not stored."""
+        row = self.conn.execute(
+            "SELECT id, sort_order, excel_file, availability_index, schedule_inputs, shift_templates "
+            "FROM workplaces WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        workplace_id, sort_order, excel_file, index_blob, inputs_blob, templates_blob = row
+
+        hours = {day: (start, end) for day, start, end in self.conn.execute(
+            "SELECT day, start, end FROM hours WHERE workplace_id = ?", (workplace_id,))}
+        hours = {day: hours[day] for day in sorted(hours, key=self._day_position)}
+
+        # Rows saved before Worker records existed hold pickled dicts; Workplace() converts them
+        workers = [pickle.loads(record) for (record,) in self.conn.execute(
+            "SELECT record FROM workers WHERE workplace_id = ? ORDER BY row", (workplace_id,))]
+
+        shifts = self._read_shifts(workplace_id)
+
+        # Workplace() fills in default hours when given an empty dict
+        workplace = Workplace(name, workers=workers, shifts=shifts)
+        workplace.hours_of_operation = hours
+        workplace.excel_file = excel_file
+        workplace.availability_index = pickle.loads(index_blob) if index_blob else None
+        workplace.schedule_inputs = pickle.loads(inputs_blob) if inputs_blob else None
+        workplace.shift_templates = pickle.loads(templates_blob) if templates_blob else None
+        self._digests[name] = self._section_digests(workplace)
+        self._digests[name]["order"] = sort_order
+        return workplace
+
+    def _read_shifts(self, workplace_id, first=None, last=None):
+        """{day: {shift: [names]}} of a workplace, optionally only days first..last."""
+        query = "SELECT day, shift, worker FROM assignments WHERE workplace_id = ?"
+        params = [workplace_id]
+        # Dated keys are ISO strings, so they sort and compare like the dates themselves
+        if first is not None:
+            query += " AND day >= ?"
+            params.append(_day_key(first))
+        if last is not None:
+            query += " AND day <= ?"
+            params.append(_day_key(last))
+        shifts = {}
+        for day, shift, worker in self.conn.execute(query + " ORDER BY day, slot, seq", params):
+            day_shifts = shifts.setdefault(_parse_day_key(day), {})
+            assigned = day_shifts.setdefault(shift, [])
+            if worker is not None:
+                assigned.append(worker)
+        return shifts
+
+    def bookings(self, name, first=None, last=None):
+        """
+        (workers, {day: {shift: [names]}}) of a stored workplace with only
+        days first..last, without the rest of its data; None if not stored.
+        """
+        row = self.conn.execute("SELECT id FROM workplaces WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        workers = as_workers([pickle.loads(record) for (record,) in self.conn.execute(
+            "SELECT record FROM workers WHERE workplace_id = ? ORDER BY row", row)])
+        return workers, self._read_shifts(row[0], first, last)
+
+    def load_all(self):
+        return [self.load(name) for name in self.workplace_names()]
+
+    @staticmethod
+    def _day_position(day):
+        return DAY_ORDER.index(day) if day in DAY_ORDER else len(DAY_ORDER)
+
+    def _section_digests(self, workplace):
+        index = getattr(workplace, "availability_index", None)
+        return {
+            "settings": _digest((workplace.excel_file, getattr(workplace, "schedule_inputs", None),
+                                 getattr(workplace, "shift_templates", None))),
+            "hours": _digest(workplace.hours_of_operation),
+            "workers": _digest((workplace.workers, getattr(index, "signature", None))),
+            "shifts": {_day_key(day): _digest(day_shifts) for day, day_shifts in workplace.shifts.items()},
+        }
+
+    def save(self, workplace, sort_order=None):
+        """Write the sections of `workplace` that changed since it was last loaded or saved."""
+        new = self._section_digests(workplace)
+        old = self._digests.get(workplace.name)
+        with self.conn:
+            row = self.conn.execute("SELECT id FROM workplaces WHERE name = ?", (workplace.name,)).fetchone()
+            if row is None:
+                cursor = self.conn.execute("INSERT INTO workplaces (name, sort_order) VALUES (?, ?)",
+                                           (workplace.name, sort_order or 0))
+                workplace_id = cursor.lastrowid
+                old = None
+            else:
+                workplace_id = row[0]
+                if sort_order is not None and (old is None or old.get("order") != sort_order):
+                    self.conn.execute("UPDATE workplaces SET sort_order = ? WHERE id = ?",
+                                      (sort_order, workplace_id))
+            if old is None:
+                # Nothing known about what is stored: rewrite every section, and drop stored
+                # days the new schedule lacks (their digest is unknown, so all days count as changed)
+                stored_days = {} if row is None else {day: None for (day,) in self.conn.execute(
+                    "SELECT DISTINCT day FROM assignments WHERE workplace_id = ?", (workplace_id,))}
+                old = {"settings": None, "hours": None, "workers": None, "shifts": stored_days}
+            new["order"] = sort_order if sort_order is not None else old.get("order")
+
+            if new["settings"] != old["settings"]:
+                inputs = getattr(workplace, "schedule_inputs", None)
+                templates = getattr(workplace, "shift_templates", None)
+                self.conn.execute(
+                    "UPDATE workplaces SET excel_file = ?, schedule_inputs = ?, shift_templates = ? WHERE id = ?",
+                    (workplace.excel_file,
+                     pickle.dumps(inputs, protocol=pickle.HIGHEST_PROTOCOL) if inputs else None,
+                     pickle.dumps(templates, protocol=pickle.HIGHEST_PROTOCOL) if templates else None,
+                     workplace_id))
+            if new["hours"] != old["hours"]:
+                self._write_hours(workplace_id, workplace.hours_of_operation)
+            if new["workers"] != old["workers"]:
+                self._write_workers(workplace_id, workplace)
+            self._write_shifts(workplace_id, workplace.shifts, old["shifts"], new["shifts"])
+        self._digests[workplace.name] = new
+
+    def save_all(self, workplaces, names=None):
+        """
+        Save every workplace in list order and drop stored workplaces not in
+        the list. With `names`, that is the full order and only `workplaces`
+        (the loaded ones) are written; the others are just moved into place.
+        """
+        if names is None:
+            names = [wp.name for wp in workplaces]
+        loaded = {wp.name: wp for wp in workplaces}
+        with self.conn:
+            for position, name in enumerate(names):
+                if name not in loaded:
+                    self.conn.execute("UPDATE workplaces SET sort_order = ? WHERE name = ?", (position, name))
+                    if name in self._digests:
+                        self._digests[name]["order"] = position
+        for position, name in enumerate(names):
+            if name in loaded:
+                self.save(loaded[name], sort_order=position)
+        keep = set(names)
+        for name in self.workplace_names():
+            if name not in keep:
+                self.delete(name)
+
+    def delete(self, name):
+        with self.conn:
+            self.conn.execute("DELETE FROM workplaces WHERE name = ?", (name,))
+        self._digests.pop(name, None)
+
+    def _write_hours(self, workplace_id, hours):
+        self.conn.execute("DELETE FROM hours WHERE workplace_id = ?", (workplace_id,))
+        self.conn.executemany("INSERT INTO hours (workplace_id, day, start, end) VALUES (?, ?, ?, ?)",
+                              [(workplace_id, day, start, end) for day, (start, end) in hours.items()])
+
+    def _write_workers(self, workplace_id, workplace):
+        self.conn.execute("DELETE FROM workers WHERE workplace_id = ?", (workplace_id,))
+        self.conn.executemany(
+            "INSERT INTO workers (workplace_id, row, name, position, availability, record) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(workplace_id, row, _text(w.name), _text(w.position), _text(w.availability),
+              pickle.dumps(w, protocol=pickle.HIGHEST_PROTOCOL))
+             for row, w in enumerate(workplace.workers)])
+        index = getattr(workplace, "availability_index", None)
+        self.conn.execute("UPDATE workplaces SET availability_index = ? WHERE id = ?",
+                          (pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL) if index is not None else None,
+                           workplace_id))
+
+    def _write_shifts(self, workplace_id, shifts, old_days, new_days):
+        removed = [day for day in old_days if day not in new_days]
+        changed = {day for day, digest in new_days.items() if old_days.get(day) != digest}
+        if removed or changed:
+            self.conn.executemany("DELETE FROM assignments WHERE workplace_id = ? AND day = ?",
+                                  [(workplace_id, day) for day in removed + sorted(changed)])
+        rows = []
+        for day, day_shifts in shifts.items():
+            key = _day_key(day)
+            if key not in changed:
+                continue
+            for slot, (shift, workers) in enumerate(day_shifts.items()):
+                if not workers:
+                    rows.append((workplace_id, key, slot, shift, 0, None))
+                for seq, worker in enumerate(workers):
+                    rows.append((workplace_id, key, slot, shift, seq, worker))
+        self.conn.executemany(
+            "INSERT INTO assignments (workplace_id, day, slot, shift, seq, worker) VALUES (?, ?, ?, ?, ?, ?)",
+            rows)
+
+
+def migrate_pickle(pickle_path, store):
+    """One-time import of a legacy workplaces pickle into an SQLite store."""
+    from scheduler_core import load_pickle
+
+    workplaces = load_pickle(pickle_path)
+    store.save_all(workplaces)
+    return workplaces
+
+
+def open_store(path, legacy_pickle=None):
+    """Open the SQLite store at `path`, migrating `legacy_pickle` into it if the database is new."""
+    is_new = not os.path.exists(path)
+    store = SQLiteStore(path)
+    if is_new and legacy_pickle and os.path.exists(legacy_pickle):
+        migrate_pickle(legacy_pickle, store)
+    return store
@@ -0,0 +1,107 @@
+"""
+Background task runner for the Tk app.
+
+Long imports and schedule runs execute on a thread pool. Workers never touch
+widgets: progress, results and errors are put on a queue that the Tk
+mainloop drains with `root.after` polling, so every callback runs on the UI
+thread.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when it notices it has been cancelled."""
+
+
+class Task:
+    def __init__(self, events, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        self._events = events
+        self._cancel_event = threading.Event()
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.finished = False
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report(self, done, total=None, message=None):
+        """
+        Progress callback handed to long-running work. Doubles as the
+        cancellation checkpoint: raises TaskCancelled once cancel() was called.
+        """
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+        self._events.put((self, "progress", (done, total, message)))
+
+
+class TaskRunner:
+    def __init__(self, root, max_workers=2, poll_interval=100):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler-task")
+        self.events = queue.Queue()
+        self.tasks = set()
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, func, *args, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        """
+        Run `func(*args, progress=task.report)` in the background and return its Task.
+        Callbacks receive the result, the exception, or (done, total, message).
+        """
+        task = Task(self.events, on_done, on_error, on_progress, on_cancel)
+        self.tasks.add(task)
+        self.executor.submit(self._run, task, func, args)
+        return task
+
+    def _run(self, task, func, args):
+        try:
+            result = func(*args, progress=task.report)
+        except TaskCancelled:
+            self.events.put((task, "cancelled", None))
+        except Exception as e:
+            self.events.put((task, "error", e))
+        else:
+            if task.cancelled:
+                self.events.put((task, "cancelled", None))
+            else:
+                self.events.put((task, "done", result))
+
+    def _poll(self):
+        try:
+            while True:
+                task, kind, payload = self.events.get_nowait()
+                self._dispatch(task, kind, payload)
+        except queue.Empty:
+            pass
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _dispatch(self, task, kind, payload):
+        if kind == "progress":
+            if task.on_progress and not task.cancelled:
+                task.on_progress(*payload)
+            return
+
+        task.finished = True
+        self.tasks.discard(task)
+        if kind == "cancelled":
+            if task.on_cancel:
+                task.on_cancel()
+        else:
+            callback = task.on_done if kind == "done" else task.on_error
+            if callback:
+                callback(payload)
+
+    def shutdown(self):
+        """Cancel running tasks and stop polling; used when the window closes."""
+        for task in list(self.tasks):
+            task.cancel()
+        self.root.after_cancel(self._poll_id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+from availability import ALWAYS, MINUTES_PER_DAY, NEVER, is_available, parse_availability
+
+
+def hours(start, end):
+    return (int(start * 60), int(end * 60))
+
+
+def week(**days):
+    """Expected parse: week(mon=[hours(9, 17)], ...) with unnamed days empty."""
+    keys = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+    return tuple(tuple(days.get(key, ())) for key in keys)
+
+
+WEEKDAYS_9_5 = {day: [hours(9, 17)] for day in ("mon", "tue", "wed", "thu", "fri")}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Mon-Fri 9-5", week(**WEEKDAYS_9_5)),
+    ("Monday - Friday 9am-5pm", week(**WEEKDAYS_9_5)),
+    ("M-F 9-5", week(**WEEKDAYS_9_5)),
+    ("weekdays 09:00-17:00", week(**WEEKDAYS_9_5)),
+    ("Mon-Fri 9 a.m. - 5 p.m.", week(**WEEKDAYS_9_5)),
+    ("Mon-Fri 9a-5p", week(**WEEKDAYS_9_5)),
+    ("Mon-Fri 9-5; Sat 10:00-14:00", week(**WEEKDAYS_9_5, sat=[hours(10, 14)])),
+    ("Mon-Fri 9-5\nSat 10-2", week(**WEEKDAYS_9_5, sat=[hours(10, 14)])),
+    ("Mon-Fri 9-5 and Sat 10-2", week(**WEEKDAYS_9_5, sat=[hours(10, 14)])),
+    ("Mon-Fri 9-5 at Sat 10-2", week(**WEEKDAYS_9_5, sat=[hours(10, 14)])),
+    ("MWF 1-5", week(mon=[hours(13, 17)], wed=[hours(13, 17)], fri=[hours(13, 17)])),
+    ("Tu/Th 10:30-2", week(tue=[hours(10.5, 14)], thu=[hours(10.5, 14)])),
+    ("Sat, Sun", week(sat=[hours(0, 24)], sun=[hours(0, 24)])),
+    ("weekends mornings", week(sat=[hours(6, 12)], sun=[hours(6, 12)])),
+    ("Fri 22:00-06:00", week(fri=[hours(22, 24)], sat=[hours(0, 6)])),
+    ("Mon after 5pm", week(mon=[hours(17, 24)])),
+    ("Tue before 2", week(tue=[hours(0, 14)])),
+    ("Mon noon-midnight", week(mon=[hours(12, 24)])),
+])
+def test_formats(text, expected):
+    assert parse_availability(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", None, math.nan, "Any", "open", "flexible", "zzz"])
+def test_blank_and_unrecognised_are_always_available(text):
+    assert parse_availability(text) == ALWAYS
+
+
+@pytest.mark.parametrize("text", ["none", "Unavailable", "not available", "N/A"])
+def test_explicitly_unavailable(text):
+    assert parse_availability(text) == NEVER
+
+
+def test_except_removes_days():
+    parsed = parse_availability("Any except Sundays")
+    assert parsed[:6] == ALWAYS[:6]
+    assert parsed[6] == ()
+
+
+def test_is_available_across_midnight():
+    parsed = parse_availability("Fri 22:00-06:00")
+    assert is_available(parsed, 4, 22 * 60, MINUTES_PER_DAY + 6 * 60)
+    assert not is_available(parsed, 4, 21 * 60, MINUTES_PER_DAY + 2 * 60)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Mon-Fri 9-5, Sat not available", week(**WEEKDAYS_9_5)),
+    ("Mon-Fri 9-5, Sat, Sun off", week(**WEEKDAYS_9_5)),
+    ("Mon-Fri 9-5; Sat unavailable; Sun 10-2", week(**WEEKDAYS_9_5, sun=[hours(10, 14)])),
+    ("Mon 9-5, Tue off, Wed 9-5", week(mon=[hours(9, 17)], wed=[hours(9, 17)])),
+])
+def test_days_not_available_are_removed(text, expected):
+    assert parse_availability(text) == expected
+
+
+def test_only_days_off_leaves_the_rest_of_the_week():
+    assert parse_availability("weekends off") == ALWAYS[:5] + ((), ())
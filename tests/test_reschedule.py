@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import scheduler_core
+from scheduler_core import Workplace
+from worker import as_workers
+
+START, END = datetime(2025, 1, 6), datetime(2025, 1, 19)
+HOURS = {day: ("9:00", "17:00") for day in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")}
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setenv("SCHEDULER_CACHE", "off")
+
+
+def worker(name, max_hours="", availability=""):
+    return {"Name": name, "Position": "Any", "Availability": availability, "Max Hours": max_hours}
+
+
+def generated(mode, workers, hours=HOURS):
+    workplace = Workplace("Shop", hours_of_operation=dict(hours), workers=workers)
+    schedule = scheduler_core.generate_ai_schedule(workplace, START, END, 8, 2, mode=mode)
+    scheduler_core.apply_schedule(workplace, schedule, START, END, 8, 2, mode=mode)
+    return workplace
+
+
+def shifts_of(schedule, name):
+    return {(date, shift) for date, day_shifts in schedule.items() for shift, names in day_shifts.items()
+            if name in names}
+
+
+@pytest.mark.parametrize("mode", scheduler_core.SCHEDULE_MODES)
+def test_unchanged_inputs_leave_the_schedule_alone(mode):
+    workplace = generated(mode, [worker(name) for name in "ABCD"])
+    before = workplace.shifts
+    assert scheduler_core.reschedule(workplace) == {"days_changed": 0, "shifts_changed": 0}
+    assert workplace.shifts is before
+
+
+@pytest.mark.parametrize("mode", scheduler_core.SCHEDULE_MODES)
+def test_only_the_removed_workers_shifts_change(mode):
+    workplace = generated(mode, [worker(name) for name in "ABCDE"])
+    before = dict(workplace.shifts)
+    dropped = shifts_of(before, "A")
+    workplace.workers = [w for w in workplace.workers if w.name != "A"]
+    stats = scheduler_core.reschedule(workplace)
+    assert stats["shifts_changed"] == len(dropped)
+    for date, day_shifts in workplace.shifts.items():
+        for shift, names in day_shifts.items():
+            if (date, shift) not in dropped:
+                assert names == before[date][shift]
+            else:
+                assert "A" not in names and len(names) == 2
+
+
+def test_vacancies_respect_max_hours():
+    workplace = generated("balanced", [worker("A"), worker("B"), worker("C", max_hours="16")])
+    workplace.workers = [w for w in workplace.workers if w.name != "A"]
+    scheduler_core.reschedule(workplace)
+    for week in range(2):
+        days = [START + timedelta(days=7 * week + offset) for offset in range(7)]
+        assert sum(1 for date in days for names in (workplace.shifts.get(date) or {}).values()
+                   if "C" in names) <= 2
+
+
+def test_vacancies_respect_rest_in_rolling_mode():
+    hours = {"Monday": ("14:00", "22:00"), "Tuesday": ("6:00", "14:00")}
+    workplace = generated("rolling", [worker("A"), worker("B")], hours)
+    # B's new availability still covers both shifts, but B works Monday until 22:00
+    workplace.workers = as_workers([worker("A"), worker("B", availability="Mon-Fri 6am-10pm")])
+    scheduler_core.reschedule(workplace)
+    for monday in (START, START + timedelta(days=7)):
+        late, = workplace.shifts[monday].values()
+        early, = workplace.shifts[monday + timedelta(days=1)].values()
+        assert late and not set(late) & set(early)
+
+
+def test_vacancies_skip_workers_booked_elsewhere():
+    workplace = generated("flow", [worker("A"), worker("B"), worker("C")])
+    before = shifts_of(workplace.shifts, "C")
+    workplace.workers = [w for w in workplace.workers if w.name != "A"]
+    busy = np.array([[w.name for w in workplace.workers].index("C")], dtype=np.int64)
+    scheduler_core.reschedule(workplace, exclude=lambda date, start, end, candidates: np.setdiff1d(candidates, busy))
+    assert shifts_of(workplace.shifts, "C") == before
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+import pytest
+
+import scheduler_core
+from scheduler_core import Workplace
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setenv("SCHEDULER_CACHE", "off")
+
+
+def overnight_workplace(*names):
+    workplace = Workplace("Overnight", hours_of_operation={"Monday": ("18:00", "02:00"), "Tuesday": ("0:00", "8:00")},
+                          workers=[{"Name": name, "Position": "Any", "Availability": ""} for name in names])
+    workplace.shift_templates = {"Monday": [("18:00", "02:00")], "Tuesday": [("0:00", "8:00")]}
+    return workplace
+
+
+@pytest.mark.parametrize("mode", scheduler_core.SCHEDULE_MODES)
+def test_overnight_shift_blocks_the_next_days_overlapping_shift(mode):
+    schedule = scheduler_core.generate_ai_schedule(overnight_workplace("Ann"), datetime(2025, 1, 6),
+                                                   datetime(2025, 1, 7), 8, 1, mode=mode)
+    assert schedule[datetime(2025, 1, 6)] == {"18:00 - 02:00": ["Ann"]}
+    assert schedule[datetime(2025, 1, 7)] == {"00:00 - 08:00": []}
+
+
+@pytest.mark.parametrize("mode", scheduler_core.SCHEDULE_MODES)
+def test_overlapping_shifts_go_to_different_workers(mode):
+    schedule = scheduler_core.generate_ai_schedule(overnight_workplace("Ann", "Bob"), datetime(2025, 1, 6),
+                                                   datetime(2025, 1, 14), 8, 1, mode=mode)
+    for monday in (datetime(2025, 1, 6), datetime(2025, 1, 13)):
+        tuesday = monday.replace(day=monday.day + 1)
+        late, = schedule[monday].values()
+        early, = schedule[tuesday].values()
+        assert len(late) == len(early) == 1 and late != early
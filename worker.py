@@ -0,0 +1,102 @@
+"""
+Compact worker records.
+
+A roster used to be a list of dicts, one per spreadsheet row, carrying every
+column of the export. Worker keeps only the roster columns, in slots, with
+positions and availability strings interned since a few values repeat across
+thousands of rows. It still answers `worker.get("Name")` and friends, so code
+written against the dicts keeps working; hot paths use the attributes.
+"""
+import sys
+
+# Roster column -> attribute, in constructor order
+FIELDS = {"Name": "name", "Position": "position", "Availability": "availability",
+          "ID": "id", "Email": "email", "Max Hours": "max_hours", "Min Hours": "min_hours"}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _present(value):
+    # Old pickled rosters carry pandas NaN for empty cells
+    return value is not None and not (isinstance(value, float) and value != value)
+
+
+class Worker:
+    __slots__ = tuple(FIELDS.values())
+
+    def __init__(self, name, position=None, availability=None, id=None, email=None,
+                 max_hours=None, min_hours=None):
+        self.name = name
+        self.position = _intern(position)
+        self.availability = _intern(availability)
+        self.id = id
+        self.email = email
+        self.max_hours = max_hours
+        self.min_hours = min_hours
+
+    @classmethod
+    def from_record(cls, record):
+        """Build a Worker from a dict of column -> value; empty cells and other columns are dropped."""
+        if isinstance(record, cls):
+            return record
+        values = {attribute: record.get(column) for column, attribute in FIELDS.items()
+                  if _present(record.get(column))}
+        values["name"] = str(values.get("name", ""))
+        if "position" in values:
+            values["position"] = str(values["position"])
+        return cls(**values)
+
+    def _values(self):
+        return tuple(getattr(self, attribute) for attribute in Worker.__slots__)
+
+    def __reduce__(self):
+        # A plain tuple, minus the unset trailing columns, pickles far smaller than slot state
+        values = self._values()
+        while len(values) > 1 and values[-1] is None:
+            values = values[:-1]
+        return Worker, values
+
+    def __eq__(self, other):
+        if not isinstance(other, Worker):
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Worker({self.name!r}, {self.position!r}, {self.availability!r})"
+
+    # Read-only mapping interface, matching the old row dicts
+
+    def get(self, column, default=None):
+        attribute = FIELDS.get(column)
+        value = getattr(self, attribute) if attribute is not None else None
+        return default if value is None else value
+
+    def __getitem__(self, column):
+        value = self.get(column)
+        if value is None:
+            raise KeyError(column)
+        return value
+
+    def __contains__(self, column):
+        return self.get(column) is not None
+
+    def keys(self):
+        return [column for column, attribute in FIELDS.items() if getattr(self, attribute) is not None]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(column, self.get(column)) for column in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+def as_workers(records):
+    """Convert a list of row dicts (or Workers) into a list of Workers."""
+    return [Worker.from_record(record) for record in records]